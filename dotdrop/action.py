@@ -7,6 +7,7 @@ in dotdrop
 """
 
 import subprocess
+import signal
 import os
 
 # local imports
@@ -28,9 +29,23 @@ class Cmd(DictParser):
         self.action = action
         self.silent = key.startswith('_')
 
-    def execute(self, templater=None, debug=False):
-        """execute the command in the shell"""
-        ret = 1
+    def execute(self, templater=None, debug=False, stdin=None, stdout=None):
+        """
+        execute the command in the shell
+        @stdin: file object the command reads from
+        @stdout: file object the command writes to
+        """
+        cmd = self.get_cmd(templater=templater, debug=debug)
+        if cmd is None:
+            return False
+        self.log_exec(cmd, debug=debug)
+        code, _ = self.run(cmd, stdin=stdin, stdout=stdout)
+        if code != 0:
+            self.log_failure(code)
+        return code == 0
+
+    def get_cmd(self, templater=None, debug=False):
+        """return the templated command with its arguments, None on error"""
         action = self.action
         if templater:
             try:
@@ -38,7 +53,7 @@ class Cmd(DictParser):
             except UndefinedException as e:
                 err = 'bad {}: {}'.format(self.descr, e)
                 self.log.warn(err)
-                return False
+                return None
             if debug:
                 self.log.dbg('{}:'.format(self.descr))
                 self.log.dbg('  - raw       \"{}\"'.format(self.action))
@@ -53,7 +68,7 @@ class Cmd(DictParser):
                 except UndefinedException as e:
                     err = 'bad arguments for {}: {}'.format(self.descr, e)
                     self.log.warn(err)
-                    return False
+                    return None
         if debug and args:
             self.log.dbg('action args:')
             for cnt, arg in enumerate(args):
@@ -64,12 +79,16 @@ class Cmd(DictParser):
             err = 'bad {}: \"{}\"'.format(self.descr, action)
             err += ' with \"{}\"'.format(args)
             self.log.warn(err)
-            return False
+            return None
         except KeyError:
             err = 'bad {}: \"{}\"'.format(self.descr, action)
             err += ' with \"{}\"'.format(args)
             self.log.warn(err)
-            return False
+            return None
+        return cmd
+
+    def log_exec(self, cmd, debug=False):
+        """log the execution of cmd"""
         if self.silent:
             self.log.sub('executing silent action \"{}\"'.format(self.key))
             if debug:
@@ -78,13 +97,58 @@ class Cmd(DictParser):
             if debug:
                 self.log.dbg('action cmd: \"{}\"'.format(cmd))
             self.log.sub('executing \"{}\"'.format(cmd))
+
+    def log_failure(self, code):
+        """log the failure of the command, code is None on timeout"""
+        if code is None:
+            self.log.warn('{} timed out'.format(self.descr))
+            return
+        self.log.warn('{} returned code {}'.format(self.descr, code))
+
+    def run(self, cmd, capture=False, timeout=None, stdin=None, stdout=None):
+        """
+        run cmd in the shell
+        @capture: return the output instead of printing it
+        @timeout: seconds after which cmd is killed, None for no timeout
+        @stdin: file object cmd reads from
+        @stdout: file object cmd writes to
+        returns the return code (0 on success, None on timeout), the output
+        """
+        ret = 1
+        out = None
+        kwargs = {'stdin': stdin, 'stdout': stdout}
+        if capture:
+            kwargs['stdout'] = subprocess.PIPE
+            kwargs['stderr'] = subprocess.STDOUT
+        if timeout:
+            # to kill the shell along with its children
+            kwargs['start_new_session'] = True
+        proc = subprocess.Popen(cmd, shell=True, **kwargs)
         try:
-            ret = subprocess.call(cmd, shell=True)
+            out, _ = proc.communicate(timeout=timeout or None)
+            ret = proc.returncode
+        except subprocess.TimeoutExpired:
+            self._kill(proc, group=True)
+            out, _ = proc.communicate()
+            ret = None
         except KeyboardInterrupt:
+            self._kill(proc, group=bool(timeout))
+            proc.wait()
             self.log.warn('{} interrupted'.format(self.descr))
-        if ret != 0:
-            self.log.warn('{} returned code {}'.format(self.descr, ret))
-        return ret == 0
+        if out is not None:
+            out = out.decode('utf-8', 'replace')
+        return ret, out
+
+    @staticmethod
+    def _kill(proc, group=False):
+        """kill a process and, for group, the processes of its session"""
+        try:
+            if group:
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except OSError:
+            pass
 
     @classmethod
     def _adjust_yaml_keys(cls, value):
@@ -100,19 +164,34 @@ class Action(Cmd):
     post = 'post'
     descr = 'action'
 
-    def __init__(self, key, kind, action):
+    key_cmd = 'cmd'
+    key_after = 'after'
+    key_provides = 'provides'
+    key_timeout = 'timeout'
+
+    def __init__(self, key, kind, action, after=[], provides=[],
+                 timeout=None):
         """constructor
         @key: action key
         @kind: type of action (pre or post)
         @action: action string
+        @after: keys of actions or names provided by
+                actions that must be executed before
+        @provides: names other actions can depend on
+        @timeout: seconds after which the action is killed
         """
         super(Action, self).__init__(key, action)
         self.kind = kind
+        self.after = list(after)
+        self.provides = list(provides)
+        self.timeout = timeout
         self.args = []
 
     def copy(self, args):
         """return a copy of this object with arguments"""
-        action = Action(self.key, self.kind, self.action)
+        action = Action(self.key, self.kind, self.action,
+                        after=self.after, provides=self.provides,
+                        timeout=self.timeout)
         action.args = args
         return action
 
@@ -121,8 +200,23 @@ class Action(Cmd):
         """parse key value into object"""
         v = {}
         v['kind'], v['action'] = value
+        if isinstance(v['action'], dict):
+            entry = v['action']
+            v['action'] = entry[cls.key_cmd]
+            v['after'] = cls._to_list(entry.get(cls.key_after))
+            v['provides'] = cls._to_list(entry.get(cls.key_provides))
+            v['timeout'] = entry.get(cls.key_timeout)
         return cls(key=key, **v)
 
+    @staticmethod
+    def _to_list(value):
+        """a single entry or a list of entries to a list"""
+        if not value:
+            return []
+        if isinstance(value, str):
+            return [value]
+        return list(value)
+
     def __str__(self):
         out = '{}: [{}] \"{}\"'
         return out.format(self.key, self.kind, self.action)
@@ -134,6 +228,10 @@ class Action(Cmd):
 class Transform(Cmd):
     descr = 'transformation'
 
+    # the file to transform and the result
+    ARG0 = '{0}'
+    ARG1 = '{1}'
+
     def __init__(self, key, action):
         """constructor
         @key: action key
@@ -152,15 +250,35 @@ class Transform(Cmd):
         """
         execute transformation with {0} and {1}
         where {0} is the file to transform
-        and {1} is the result file
+        and {1} is the result file,
+        when {0} is not used the file is streamed to its stdin
+        and when {1} is not used its stdout is the result
         """
         if os.path.exists(arg1):
             msg = 'transformation \"{}\": destination exists: {}'
             self.log.warn(msg.format(self.key, arg1))
             return False
 
-        if not self.args:
-            self.args = []
-        self.args.insert(0, arg1)
-        self.args.insert(0, arg0)
-        return self.execute(templater=templater, debug=debug)
+        trans = self.copy([arg0, arg1] + (self.args or []))
+        stdin = None
+        stdout = None
+        try:
+            if self.ARG0 not in self.action and os.path.isfile(arg0):
+                stdin = open(arg0, 'rb')
+            if self.ARG1 not in self.action:
+                stdout = open(arg1, 'wb')
+            return trans.execute(templater=templater, debug=debug,
+                                 stdin=stdin, stdout=stdout)
+        finally:
+            if stdin:
+                stdin.close()
+            if stdout:
+                stdout.close()
+
+    def get_key(self, templater=None):
+        """
+        return the templated command identifying what
+        this transformation does, None on error
+        """
+        trans = self.copy([self.ARG0, self.ARG1] + (self.args or []))
+        return trans.get_cmd(templater=templater)
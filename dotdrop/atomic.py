@@ -0,0 +1,200 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+write files atomically through a temporary file
+renamed over the destination
+"""
+
+import os
+import stat
+import tempfile
+import threading
+
+# local imports
+from dotdrop.logger import Logger
+import dotdrop.filecopy as filecopy
+
+
+# suffix of the temporary files
+SUFFIX = '.dotdroptmp'
+# mode of the files created by open()
+UMASK = os.umask(0)
+os.umask(UMASK)
+DEFAULT_MODE = 0o666 & ~UMASK
+
+
+class Syncer:
+
+    # when to flush the written files to disk
+    NONE = 'none'
+    IMMEDIATE = 'immediate'
+    DEFERRED = 'deferred'
+    MODES = [NONE, IMMEDIATE, DEFERRED]
+
+    def __init__(self, mode=NONE, debug=False):
+        """
+        constructor
+        @mode: none to let the system flush the files,
+               immediate to fsync each file and its directory when written,
+               deferred to fsync them all at once in commit
+        @debug: enable debug
+        """
+        self.mode = mode
+        self.debug = debug
+        self.log = Logger()
+        self.lock = threading.Lock()
+        # files and directories to fsync on commit
+        self.files = []
+        self.dirs = set()
+
+    def written(self, path):
+        """the temporary file path was written"""
+        if self.mode == self.IMMEDIATE:
+            _fsync(path)
+
+    def replaced(self, path):
+        """path was renamed into place"""
+        if self.mode == self.IMMEDIATE:
+            _fsync(os.path.dirname(path))
+        elif self.mode == self.DEFERRED:
+            with self.lock:
+                self.files.append(path)
+                self.dirs.add(os.path.dirname(path))
+
+    def commit(self):
+        """fsync the files and directories deferred so far"""
+        with self.lock:
+            files, self.files = self.files, []
+            dirs, self.dirs = self.dirs, set()
+        if not files:
+            return
+        if self.debug:
+            msg = 'syncing {} file(s) in {} directorie(s)'
+            self.log.dbg(msg.format(len(files), len(dirs)))
+        for path in files + sorted(dirs):
+            try:
+                _fsync(path)
+            except OSError as e:
+                self.log.warn('syncing {} failed: {}'.format(path, e))
+
+
+def write_content(dst, content, mode=None, syncer=None):
+    """
+    atomically replace dst with content
+    @mode: permission bits of the file, None to keep the ones of dst
+    @syncer: the Syncer flushing the file
+    """
+    if mode is None:
+        mode = DEFAULT_MODE
+        try:
+            mode = os.stat(dst).st_mode
+        except OSError:
+            pass
+
+    def write(f, path):
+        f.write(content)
+        f.flush()
+        os.chmod(path, stat.S_IMODE(mode))
+    _replace(dst, write, syncer)
+
+
+def copy_file(src, dst, mode=None, syncer=None):
+    """
+    atomically replace dst with a copy of src and its permission bits
+    @mode: permission bits of the file, None for the ones of src
+    @syncer: the Syncer flushing the file
+    """
+    def write(f, path):
+        f.close()
+        filecopy.copyfile(src, path, mode=True)
+        if mode is not None:
+            os.chmod(path, stat.S_IMODE(mode))
+    _replace(dst, write, syncer)
+
+
+def backup(path, dst):
+    """
+    backup path to dst, regular files are copied
+    to stay in place until replaced
+    """
+    if os.path.isfile(path) and not os.path.islink(path):
+        try:
+            if os.path.lexists(dst):
+                os.remove(dst)
+            # not hard linked, it would be written in place
+            filecopy.copyfile(path, dst, mode=True, times=True)
+            _keep_owner(path, dst)
+            return
+        except OSError:
+            pass
+    os.rename(path, dst)
+
+
+def _replace(dst, write, syncer):
+    """
+    write to a temporary file with write(file, path) and rename it to dst,
+    dst is written in place when it has other hard links or when
+    its directory is not writable
+    """
+    if os.path.islink(dst):
+        # write through the symlink
+        dst = os.path.realpath(dst)
+    try:
+        linked = os.stat(dst).st_nlink > 1
+    except OSError:
+        linked = False
+    if linked:
+        # replacing it would break the hard links
+        _write(dst, write, syncer)
+        return
+    directory, name = os.path.split(dst)
+    try:
+        fd, tmp = tempfile.mkstemp(prefix='.{}.'.format(name), suffix=SUFFIX,
+                                   dir=directory or '.')
+    except OSError:
+        # directory not writable, dst may be
+        _write(dst, write, syncer)
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f, tmp)
+        if syncer:
+            syncer.written(tmp)
+        _keep_owner(dst, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        raise
+    if syncer:
+        syncer.replaced(dst)
+
+
+def _write(dst, write, syncer):
+    """write dst in place with write(file, path)"""
+    with open(dst, 'wb') as f:
+        write(f, dst)
+    if syncer:
+        syncer.written(dst)
+        syncer.replaced(dst)
+
+
+def _keep_owner(dst, tmp):
+    """give tmp the owner of the file it replaces when running as root"""
+    if not hasattr(os, 'geteuid') or os.geteuid() != 0:
+        return
+    try:
+        st = os.stat(dst)
+    except OSError:
+        return
+    os.chown(tmp, st.st_uid, st.st_gid)
+
+
+def _fsync(path):
+    """fsync a file or a directory"""
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
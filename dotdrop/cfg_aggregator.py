@@ -29,17 +29,22 @@ class CfgAggregator:
     dir_prefix = 'd'
     key_sep = '_'
 
-    def __init__(self, path, profile_key, debug=False, dry=False):
+    def __init__(self, path, profile_key, debug=False, dry=False,
+                 cache_dir=None, readonly=False):
         """
         high level config parser
         @path: path to the config file
         @profile_key: profile key
         @debug: debug flag
+        @cache_dir: directory where the resolved config is cached
+        @readonly: the config is not modified by the command
         """
         self.path = path
         self.profile_key = profile_key
         self.debug = debug
         self.dry = dry
+        self.cache_dir = cache_dir
+        self.readonly = readonly
         self.log = Logger()
         self._load()
 
@@ -47,6 +52,8 @@ class CfgAggregator:
         """load lower level config"""
         self.cfgyaml = CfgYaml(self.path,
                                self.profile_key,
+                               cache_dir=self.cache_dir,
+                               readonly=self.readonly,
                                debug=self.debug)
 
         # settings
@@ -82,6 +89,9 @@ class CfgAggregator:
         if self.debug:
             self._debug_dict('variables', self.variables)
 
+        # index elements for the lookups
+        self._index()
+
         # patch dotfiles in profiles
         self._patch_keys_to_objs(self.profiles,
                                  "dotfiles", self.get_dotfile)
@@ -110,6 +120,49 @@ class CfgAggregator:
                                  self._get_trans_w_args(self._get_trans_w),
                                  islist=False)
 
+        # index profiles once their dotfiles are patched
+        self._index_profiles()
+
+    def _index(self):
+        """index dotfiles, profiles, actions and transformations"""
+        self._dotfiles_by_key = {}
+        self._dotfiles_by_dst = {}
+        self._dotfiles_by_src = {}
+        for dotfile in self.dotfiles:
+            self._index_dotfile(dotfile)
+        self._profiles_by_key = {p.key: p for p in self.profiles}
+        self._actions_by_key = {a.key: a for a in self.actions}
+        self._trans_r_by_key = {t.key: t for t in self.trans_r}
+        self._trans_w_by_key = {t.key: t for t in self.trans_w}
+
+    def _index_profiles(self):
+        """index profiles by the keys of their dotfiles"""
+        self._profiles_by_dotfile = {}
+        for profile in self.profiles:
+            for key in {d.key for d in profile.dotfiles}:
+                self._profiles_by_dotfile.setdefault(key, []).append(profile)
+
+    def _index_dotfile(self, dotfile):
+        """add a dotfile to the indexes"""
+        self._dotfiles_by_key.setdefault(dotfile.key, dotfile)
+        dst = self._norm_path(dotfile.dst)
+        self._dotfiles_by_dst.setdefault(dst, []).append(dotfile)
+        self._dotfiles_by_src.setdefault(dotfile.src, []).append(dotfile)
+
+    def _unindex_dotfile(self, dotfile):
+        """remove a dotfile from the indexes"""
+        if self._dotfiles_by_key.get(dotfile.key) is dotfile:
+            del self._dotfiles_by_key[dotfile.key]
+        dst = self._norm_path(dotfile.dst)
+        for index, value in [(self._dotfiles_by_dst, dst),
+                             (self._dotfiles_by_src, dotfile.src)]:
+            entries = [d for d in index.get(value, []) if d is not dotfile]
+            if entries:
+                index[value] = entries
+            else:
+                index.pop(value, None)
+        self._profiles_by_dotfile.pop(dotfile.key, None)
+
     def _patch_keys_to_objs(self, containers, keys, get_by_key, islist=True):
         """
         map for each key in the attribute 'keys' in 'containers'
@@ -143,11 +196,26 @@ class CfgAggregator:
 
     def del_dotfile(self, dotfile):
         """remove this dotfile from the config"""
-        return self.cfgyaml.del_dotfile(dotfile.key)
+        if not self.cfgyaml.del_dotfile(dotfile.key):
+            return False
+        self.dotfiles = [d for d in self.dotfiles if d is not dotfile]
+        self._unindex_dotfile(dotfile)
+        return True
 
     def del_dotfile_from_profile(self, dotfile, profile):
         """remove this dotfile from this profile"""
-        return self.cfgyaml.del_dotfile_from_profile(dotfile.key, profile.key)
+        if not self.cfgyaml.del_dotfile_from_profile(dotfile.key,
+                                                     profile.key):
+            return False
+        profile.dotfiles = [d for d in profile.dotfiles
+                            if d.key != dotfile.key]
+        profiles = self._profiles_by_dotfile.get(dotfile.key, [])
+        profiles = [p for p in profiles if p is not profile]
+        if profiles:
+            self._profiles_by_dotfile[dotfile.key] = profiles
+        else:
+            self._profiles_by_dotfile.pop(dotfile.key, None)
+        return True
 
     def _create_new_dotfile(self, src, dst, link):
         """create a new dotfile"""
@@ -156,8 +224,25 @@ class CfgAggregator:
         if self.debug:
             self.log.dbg('new dotfile key: {}'.format(key))
         # add the dotfile
-        self.cfgyaml.add_dotfile(key, src, dst, link)
-        return Dotfile(key, dst, src)
+        entry = self.cfgyaml.add_dotfile(key, src, dst, link)
+        dotfile = Dotfile.parse(key, entry)
+        self.dotfiles.append(dotfile)
+        self._index_dotfile(dotfile)
+        return dotfile
+
+    def _add_dotfile_to_profile(self, dotfile):
+        """add a dotfile to the selected profile"""
+        profile = self.get_profile()
+        if not profile:
+            profile = Profile(self.profile_key, actions=[], dotfiles=[])
+            self.profiles.append(profile)
+            self._profiles_by_key[profile.key] = profile
+        if dotfile.key not in [d.key for d in profile.dotfiles]:
+            # the list may be shared with the yaml content
+            profile.dotfiles = profile.dotfiles + [dotfile]
+        profiles = self._profiles_by_dotfile.setdefault(dotfile.key, [])
+        if not [p for p in profiles if p is profile]:
+            profiles.append(profile)
 
     def new(self, src, dst, link):
         """
@@ -176,16 +261,8 @@ class CfgAggregator:
         if ret and self.debug:
             msg = 'new dotfile {} to profile {}'
             self.log.dbg(msg.format(key, self.profile_key))
-
-        self.save()
-        if ret and not self.dry:
-            # reload
-            if self.debug:
-                self.log.dbg('reloading config')
-            olddebug = self.debug
-            self.debug = False
-            self._load()
-            self.debug = olddebug
+        # the config is saved once all are imported
+        self._add_dotfile_to_profile(dotfile)
         return ret
 
     def _get_new_dotfile_key(self, dst):
@@ -270,13 +347,8 @@ class CfgAggregator:
         get a list of dotfiles by dst
         @dst: dotfile dst (on filesystem)
         """
-        dotfiles = []
         dst = self._norm_path(dst)
-        for d in self.dotfiles:
-            left = self._norm_path(d.dst)
-            if left == dst:
-                dotfiles.append(d)
-        return dotfiles
+        return list(self._dotfiles_by_dst.get(dst, []))
 
     def get_dotfile_by_src_dst(self, src, dst):
         """
@@ -290,9 +362,9 @@ class CfgAggregator:
             err = 'unable to resolve {}: {}'
             self.log.err(err.format(src, e))
             return None
-        dotfiles = self.get_dotfile_by_dst(dst)
-        for d in dotfiles:
-            if d.src == src:
+        dst = self._norm_path(dst)
+        for d in self._dotfiles_by_src.get(src, []):
+            if self._norm_path(d.dst) == dst:
                 return d
         return None
 
@@ -306,6 +378,10 @@ class CfgAggregator:
         """dump the config dictionary"""
         return self.cfgyaml.dump()
 
+    def get_inputs(self):
+        """return the paths of the files the config was read from"""
+        return self.cfgyaml.get_inputs()
+
     def get_settings(self):
         """return settings as a dict"""
         return self.settings.serialize()[Settings.key_yaml]
@@ -320,19 +396,11 @@ class CfgAggregator:
 
     def get_profile(self):
         """return profile object"""
-        try:
-            return next(x for x in self.profiles if x.key == self.profile_key)
-        except StopIteration:
-            return None
+        return self._profiles_by_key.get(self.profile_key)
 
     def get_profiles_by_dotfile_key(self, key):
         """return all profiles having this dotfile"""
-        res = []
-        for p in self.profiles:
-            keys = [d.key for d in p.dotfiles]
-            if key in keys:
-                res.append(p)
-        return res
+        return list(self._profiles_by_dotfile.get(key, []))
 
     def get_dotfiles(self):
         """get all dotfiles for this profile"""
@@ -347,18 +415,11 @@ class CfgAggregator:
         return dotfile object by key
         @key: the dotfile key to look for
         """
-        try:
-            return next(x for x in self.dotfiles
-                        if x.key == key)
-        except StopIteration:
-            return None
+        return self._dotfiles_by_key.get(key)
 
     def _get_action(self, key):
         """return action by key"""
-        try:
-            return next(x for x in self.actions if x.key == key)
-        except StopIteration:
-            return None
+        return self._actions_by_key.get(key)
 
     def _get_action_w_args(self, key):
         """return action by key with the arguments"""
@@ -392,17 +453,11 @@ class CfgAggregator:
 
     def _get_trans_r(self, key):
         """return the trans_r with this key"""
-        try:
-            return next(x for x in self.trans_r if x.key == key)
-        except StopIteration:
-            return None
+        return self._trans_r_by_key.get(key)
 
     def _get_trans_w(self, key):
         """return the trans_w with this key"""
-        try:
-            return next(x for x in self.trans_w if x.key == key)
-        except StopIteration:
-            return None
+        return self._trans_w_by_key.get(key)
 
     def _norm_path(self, path):
         if not path:
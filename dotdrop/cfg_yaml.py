@@ -21,9 +21,18 @@ Additionally a few methods are exported.
 import os
 import glob
 import io
+import json
+import pickle
+import hashlib
+import time
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from itertools import chain
+from collections.abc import Mapping
 from ruamel.yaml import YAML as yaml
+from jinja2.defaults import DEFAULT_FILTERS
 
 # local imports
 from dotdrop.version import __version__ as VERSION
@@ -31,10 +40,53 @@ from dotdrop.settings import Settings
 from dotdrop.logger import Logger
 from dotdrop.templategen import Templategen
 from dotdrop.linktypes import LinkTypes
-from dotdrop.utils import shell, uniq_list
+from dotdrop.utils import shell, uniq_list, get_cachedir
+from dotdrop.statedb import hash_file
+from dotdrop.atomic import Syncer
 from dotdrop.exceptions import YamlException, UndefinedException
 
 
+class _EnvTracker(Mapping):
+    """os.environ wrapper keeping track of the variables used"""
+
+    def __init__(self):
+        self.used = {}
+        # the whole environment was used
+        self.all = False
+
+    def __getitem__(self, key):
+        val = os.environ.get(key)
+        self.used[key] = val
+        if val is None:
+            raise KeyError(key)
+        return val
+
+    def __iter__(self):
+        self.all = True
+        self.used.update(os.environ)
+        return iter(os.environ)
+
+    def __len__(self):
+        self.all = True
+        self.used.update(os.environ)
+        return len(os.environ)
+
+    def update(self, other):
+        """merge what was used in other"""
+        self.used.update(other.used)
+        self.all = self.all or other.all
+
+    def unchanged(self, used, everything):
+        """return True if the environment matches what was used"""
+        defined = [k for k, v in used.items() if v is not None]
+        if everything and len(os.environ) != len(defined):
+            return False
+        for k, v in used.items():
+            if os.environ.get(k) != v:
+                return False
+        return True
+
+
 class CfgYaml:
 
     # global entries
@@ -48,8 +100,16 @@ class CfgYaml:
     key_variables = 'variables'
     key_dvariables = 'dynvariables'
 
+    # dynvariables entries
+    key_dvariable_cmd = 'cmd'
+    key_dvariable_ttl = 'ttl'
+    # shell bookkeeping not keying the cached dynvariables
+    dvars_env_skip = ['_', 'OLDPWD', 'PWD', 'SHLVL']
+
     action_pre = 'pre'
     action_post = 'post'
+    key_action_cmd = 'cmd'
+    key_action_timeout = 'timeout'
 
     # profiles/dotfiles entries
     key_dotfile_src = 'src'
@@ -94,16 +154,30 @@ class CfgYaml:
     allowed_link_val = [lnk_nolink, lnk_link, lnk_children]
     top_entries = [key_dotfiles, key_settings, key_profiles]
 
-    def __init__(self, path, profile=None, addprofiles=[], debug=False):
+    # attributes saved in the cache
+    cache_fields = ['settings', 'dotfiles', 'profiles', 'actions',
+                    'trans_r', 'trans_w', 'variables',
+                    '_profilevarskeys', '_inc_profiles']
+    # template functions and filters always giving the same result
+    pure_funcs = ['header', 'basename', 'dirname', 'range', 'dict',
+                  'cycler', 'joiner', 'namespace']
+    pure_filters = [f for f in DEFAULT_FILTERS if f != 'random']
+
+    def __init__(self, path, profile=None, addprofiles=[],
+                 cache_dir=None, readonly=False, debug=False):
         """
         config parser
         @path: config file path
         @profile: the selected profile
         @addprofiles: included profiles
+        @cache_dir: directory where the resolved config is cached
+        @readonly: parse with the fast loader, the yaml is
+                   loaded again to keep its format when written
         @debug: debug flag
         """
         self._path = os.path.abspath(path)
         self._profile = profile
+        self._readonly = readonly
         self._debug = debug
         self._log = Logger()
         # config needs to be written
@@ -114,6 +188,24 @@ class CfgYaml:
         self._profilevarskeys = []
         # included profiles
         self._inc_profiles = addprofiles
+        # the raw yaml content
+        self._yaml_content = None
+        # files, globs and environment variables the config depends on
+        self._inputs = []
+        self._globs = {}
+        self._env = _EnvTracker()
+        # "~" in paths depends on HOME
+        self._env.get('HOME')
+        # the config depends on something else (dynvariables, ...)
+        self._volatile = False
+        # ttl of the cached dynvariables and their cached output
+        self._dvars_ttl = {}
+        self._dvars_cache = None
+        self._dvars_dirty = False
+        self._dvars_lock = threading.Lock()
+        self._cache_path = None
+        if cache_dir:
+            self._cache_path = self._get_cache_path(cache_dir, addprofiles)
 
         # init the dictionaries
         self.settings = {}
@@ -123,6 +215,9 @@ class CfgYaml:
         self.trans_r = {}
         self.trans_w = {}
         self.variables = {}
+        # the templater with the functions and filters loaded
+        self._templater = None
+        self._templater_files = None
 
         if not os.path.exists(self._path):
             err = 'invalid config path: \"{}\"'.format(path)
@@ -130,18 +225,24 @@ class CfgYaml:
                 self._dbg(err)
             raise YamlException(err)
 
-        self._yaml_dict = self._load_yaml(self._path)
+        if self._load_cache():
+            return
+
+        yamldict = self._load_yaml(self._path, fast=self._readonly)
+        if not self._readonly:
+            # keep the round-trip content for writing
+            self._yaml_dict = yamldict
         # live patch deprecated entries
-        self._fix_deprecated(self._yaml_dict)
+        self._fix_deprecated(yamldict)
         # validate content
-        self._validate(self._yaml_dict)
+        self._validate(yamldict)
 
         ##################################################
         # parse the config and variables
         ##################################################
 
         # parse the "config" block
-        self.settings = self._parse_blk_settings(self._yaml_dict)
+        self.settings = self._parse_blk_settings(yamldict)
 
         # base templater (when no vars/dvars exist)
         self.variables = self._enrich_vars(self.variables, self._profile)
@@ -152,11 +253,11 @@ class CfgYaml:
         # references between them
 
         # parse the "variables" block
-        var = self._parse_blk_variables(self._yaml_dict)
+        var = self._parse_blk_variables(yamldict)
         self._add_variables(var, template=False)
 
         # parse the "dynvariables" block
-        dvariables = self._parse_blk_dynvariables(self._yaml_dict)
+        dvariables = self._parse_blk_dynvariables(yamldict)
         self._add_variables(dvariables, template=False)
 
         # now template variables and dynvariables from the same pool
@@ -174,7 +275,7 @@ class CfgYaml:
             self._debug_dict('current variables defined', self.variables)
 
         # parse the "profiles" block
-        self.profiles = self._parse_blk_profiles(self._yaml_dict)
+        self.profiles = self._parse_blk_profiles(yamldict)
 
         # include the profile's variables/dynvariables last
         # as it overwrites existing ones
@@ -202,13 +303,13 @@ class CfgYaml:
         ##################################################
 
         # parse the "dotfiles" block
-        self.dotfiles = self._parse_blk_dotfiles(self._yaml_dict)
+        self.dotfiles = self._parse_blk_dotfiles(yamldict)
         # parse the "actions" block
-        self.actions = self._parse_blk_actions(self._yaml_dict)
+        self.actions = self._parse_blk_actions(yamldict)
         # parse the "trans_r" block
-        self.trans_r = self._parse_blk_trans_r(self._yaml_dict)
+        self.trans_r = self._parse_blk_trans_r(yamldict)
         # parse the "trans_w" block
-        self.trans_w = self._parse_blk_trans_w(self._yaml_dict)
+        self.trans_w = self._parse_blk_trans_w(yamldict)
 
         ##################################################
         # import elements
@@ -249,6 +350,8 @@ class CfgYaml:
             self._dbg('########### {} ###########'.format('final config'))
             self._debug_entries()
 
+        self._save_cache()
+
     ########################################################
     # public methods
     ########################################################
@@ -317,7 +420,7 @@ class CfgYaml:
         return self.dotfiles.keys()
 
     def add_dotfile(self, key, src, dst, link):
-        """add a new dotfile"""
+        """add a new dotfile, returns its resolved entry"""
         if key in self.dotfiles.keys():
             return False
         if self._debug:
@@ -335,6 +438,17 @@ class CfgYaml:
         self._yaml_dict[self.key_dotfiles][key] = df_dict
         self._dirty = True
 
+        # resolved as if loaded
+        entry = self._norm_dotfiles({key: dict(df_dict)})[key]
+        link = entry[self.key_dotfile_link]
+        entry[self.key_dotfile_link] = self._resolve_dotfile_link(link)
+        entry[self.key_dotfile_src] = self.resolve_dotfile_src(
+            src, templater=self._tmpl)
+        entry[self.key_dotfile_dst] = self.resolve_dotfile_dst(
+            dst, templater=self._tmpl)
+        self.dotfiles[key] = entry
+        return entry
+
     def del_dotfile(self, key):
         """remove this dotfile from config"""
         if key not in self._yaml_dict[self.key_dotfiles]:
@@ -415,6 +529,10 @@ class CfgYaml:
         self._yaml_dump(content, output)
         return output.getvalue()
 
+    def get_inputs(self):
+        """return the paths of the files the config was read from"""
+        return uniq_list([entry[0] for entry in self._inputs])
+
     ########################################################
     # block parsing
     ########################################################
@@ -431,6 +549,27 @@ class CfgYaml:
             minversion = settings[self.key_settings_minversion]
             self._check_minversion(minversion)
 
+        # check the actions timeout
+        timeout = settings[Settings.key_action_timeout]
+        if not self._is_seconds(timeout):
+            err = 'bad {}: {}'.format(Settings.key_action_timeout, timeout)
+            self._log.err(err)
+            raise YamlException(err)
+
+        # check the install sync mode
+        sync = settings[Settings.key_install_sync]
+        if sync not in Syncer.MODES:
+            err = 'bad {}: {}'.format(Settings.key_install_sync, sync)
+            self._log.err(err)
+            raise YamlException(err)
+
+        # check the number of install journals
+        keep = settings[Settings.key_install_journal]
+        if isinstance(keep, bool) or not isinstance(keep, int) or keep < 0:
+            err = 'bad {}: {}'.format(Settings.key_install_journal, keep)
+            self._log.err(err)
+            raise YamlException(err)
+
         # normalize paths
         p = self._norm_path(settings[self.key_settings_dotpath])
         settings[self.key_settings_dotpath] = p
@@ -524,8 +663,7 @@ class CfgYaml:
         dvariables = self._get_entry(dic,
                                      self.key_dvariables,
                                      mandatory=False)
-        if dvariables:
-            dvariables = dvariables.copy()
+        dvariables = self._norm_dvars(dvariables)
         if self._debug:
             self._debug_dict('dynvariables block', dvariables)
         return dvariables
@@ -572,11 +710,30 @@ class CfgYaml:
         for k, v in actions.items():
             if k == self.action_pre or k == self.action_post:
                 for key, action in v.items():
-                    new[key] = (k, action)
+                    new[key] = (k, self._check_action(key, action))
             else:
-                new[k] = (self.action_post, v)
+                new[k] = (self.action_post, self._check_action(k, v))
         return new
 
+    def _check_action(self, key, action):
+        """ensure an action with dependencies has a command"""
+        if not isinstance(action, dict):
+            return action
+        timeout = action.get(self.key_action_timeout)
+        if not isinstance(action.get(self.key_action_cmd), str) or \
+                (timeout is not None and not self._is_seconds(timeout)):
+            err = 'bad action \"{}\": {}'.format(key, action)
+            self._log.err(err)
+            raise YamlException(err)
+        return action
+
+    @staticmethod
+    def _is_seconds(value):
+        """return True if value is a positive number of seconds"""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return value >= 0
+
     def _norm_profiles(self, profiles):
         """normalize profiles entries"""
         if not profiles:
@@ -717,7 +874,7 @@ class CfgYaml:
             if self.key_all in dfs:
                 if self._debug:
                     self._dbg('add ALL to profile \"{}\"'.format(k))
-                v[self.key_profile_dotfiles] = self.dotfiles.keys()
+                v[self.key_profile_dotfiles] = list(self.dotfiles.keys())
 
     def _resolve_profile_includes(self):
         """resolve profile(s) including other profiles"""
@@ -817,6 +974,7 @@ class CfgYaml:
                 self._dbg('import dynvariables from {}'.format(path))
             dvar = self._import_sub(path, self.key_dvariables,
                                     mandatory=False)
+            dvar = self._norm_dvars(dvar)
 
             merged = self._merge_dict(dvar, var)
             self._rec_resolve_variables(merged)
@@ -863,7 +1021,8 @@ class CfgYaml:
             self._dbg('import config from {}'.format(path))
         sub = CfgYaml(path, profile=self._profile,
                       addprofiles=self._inc_profiles,
-                      debug=self._debug)
+                      readonly=True, debug=self._debug)
+        self._add_dependencies(sub)
 
         # settings are ignored from external file
         # except for filter_file and func_file
@@ -905,7 +1064,8 @@ class CfgYaml:
         """
         if self._debug:
             self._dbg('import \"{}\" from \"{}\"'.format(key, path))
-        extdict = self._load_yaml(path)
+        # imported files are never written
+        extdict = self._load_yaml(path, fast=True)
         new = self._get_entry(extdict, key, mandatory=mandatory)
         if patch_func:
             if self._debug:
@@ -930,6 +1090,7 @@ class CfgYaml:
             self._yaml_dict[self.key_profiles][key] = {
                 self.key_profile_dotfiles: []
             }
+            self.profiles[key] = {self.key_profile_dotfiles: []}
             if self._debug:
                 self._dbg('adding new profile: {}'.format(key))
             self._dirty = True
@@ -1016,9 +1177,13 @@ class CfgYaml:
             content[self.key_profiles] = None
         return content
 
-    def _load_yaml(self, path):
-        """load a yaml file to a dict"""
+    def _load_yaml(self, path, fast=False):
+        """
+        load a yaml file to a dict
+        @fast: use the safe loader, comments and format are lost
+        """
         content = {}
+        self._inputs.append(self._fingerprint(path))
         if self._debug:
             self._dbg('----------start:{}----------'.format(path))
             cfg = '\n'
@@ -1028,7 +1193,7 @@ class CfgYaml:
             self._dbg(cfg.rstrip())
             self._dbg('----------end:{}----------'.format(path))
         try:
-            content = self._yaml_load(path)
+            content = self._yaml_load(path, fast=fast)
         except Exception as e:
             self._log.err(e)
             raise YamlException('config yaml error: {}'.format(path))
@@ -1063,11 +1228,15 @@ class CfgYaml:
             self._log.err(err)
             raise YamlException('config content error: {}'.format(err))
 
-    def _yaml_load(self, path):
+    def _yaml_load(self, path, fast=False):
         """load from yaml"""
         with open(path, 'r') as f:
-            y = yaml()
-            y.typ = 'rt'
+            if fast:
+                # C based when ruamel.yaml.clib is available
+                y = yaml(typ='safe', pure=False)
+            else:
+                y = yaml()
+                y.typ = 'rt'
             content = y.load(f)
         return content
 
@@ -1079,17 +1248,163 @@ class CfgYaml:
         y.typ = 'rt'
         y.dump(content, where)
 
+    @property
+    def _yaml_dict(self):
+        """
+        the round-trip yaml content, loaded on use
+        when parsed in readonly mode or read from the cache
+        """
+        if self._yaml_content is None:
+            content = self._load_yaml(self._path)
+            self._fix_deprecated(content)
+            for e in self.top_entries:
+                if not content.get(e):
+                    content[e] = {}
+            self._yaml_content = content
+        return self._yaml_content
+
+    @_yaml_dict.setter
+    def _yaml_dict(self, content):
+        self._yaml_content = content
+
+    ########################################################
+    # cache
+    ########################################################
+
+    def _get_cache_path(self, directory, addprofiles):
+        """return the cache path for this config and profile"""
+        key = json.dumps([VERSION, self._path, self._profile, addprofiles])
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(os.path.expanduser(directory), name)
+
+    def _load_cache(self):
+        """load the resolved config from the cache if still valid"""
+        if not self._cache_path or not os.path.isfile(self._cache_path):
+            return False
+        try:
+            with open(self._cache_path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            if self._debug:
+                self._dbg('bad config cache: {}'.format(e))
+            return False
+        if not self._cache_valid(data):
+            if self._debug:
+                self._dbg('config cache is outdated')
+            return False
+        for k, v in data['state'].items():
+            setattr(self, k, v)
+        self._inputs = data['inputs']
+        self._redefine_templater()
+        if self._debug:
+            self._dbg('config loaded from {}'.format(self._cache_path))
+            self._debug_entries()
+        return True
+
+    def _cache_valid(self, data):
+        """check the config dependencies did not change"""
+        if not self._env.unchanged(data['env'], data['allenv']):
+            return False
+        for pattern, paths in data['globs'].items():
+            if self._glob_path(pattern) != paths:
+                return False
+        for path, mtime, size, digest in data['inputs']:
+            cur = self._fingerprint(path, mtime=mtime, digest=digest)
+            if cur[2:] != [size, digest]:
+                return False
+        return True
+
+    def _save_cache(self):
+        """save the resolved config to the cache"""
+        if not self._cache_path or not os.path.isfile(self._path):
+            return
+        if self._volatile or self._dirty:
+            if self._debug:
+                self._dbg('config is not cached')
+            return
+        data = {
+            'env': self._env.used,
+            'allenv': self._env.all,
+            'globs': self._globs,
+            'inputs': self._inputs,
+            'state': {k: getattr(self, k) for k in self.cache_fields},
+        }
+        tmp = '{}.{}'.format(self._cache_path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self._cache_path), exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump(data, f)
+            os.replace(tmp, self._cache_path)
+        except Exception as e:
+            if self._debug:
+                self._dbg('unable to cache config: {}'.format(e))
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        if self._debug:
+            self._dbg('config cached to {}'.format(self._cache_path))
+
+    def _fingerprint(self, path, mtime=None, digest=None):
+        """
+        return [path, mtime, size, hash] of a file,
+        digest is reused if the file mtime is still mtime
+        """
+        try:
+            st = os.stat(path)
+            if st.st_mtime_ns != mtime or not digest:
+                digest = hash_file(path)
+        except OSError:
+            return [path, 0, -1, None]
+        return [path, st.st_mtime_ns, st.st_size, digest]
+
+    def _add_dependencies(self, other):
+        """add the dependencies of another config"""
+        self._inputs.extend(other._inputs)
+        self._globs.update(other._globs)
+        self._env.update(other._env)
+        self._volatile = self._volatile or other._volatile
+
+    def _track_templater(self, templater):
+        """keep track of what the templated entries depend on"""
+        templater.variables['env'] = self._env
+        env = templater.env
+        for name, func in env.globals.items():
+            if callable(func) and name not in self.pure_funcs:
+                env.globals[name] = self._volatile_func(func)
+        for name, func in env.filters.items():
+            if name not in self.pure_filters:
+                env.filters[name] = self._volatile_func(func)
+
+    def _volatile_func(self, func):
+        """wrap func to mark the config as volatile when called"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self._volatile = True
+            return func(*args, **kwargs)
+        return wrapper
+
     ########################################################
     # templating
     ########################################################
 
     def _redefine_templater(self):
         """create templater based on current variables"""
+        self._tmpl = self._get_templater(self.variables)
+
+    def _get_templater(self, variables):
+        """
+        return a templater using variables, the functions and filters
+        are only loaded again when the files they come from change
+        """
         fufile = self.settings[Settings.key_func_file]
         fifile = self.settings[Settings.key_filter_file]
-        self._tmpl = Templategen(variables=self.variables,
-                                 func_file=fufile,
-                                 filter_file=fifile)
+        files = (tuple(fufile), tuple(fifile))
+        if not self._templater or self._templater_files != files:
+            self._templater = Templategen(func_file=fufile,
+                                          filter_file=fifile)
+            self._track_templater(self._templater)
+            self._templater_files = files
+        return self._templater.overlay(variables)
 
     def _template_item(self, item, exc_if_fail=True):
         """
@@ -1192,9 +1507,7 @@ class CfgYaml:
         var = self._enrich_vars(variables, self._profile)
         # use a separated templategen to handle variables
         # resolved outside the main config
-        t = Templategen(variables=var,
-                        func_file=self.settings[Settings.key_func_file],
-                        filter_file=self.settings[Settings.key_filter_file])
+        t = self._get_templater(var)
         for k in variables.keys():
             val = variables[k]
             while Templategen.var_is_template(val):
@@ -1216,6 +1529,7 @@ class CfgYaml:
         # now get the included ones
         pro_var = self._get_profile_included_item(self.key_profile_variables)
         pro_dvar = self._get_profile_included_item(self.key_profile_dvariables)
+        pro_dvar = self._norm_dvars(pro_dvar)
 
         # the included profiles
         inc_profiles = []
@@ -1270,6 +1584,8 @@ class CfgYaml:
         error = 'bad path {}'.format(path)
         if fatal_not_found:
             raise YamlException(error)
+        # config changes if the path is created
+        self._inputs.append(self._fingerprint(path))
         self._log.warn(error)
 
     def _check_path_existence(self, path, fatal_not_found=True):
@@ -1373,7 +1689,9 @@ class CfgYaml:
         if self._debug:
             self._dbg('expanding glob {}'.format(path))
         expanded_path = os.path.expanduser(path)
-        return glob.glob(expanded_path, recursive=True)
+        paths = sorted(glob.glob(expanded_path, recursive=True))
+        self._globs[path] = paths
+        return paths
 
     def _norm_path(self, path):
         """Resolve a path either absolute or relative to config path"""
@@ -1396,9 +1714,19 @@ class CfgYaml:
         """shell execute dynvariables in-place"""
         if not keys:
             keys = dic.keys()
-        for k in keys:
+        keys = list(keys)
+        if not keys:
+            return
+        # output may differ on each run
+        self._volatile = True
+        if any(k in self._dvars_ttl for k in keys):
+            self._load_dvars_cache()
+        # dynvariables are independent from each other
+        with ThreadPoolExecutor() as ex:
+            futures = [ex.submit(self._exec_dvar, k, dic[k]) for k in keys]
+        for k, future in zip(keys, futures):
             v = dic[k]
-            ret, out = shell(v, debug=self._debug)
+            ret, out = future.result()
             if not ret:
                 err = 'var \"{}: {}\" failed: {}'.format(k, v, out)
                 self._log.err(err)
@@ -1406,6 +1734,116 @@ class CfgYaml:
             if self._debug:
                 self._dbg('{}: `{}` -> {}'.format(k, v, out))
             dic[k] = out
+        self._save_dvars_cache()
+
+    def _exec_dvar(self, key, cmd):
+        """execute a dynvariable or get its cached output"""
+        ttl = self._dvars_ttl.get(key)
+        if not ttl:
+            return shell(cmd, debug=self._debug)
+        digest = self._dvar_digest(cmd)
+        now = time.time()
+        with self._dvars_lock:
+            entry = self._dvars_cache.get(digest)
+        if entry and now - entry[0] < ttl:
+            if self._debug:
+                self._dbg('cached output for dynvariable {}'.format(key))
+            return True, entry[2]
+        ret, out = shell(cmd, debug=self._debug)
+        if ret:
+            with self._dvars_lock:
+                self._dvars_cache[digest] = [now, ttl, out]
+                self._dvars_dirty = True
+        return ret, out
+
+    @classmethod
+    def _dvar_digest(cls, cmd):
+        """
+        key of the cached output of a dynvariable, its command
+        runs in the current directory and environment
+        """
+        env = {k: v for k, v in os.environ.items()
+               if k not in cls.dvars_env_skip}
+        data = json.dumps([cmd, os.getcwd(), env], sort_keys=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _norm_dvars(self, dvars):
+        """
+        normalize dynvariables to their command
+        and record the ttl of the ones to cache
+        """
+        if not dvars:
+            return dvars
+        new = {}
+        for k, v in dvars.items():
+            ttl = 0
+            if isinstance(v, dict):
+                cmd = v.get(self.key_dvariable_cmd)
+                ttl = v.get(self.key_dvariable_ttl, 0)
+                if not isinstance(cmd, str) or \
+                        type(ttl) is not int or ttl < 0:
+                    err = 'bad dynvariable \"{}\": {}'.format(k, v)
+                    self._log.err(err)
+                    raise YamlException(err)
+                v = cmd
+            if ttl:
+                self._dvars_ttl[k] = ttl
+            else:
+                self._dvars_ttl.pop(k, None)
+            new[k] = v
+        return new
+
+    def _get_dvars_cache_path(self):
+        """path of the cached dynvariables output"""
+        workdir = self.settings[self.key_settings_workdir]
+        return os.path.join(get_cachedir(workdir), 'dynvariables.json')
+
+    def _load_dvars_cache(self):
+        """load the cached dynvariables output"""
+        if self._dvars_cache is not None:
+            return
+        self._dvars_cache = {}
+        path = self._get_dvars_cache_path()
+        if not os.path.isfile(path):
+            return
+        try:
+            with open(path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            if self._debug:
+                self._dbg('unable to load {}: {}'.format(path, e))
+            return
+        if isinstance(cache, dict):
+            self._dvars_cache = cache
+        if self._debug:
+            self._dbg('dynvariables cache loaded from {}'.format(path))
+
+    def _save_dvars_cache(self):
+        """save the cached dynvariables output"""
+        if self._dvars_cache is None or not self._dvars_dirty:
+            return
+        now = time.time()
+        # drop expired entries
+        cache = {k: v for k, v in self._dvars_cache.items()
+                 if now - v[0] < v[1]}
+        path = self._get_dvars_cache_path()
+        tmp = '{}.{}'.format(path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # output of commands like "pass show" may be sensitive
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            if self._debug:
+                self._dbg('unable to save {}: {}'.format(path, e))
+            return
+        self._dvars_dirty = False
+        if self._debug:
+            self._dbg('dynvariables cache saved to {}'.format(path))
 
     def _check_minversion(self, minversion):
         if not minversion:
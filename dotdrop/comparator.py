@@ -6,11 +6,14 @@ handle the comparison of two dotfiles
 """
 
 import os
+import stat
 import filecmp
 
 # local imports
 from dotdrop.logger import Logger
-from dotdrop.utils import must_ignore, uniq_list, diff
+from dotdrop.utils import must_ignore, must_prune, uniq_list, diff, \
+    write_to_tmpfile, removepath, get_ignore, DIFF_CMD
+import dotdrop.differ as differ
 
 
 class Comparator:
@@ -31,6 +34,9 @@ class Comparator:
         if self.debug:
             self.log.dbg('comparing {} and {}'.format(left, right))
             self.log.dbg('ignore pattern(s): {}'.format(ignore))
+        if ignore:
+            ignore = get_ignore(ignore, debug=self.debug,
+                                roots=[left, right])
         # test type of file
         if os.path.isdir(left) and not os.path.isdir(right):
             return '\"{}\" is a dir while \"{}\" is a file\n'.format(left,
@@ -47,6 +53,141 @@ class Comparator:
             self.log.dbg('is directory')
         return self._comp_dir(left, right, ignore)
 
+    def compare_src(self, src, dst, render=None, ignore=[]):
+        """
+        diff src (dotdrop dotfile) and dst (deployed file)
+        without writing src to disk
+        @render: callback (path, deployed path) returning the content
+                 of a file of src or None to compare the file as is
+        """
+        src = os.path.expanduser(src)
+        dst = os.path.expanduser(dst)
+        if self.debug:
+            self.log.dbg('comparing {} and {}'.format(src, dst))
+            self.log.dbg('ignore pattern(s): {}'.format(ignore))
+        if ignore:
+            ignore = get_ignore(ignore, debug=self.debug, roots=[src, dst])
+        # test type of file
+        if os.path.isdir(src) and not os.path.isdir(dst):
+            return '\"{}\" is a dir while \"{}\" is a file\n'.format(src,
+                                                                     dst)
+        if not os.path.isdir(src) and os.path.isdir(dst):
+            return '\"{}\" is a file while \"{}\" is a dir\n'.format(src,
+                                                                     dst)
+        # test content
+        if not os.path.isdir(src):
+            if self.debug:
+                self.log.dbg('is file')
+            if must_ignore([dst], ignore, debug=self.debug):
+                if self.debug:
+                    self.log.dbg('ignoring diff {} and {}'.format(src, dst))
+                return ''
+            return self._comp_src_file(src, dst, render, force=True)
+        if self.debug:
+            self.log.dbg('is directory')
+        return self._comp_src_dir(src, dst, render, ignore)
+
+    def _comp_src_file(self, src, dst, render, header=False, force=False):
+        """
+        compare a file of src once rendered with dst
+        @force: diff even if no difference is found
+        """
+        if self.debug:
+            self.log.dbg('compare file {} with {}'.format(src, dst))
+        content = None
+        if render:
+            content = render(src, dst)
+        if content is None:
+            if not force and differ.same_files(src, dst):
+                return ''
+            return self._diff(src, dst, header=header)
+        if differ.same_content(dst, content):
+            return ''
+        if self.diff_cmd in ['', DIFF_CMD]:
+            out = differ.diff_with_content(dst, content, src)
+        else:
+            # the external diff command needs a file
+            tmp = write_to_tmpfile(content)
+            try:
+                out = diff(modified=tmp, original=dst, raw=False,
+                           diff_cmd=self.diff_cmd, debug=self.debug)
+            finally:
+                removepath(tmp, logger=self.log)
+        if header:
+            out = '=> diff \"{}\":\n{}'.format(os.path.basename(src), out)
+        return out
+
+    def _comp_src_dir(self, src, dst, render, ignore):
+        """compare a directory of src once rendered with dst"""
+        if self.debug:
+            self.log.dbg('compare directory {} with {}'.format(src, dst))
+        if not os.path.exists(dst):
+            return ''
+        if must_prune([dst], ignore, debug=self.debug):
+            if self.debug:
+                self.log.dbg('ignoring diff {} and {}'.format(src, dst))
+            return ''
+        if not os.path.isdir(dst):
+            return '\"{}\" is a file\n'.format(dst)
+        ret = []
+        lnames = self._listdir(src)
+        rnames = self._listdir(dst)
+
+        # handle files only in dotpath dir
+        for i in sorted(lnames - rnames):
+            # paths are matched as if deployed
+            if must_ignore([os.path.join(dst, i)],
+                           ignore, debug=self.debug):
+                continue
+            ret.append('=> \"{}\" does not exist on destination\n'.format(i))
+
+        # handle files only in deployed dir
+        for i in sorted(rnames - lnames):
+            if must_ignore([os.path.join(dst, i)],
+                           ignore, debug=self.debug):
+                continue
+            ret.append('=> \"{}\" does not exist in dotdrop\n'.format(i))
+
+        files = []
+        dirs = []
+        for i in sorted(lnames & rnames):
+            sfile = os.path.join(src, i)
+            dfile = os.path.join(dst, i)
+            try:
+                smode = stat.S_IFMT(os.stat(sfile).st_mode)
+                dmode = stat.S_IFMT(os.stat(dfile).st_mode)
+            except OSError:
+                smode = dmode = None
+            if smode is not None and smode == dmode and stat.S_ISDIR(smode):
+                # content may be un-ignored, pruned when walked
+                dirs.append(i)
+            elif must_ignore([dfile], ignore, debug=self.debug):
+                continue
+            elif smode is not None and smode == dmode and \
+                    stat.S_ISREG(smode):
+                files.append(i)
+            else:
+                # same name but different type
+                ret.append('=> different type: \"{}\"\n'.format(i))
+
+        # content is different
+        for i in files:
+            sfile = os.path.join(src, i)
+            dfile = os.path.join(dst, i)
+            ret.append(self._comp_src_file(sfile, dfile, render, header=True))
+
+        # recursively compare subdirs
+        for i in dirs:
+            ret.append(self._comp_src_dir(os.path.join(src, i),
+                                          os.path.join(dst, i),
+                                          render, ignore))
+        return ''.join(ret)
+
+    def _listdir(self, path):
+        """list a directory the way filecmp.dircmp does"""
+        hide = filecmp.DEFAULT_IGNORES + [os.curdir, os.pardir]
+        return set([n for n in os.listdir(path) if n not in hide])
+
     def _comp_file(self, left, right, ignore):
         """compare a file"""
         if self.debug:
@@ -63,7 +204,7 @@ class Comparator:
             self.log.dbg('compare directory {} with {}'.format(left, right))
         if not os.path.exists(right):
             return ''
-        if must_ignore([left, right], ignore, debug=self.debug):
+        if must_prune([left, right], ignore, debug=self.debug):
             if self.debug:
                 self.log.dbg('ignoring diff {} and {}'.format(left, right))
             return ''
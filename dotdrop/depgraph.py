@@ -0,0 +1,136 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+graph of what the templated dotfiles depend on
+"""
+
+from jinja2 import TemplateSyntaxError
+
+# local imports
+from dotdrop.dirsync import HashCache
+
+
+class DepGraph(HashCache):
+    """
+    the references of each template file are cached
+    like hashes, along with the dependencies of each dotfile
+    """
+
+    filename = 'depgraph.json'
+
+    def __init__(self, directory=None, debug=False):
+        """
+        constructor
+        @directory: where the graph is persisted, None to keep
+                    it in memory only
+        @debug: enable debug
+        """
+        super(DepGraph, self).__init__(directory=directory, debug=debug)
+        self.dotfiles = {}
+
+    def record(self, key, paths, templater):
+        """
+        compute and record the dependencies of a dotfile
+        @key: the dotfile key
+        @paths: the template files of the dotfile
+        @templater: the templater the dotfile is rendered with
+        returns the dependencies as a dict of
+          templates: the paths of the included/imported templates
+          variables: the names of the variables used
+          helpers: the func_file/filter_file used
+          env: the keys of env read, None when any may be
+          dynamic: True if some templates are only known when rendered
+        """
+        templates = set()
+        variables = set()
+        helpers = set()
+        env = set()
+        allenv = False
+        dynamic = False
+        seen = set()
+        todo = list(paths)
+        while todo:
+            path = todo.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            refs = self._references(path, templater)
+            if not refs:
+                continue
+            tpls, names, filters, keys = refs
+            if keys is None:
+                allenv = True
+            else:
+                env.update(keys)
+            for tpl in tpls:
+                if tpl is None:
+                    dynamic = True
+                    continue
+                templates.add(tpl)
+                todo.append(tpl)
+            for name in names:
+                if name in templater.funcs:
+                    helpers.add(templater.funcs[name])
+                elif name not in templater.env.globals:
+                    variables.add(name)
+            for name in filters:
+                if name in templater.filters:
+                    helpers.add(templater.filters[name])
+        deps = {
+            'templates': sorted(templates),
+            'variables': sorted(variables),
+            'helpers': sorted(helpers),
+            'env': None if allenv else sorted(env),
+            'dynamic': dynamic,
+        }
+        with self.lock:
+            self._load()
+            if self.dotfiles.get(key) != deps:
+                self.dotfiles[key] = deps
+                self.dirty = True
+        return deps
+
+    def get(self, key):
+        """return the recorded dependencies of a dotfile, None if unknown"""
+        with self.lock:
+            self._load()
+            return self.dotfiles.get(key)
+
+    def dependents(self, path=None, variable=None):
+        """
+        return the keys of the dotfiles depending on the template
+        or helper at path or on a variable
+        """
+        keys = []
+        with self.lock:
+            self._load()
+            for key, deps in self.dotfiles.items():
+                if path and (path in deps['templates'] or
+                             path in deps['helpers']):
+                    keys.append(key)
+                elif variable and variable in deps['variables']:
+                    keys.append(key)
+        return sorted(keys)
+
+    def _references(self, path, templater):
+        """
+        return the references of the template at path,
+        parsed again only when changed
+        """
+        try:
+            return self._cached(path, None, templater.get_references)
+        except OSError:
+            return None
+        except TemplateSyntaxError as e:
+            self.log.warn('cannot parse {}: {}'.format(path, e))
+            return None
+
+    def _dump(self):
+        """return what is persisted"""
+        return {'files': self.hashes, 'dotfiles': self.dotfiles}
+
+    def _restore(self, data):
+        """restore what _dump returned"""
+        self.hashes = data['files']
+        self.dotfiles = data['dotfiles']
@@ -0,0 +1,115 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+builtin diff backend producing unified diffs
+similar to `diff -u` without spawning any process
+"""
+
+import os
+import time
+import difflib
+
+CONTEXT = 3
+CHUNK = 65536
+BINARY = 'Binary files {} and {} differ\n'
+NONEWLINE = '\\ No newline at end of file\n'
+
+
+def can_diff(original, modified):
+    """return True if the builtin diff handles these paths"""
+    return os.path.isfile(original) and os.path.isfile(modified)
+
+
+def same_files(left, right):
+    """return True if both files have the same content"""
+    if os.path.getsize(left) != os.path.getsize(right):
+        return False
+    with open(left, 'rb') as fl, open(right, 'rb') as fr:
+        while True:
+            bl = fl.read(CHUNK)
+            br = fr.read(CHUNK)
+            if bl != br:
+                return False
+            if not bl:
+                return True
+
+
+def same_content(path, content):
+    """return True if the file has the same content as the bytes content"""
+    if os.path.getsize(path) != len(content):
+        return False
+    view = memoryview(content)
+    with open(path, 'rb') as f:
+        pos = 0
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                return pos == len(content)
+            if view[pos:pos + len(chunk)] != chunk:
+                return False
+            pos += len(chunk)
+
+
+def diff_files(original, modified):
+    """unified diff of two files, returns '' if same"""
+    if same_files(original, modified):
+        return ''
+    with open(original, 'rb') as f:
+        left = f.read()
+    with open(modified, 'rb') as f:
+        right = f.read()
+    return diff_content(left, right, original, modified,
+                        _date(original), _date(modified))
+
+
+def diff_with_content(original, content, modified):
+    """
+    unified diff of the file original and the bytes content
+    where modified is the name used for content
+    returns '' if same
+    """
+    with open(original, 'rb') as f:
+        left = f.read()
+    return diff_content(left, content, original, modified,
+                        _date(original), _date(modified))
+
+
+def diff_content(left, right, lname, rname, ldate='', rdate=''):
+    """unified diff of two bytes, returns '' if same"""
+    if left == right:
+        return ''
+    if b'\0' in left or b'\0' in right:
+        return BINARY.format(lname, rname)
+    out = []
+    lines = difflib.unified_diff(_lines(left), _lines(right),
+                                 fromfile=lname, tofile=rname,
+                                 fromfiledate=ldate, tofiledate=rdate,
+                                 n=CONTEXT)
+    for line in lines:
+        if not line.endswith('\n'):
+            line = '{}\n{}'.format(line, NONEWLINE)
+        out.append(line)
+    return ''.join(out)
+
+
+def _lines(data):
+    """split bytes into lines the way diff does"""
+    text = data.decode('utf-8', 'replace')
+    lines = text.split('\n')
+    res = [line + '\n' for line in lines[:-1]]
+    if lines[-1]:
+        res.append(lines[-1])
+    return res
+
+
+def _date(path):
+    """date of the file as printed by diff"""
+    try:
+        ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return ''
+    sec, frac = divmod(ns, 1000000000)
+    t = time.localtime(sec)
+    date = time.strftime('%Y-%m-%d %H:%M:%S', t)
+    return '{}.{:09d} {}'.format(date, frac, time.strftime('%z', t))
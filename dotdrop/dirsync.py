@@ -0,0 +1,252 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+compare directories and plan their synchronization
+"""
+
+import os
+import json
+import stat
+import time
+import hashlib
+import threading
+from collections import namedtuple
+
+# local imports
+from dotdrop.logger import Logger
+
+
+CHUNK = 65536
+# files modified more recently than this (in seconds)
+# are not cached, they could change within the same mtime
+RACY = 2
+
+# the kinds of changes
+ADD = 'add'
+REMOVE = 'remove'
+MODIFY = 'modify'
+MODE = 'mode'
+
+# a change to apply to dst, src is None for REMOVE
+Change = namedtuple('Change', ['kind', 'src', 'dst', 'isdir'])
+
+
+class HashCache:
+
+    filename = 'hashes.json'
+
+    def __init__(self, directory=None, debug=False):
+        """
+        constructor
+        @directory: where the hashes are persisted, None to keep
+                    them in memory only
+        @debug: enable debug
+        """
+        self.path = None
+        if directory:
+            self.path = os.path.join(directory, self.filename)
+        self.debug = debug
+        self.log = Logger()
+        self.lock = threading.Lock()
+        self.hashes = None
+        self.dirty = False
+
+    def digest(self, path, st=None):
+        """
+        return the hash of the content of path
+        @st: the stat of path if already known
+        """
+        return self._cached(path, st, self._hash)
+
+    def _cached(self, path, st, compute):
+        """
+        return compute(path), computed again only when path changed
+        @st: the stat of path if already known
+        """
+        if st is None:
+            st = os.stat(path)
+        sig = [st.st_size, st.st_mtime_ns, st.st_ino]
+        with self.lock:
+            hashes = self._load()
+            entry = hashes.get(path)
+            if entry and entry[:-1] == sig:
+                return entry[-1]
+        value = compute(path)
+        if time.time() - st.st_mtime > RACY:
+            with self.lock:
+                self.hashes[path] = sig + [value]
+                self.dirty = True
+        return value
+
+    def forget(self, path):
+        """forget the hashes of path and what is under it"""
+        with self.lock:
+            hashes = self._load()
+            sub = path.rstrip(os.sep) + os.sep
+            for key in [k for k in hashes
+                        if k == path or k.startswith(sub)]:
+                del hashes[key]
+                self.dirty = True
+
+    def save(self):
+        """persist the hashes of the paths that still exist"""
+        with self.lock:
+            if not self.path:
+                return
+            self._load()
+            self._prune()
+            if not self.dirty:
+                return
+            try:
+                directory = os.path.dirname(self.path)
+                os.makedirs(directory, exist_ok=True)
+                tmp = '{}.{}'.format(self.path, os.getpid())
+                with open(tmp, 'w') as f:
+                    json.dump(self._dump(), f)
+                os.replace(tmp, self.path)
+                self.dirty = False
+            except OSError as e:
+                self.log.warn('unable to save hashes: {}'.format(e))
+
+    def _prune(self):
+        """forget the paths removed or renamed, call with the lock"""
+        for path in [p for p in self.hashes if not os.path.lexists(p)]:
+            del self.hashes[path]
+            self.dirty = True
+
+    def _load(self):
+        """load the hashes, call with the lock"""
+        if self.hashes is not None:
+            return self.hashes
+        self.hashes = {}
+        if not self.path or not os.path.exists(self.path):
+            return self.hashes
+        try:
+            with open(self.path, 'r') as f:
+                self._restore(json.load(f))
+            if self.debug:
+                msg = 'loaded {} hashes from {}'
+                self.log.dbg(msg.format(len(self.hashes), self.path))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.hashes = {}
+            self.log.warn('unable to load hashes: {}'.format(e))
+        return self.hashes
+
+    def _dump(self):
+        """return what is persisted"""
+        return self.hashes
+
+    def _restore(self, data):
+        """restore what _dump returned"""
+        self.hashes = data
+
+    @staticmethod
+    def _hash(path):
+        """hash the content of a file"""
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+
+def same_content(left, right, hashes, lst=None, rst=None):
+    """
+    return True if files left and right have the same content
+    @hashes: the HashCache
+    @lst, @rst: the stat of left and right if already known
+    """
+    if lst is None:
+        lst = os.stat(left)
+    if rst is None:
+        rst = os.stat(right)
+    if lst.st_size != rst.st_size:
+        return False
+    if os.path.samestat(lst, rst):
+        return True
+    return hashes.digest(left, lst) == hashes.digest(right, rst)
+
+
+def plan(left, right, hashes, ignore=None, prune=None):
+    """
+    walk the directories left and right once and return the
+    list of changes to apply to right to make it the same as left,
+    ordered by kind (directories added and removed, files modified,
+    added and removed and mode changes)
+    @hashes: the HashCache used to compare the files
+    @ignore: function returning True if a list of paths is ignored
+    @prune: function returning True if a list of directories
+            is ignored with their content
+    """
+    changes = []
+    _scan(left, right, hashes, changes,
+          ignore or (lambda x: False), prune or (lambda x: False))
+    order = [(ADD, True), (REMOVE, True), (MODIFY, False),
+             (ADD, False), (REMOVE, False), (MODE, False)]
+    return sorted(changes, key=lambda c: order.index((c.kind, c.isdir)))
+
+
+def _scan(left, right, hashes, changes, ignore, prune):
+    """compare the content of directories left and right"""
+    if prune([left, right]):
+        return
+    lentries = _entries(left)
+    rentries = _entries(right)
+    for name in sorted(set(lentries) | set(rentries)):
+        lpath = os.path.join(left, name)
+        rpath = os.path.join(right, name)
+        lentry = lentries.get(name)
+        rentry = rentries.get(name)
+        if not rentry:
+            if ignore([lpath, rpath]):
+                continue
+            isdir = _is_dir(lentry)
+            changes.append(Change(ADD, lpath, rpath, isdir))
+            continue
+        if not lentry:
+            if ignore([rpath]):
+                continue
+            isdir = _is_dir(rentry)
+            changes.append(Change(REMOVE, None, rpath, isdir))
+            continue
+        lst = _stat(lentry)
+        rst = _stat(rentry)
+        if lst and rst and stat.S_ISDIR(lst.st_mode) and \
+                stat.S_ISDIR(rst.st_mode):
+            _scan(lpath, rpath, hashes, changes, ignore, prune)
+            continue
+        if not lst or not rst or not stat.S_ISREG(lst.st_mode) or \
+                not stat.S_ISREG(rst.st_mode):
+            # type differs or special files
+            if not ignore([lpath, rpath]):
+                changes.append(Change(MODIFY, lpath, rpath, False))
+            continue
+        if ignore([lpath, rpath]):
+            continue
+        if not same_content(lpath, rpath, hashes, lst=lst, rst=rst):
+            changes.append(Change(MODIFY, lpath, rpath, False))
+        elif lst.st_mode != rst.st_mode:
+            changes.append(Change(MODE, lpath, rpath, False))
+
+
+def _entries(path):
+    """return the entries of a directory by name"""
+    with os.scandir(path) as it:
+        return {entry.name: entry for entry in it}
+
+
+def _stat(entry):
+    """stat an entry following symlinks, None if it fails"""
+    try:
+        return entry.stat()
+    except OSError:
+        return None
+
+
+def _is_dir(entry):
+    """return True if entry is a directory (following symlinks)"""
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
@@ -8,31 +8,50 @@ entry point
 import os
 import sys
 import time
+import functools
 from concurrent import futures
+from collections.abc import Mapping
 import shutil
 
 # local imports
 from dotdrop.options import Options
 from dotdrop.logger import Logger
-from dotdrop.templategen import Templategen
+from dotdrop.templategen import Templategen, ScanCache
 from dotdrop.installer import Installer
 from dotdrop.updater import Updater
 from dotdrop.comparator import Comparator
+from dotdrop.scheduler import Scheduler, Job
+from dotdrop.transcache import TransCache
+from dotdrop.dirsync import HashCache
+from dotdrop.atomic import Syncer
+from dotdrop.journal import Journal
+from dotdrop.watcher import Watcher
+from dotdrop.depgraph import DepGraph
+from dotdrop.plan import Plan, INSTALL, serialize_actions, \
+    deserialize_actions
+import dotdrop.filecopy as filecopy
 from dotdrop.utils import get_tmpdir, removepath, strip_home, \
-    uniq_list, patch_ignores, dependencies_met
+    uniq_list, patch_ignores, dependencies_met, get_cachedir
 from dotdrop.linktypes import LinkTypes
+from dotdrop.statedb import StateDb, hash_vars
+from dotdrop.version import __version__ as VERSION
 from dotdrop.exceptions import YamlException, UndefinedException
 
 LOG = Logger()
-TRANS_SUFFIX = 'trans'
 
 ###########################################################
 # entry point
 ###########################################################
 
 
-def action_executor(o, actions, defactions, templater, post=False):
-    """closure for action execution"""
+def action_executor(o, actions, defactions, templater, post=False,
+                    scheduler=None, defer=None):
+    """
+    closure for action execution
+    @scheduler: the scheduler executing the actions
+    @defer: defer the actions to the end of the install
+            with this rank, None to execute them right away
+    """
     def execute():
         """
         execute actions and return
@@ -41,62 +60,95 @@ def action_executor(o, actions, defactions, templater, post=False):
         """
         s = 'pre' if not post else 'post'
 
-        # execute default actions
-        for action in defactions:
-            if o.dry:
-                LOG.dry('would execute def-{}-action: {}'.format(s,
-                                                                 action))
-                continue
-            if o.debug:
-                LOG.dbg('executing def-{}-action: {}'.format(s, action))
-            ret = action.execute(templater=templater, debug=o.debug)
-            if not ret:
-                err = 'def-{}-action \"{}\" failed'.format(s, action.key)
-                LOG.err(err)
-                return False, err
-
-        # execute actions
-        for action in actions:
-            if o.dry:
-                LOG.dry('would execute {}-action: {}'.format(s, action))
-                continue
-            if o.debug:
-                LOG.dbg('executing {}-action: {}'.format(s, action))
-            ret = action.execute(templater=templater, debug=o.debug)
-            if not ret:
-                err = '{}-action \"{}\" failed'.format(s, action.key)
-                LOG.err(err)
-                return False, err
-        return True, None
+        # default actions first
+        jobs = [Job(action, templater, 'def-{}-action'.format(s))
+                for action in defactions]
+        jobs.extend([Job(action, templater, '{}-action'.format(s))
+                     for action in actions])
+        if o.dry:
+            for job in jobs:
+                LOG.dry('would execute {}: {}'.format(job.descr,
+                                                      job.action))
+            return True, None
+        if o.debug:
+            for job in jobs:
+                LOG.dbg('executing {}: {}'.format(job.descr, job.action))
+        sched = scheduler
+        if not sched:
+            sched = _get_scheduler(o)
+        if defer is not None:
+            sched.defer(jobs, rank=defer)
+            return True, None
+        # post actions keep going as when deferred
+        return sched.run(jobs, keep_going=post)
     return execute
 
 
-def _dotfile_install(o, dotfile, tmpdir=None):
+def _get_scheduler(o):
+    """create the scheduler executing the actions"""
+    logpath = None
+    if o.action_log:
+        name = 'actions-{}.log'.format(time.strftime('%Y%m%d-%H%M%S'))
+        logpath = os.path.join(o.workdir, 'logs', name)
+    return Scheduler(workers=o.install_parallel,
+                     timeout=o.action_timeout,
+                     logpath=logpath, debug=o.debug)
+
+
+def _get_transcache(o):
+    """create the cache applying the read transformations"""
+    return TransCache(o.workdir, cache=o.trans_cache, debug=o.debug)
+
+
+def _dotfile_install(o, dotfile, tmpdir=None, state=None,
+                     scheduler=None, rank=0, transcache=None, syncer=None,
+                     journal=None, templater=None, graph=None):
     """
     install a dotfile
+    @state: the StateDb used to skip unchanged dotfiles if any
+    @scheduler: the scheduler executing the actions
+    @rank: the rank of the dotfile post actions in the scheduler,
+           they are deferred when installing in parallel
+    @transcache: the TransCache applying the transformations
+    @syncer: the Syncer flushing the installed files
+    @journal: the Journal recording the changed paths
+    @templater: the templater shared by the dotfiles, a new one if None
+    @graph: the DepGraph recording what the dotfile templates use
     returns <success, dotfile key, err>
     """
     # installer
-    inst = _get_install_installer(o, tmpdir=tmpdir)
-
-    # templater
-    t = _get_templater(o)
+    inst = _get_install_installer(o, tmpdir=tmpdir, syncer=syncer,
+                                  journal=journal)
 
-    # add dotfile variables
-    newvars = dotfile.get_dotfile_variables()
-    t.add_tmp_vars(newvars=newvars)
+    # templater with the dotfile variables
+    t = templater or _get_templater(o)
+    t = t.overlay(dotfile.get_dotfile_variables())
+    # only the templates of this dotfile
+    t.get_loaded_templates(clear=True)
 
     preactions = []
     if not o.install_temporary:
         preactions.extend(dotfile.get_pre_actions())
     defactions = o.install_default_actions_pre
     pre_actions_exec = action_executor(o, preactions, defactions,
-                                       t, post=False)
+                                       t, post=False, scheduler=scheduler)
 
     if o.debug:
         LOG.dbg('installing dotfile: \"{}\"'.format(dotfile.key))
         LOG.dbg(dotfile.prt())
 
+    ignores = uniq_list(o.install_ignore + dotfile.instignore)
+    ignores = patch_ignores(ignores, dotfile.dst, debug=o.debug)
+    # post actions run along their dotfile unless installed in parallel
+    defer = rank if o.install_parallel > 1 else None
+    svars = None
+    tmp = None
+    rendered = True
+    if state and dotfile.link == LinkTypes.NOLINK and \
+            dotfile.src and dotfile.dst:
+        deps = graph.get(dotfile.key) if graph else None
+        svars = _state_vars(dotfile, t, ignores, deps=deps)
+
     if hasattr(dotfile, 'link') and dotfile.link == LinkTypes.LINK:
         # link
         r, err = inst.link(t, dotfile.src, dotfile.dst,
@@ -108,26 +160,40 @@ def _dotfile_install(o, dotfile, tmpdir=None):
         r, err = inst.link_children(t, dotfile.src, dotfile.dst,
                                     actionexec=pre_actions_exec,
                                     template=dotfile.template)
+    elif svars and state.unchanged(dotfile.key, dotfile.dst, svars):
+        # nolink and nothing changed since last install
+        if o.debug:
+            LOG.dbg('{} unchanged since last install'.format(dotfile.key))
+        r, err = False, None
+        rendered = False
     else:
         # nolink
         src = dotfile.src
-        tmp = None
         if dotfile.trans_r:
-            tmp = apply_trans(o.dotpath, dotfile, t, debug=o.debug)
+            tmp = apply_trans(o, dotfile, t, transcache=transcache)
             if not tmp:
                 return False, dotfile.key, None
             src = tmp
-        ignores = list(set(o.install_ignore + dotfile.instignore))
-        ignores = patch_ignores(ignores, dotfile.dst, debug=o.debug)
+        if svars:
+            inst.rendered = {}
         r, err = inst.install(t, src, dotfile.dst,
                               actionexec=pre_actions_exec,
                               noempty=dotfile.noempty,
                               ignore=ignores,
                               template=dotfile.template)
-        if tmp:
-            tmp = os.path.join(o.dotpath, tmp)
-            if os.path.exists(tmp):
-                removepath(tmp, LOG)
+
+    deps = None
+    templates = [p for p in t.get_loaded_templates() if p != tmp]
+    if graph and rendered:
+        # the templates rendered and what they use
+        deps = graph.record(dotfile.key, templates, t)
+    if svars and rendered and not err:
+        # remember what was installed with what it used
+        svars = _state_vars(dotfile, t, ignores, deps=deps)
+        inputs = [os.path.join(o.dotpath, dotfile.src)] + templates
+        inputs.extend(o.func_file + o.filter_file)
+        state.record(dotfile.key, dotfile.dst, svars,
+                     inputs, inst.rendered)
 
     # check result of installation
     if r:
@@ -136,7 +202,9 @@ def _dotfile_install(o, dotfile, tmpdir=None):
             defactions = o.install_default_actions_post
             postactions = dotfile.get_post_actions()
             post_actions_exec = action_executor(o, postactions, defactions,
-                                                t, post=True)
+                                                t, post=True,
+                                                scheduler=scheduler,
+                                                defer=defer)
             post_actions_exec()
     else:
         # dotfile was NOT installed
@@ -151,7 +219,9 @@ def _dotfile_install(o, dotfile, tmpdir=None):
             defactions = o.install_default_actions_post
             postactions = dotfile.get_post_actions()
             post_actions_exec = action_executor(o, postactions, defactions,
-                                                t, post=True)
+                                                t, post=True,
+                                                scheduler=scheduler,
+                                                defer=defer)
             post_actions_exec()
 
     return r, dotfile.key, err
@@ -178,14 +248,28 @@ def cmd_install(o):
     if o.install_temporary:
         tmpdir = get_tmpdir()
 
+    state = None
+    if o.install_state and not o.install_temporary:
+        state = StateDb(o.workdir, dry=o.dry, debug=o.debug)
+
     installed = 0
+    # executes the actions, post actions of the dotfiles installed
+    # in parallel are deferred and executed once all are installed
+    sched = _get_scheduler(o)
+    transcache = _get_transcache(o)
+    syncer = Syncer(mode=o.install_sync, debug=o.debug)
+    journal = _get_journal(o)
+    graph = DepGraph(get_cachedir(o.workdir), debug=o.debug)
+    # shared by all dotfiles
+    t = _get_templater(o)
 
     # execute profile pre-action
     if o.debug:
         LOG.dbg('run {} profile pre actions'.format(len(pro_pre_actions)))
-    t = _get_templater(o)
-    ret, err = action_executor(o, pro_pre_actions, [], t, post=False)()
+    ret, err = action_executor(o, pro_pre_actions, [], t, post=False,
+                               scheduler=sched)()
     if not ret:
+        sched.close()
         return False
 
     # install each dotfile
@@ -194,8 +278,12 @@ def cmd_install(o):
         ex = futures.ThreadPoolExecutor(max_workers=o.install_parallel)
 
         wait_for = [
-            ex.submit(_dotfile_install, o, dotfile, tmpdir=tmpdir)
-            for dotfile in dotfiles
+            ex.submit(_dotfile_install, o, dotfile,
+                      tmpdir=tmpdir, state=state,
+                      scheduler=sched, rank=rank,
+                      transcache=transcache, syncer=syncer,
+                      journal=journal, templater=t, graph=graph)
+            for rank, dotfile in enumerate(dotfiles)
         ]
         for f in futures.as_completed(wait_for):
             r, key, err = f.result()
@@ -206,21 +294,41 @@ def cmd_install(o):
                                                               err))
     else:
         # sequentially
-        for dotfile in dotfiles:
-            r, key, err = _dotfile_install(o, dotfile, tmpdir=tmpdir)
+        for rank, dotfile in enumerate(dotfiles):
+            r, key, err = _dotfile_install(o, dotfile,
+                                           tmpdir=tmpdir, state=state,
+                                           scheduler=sched, rank=rank,
+                                           transcache=transcache,
+                                           syncer=syncer, journal=journal,
+                                           templater=t, graph=graph)
             if r:
                 installed += 1
             elif err:
                 LOG.err('installing \"{}\" failed: {}'.format(key,
                                                               err))
+    # flush the installed files before recording them
+    syncer.commit()
+    if journal:
+        journal.close()
+    if state:
+        state.close()
+    if not o.dry and (installed or state):
+        # the state recorded relies on the dependencies
+        graph.save()
+    transcache.close()
+
+    # execute the dotfiles post-action
+    sched.run_deferred()
 
     # execute profile post-action
     if installed > 0 or o.install_force_action:
         if o.debug:
             msg = 'run {} profile post actions'
             LOG.dbg(msg.format(len(pro_post_actions)))
-        ret, err = action_executor(o, pro_post_actions, [], t, post=False)()
+        ret, err = action_executor(o, pro_post_actions, [], t, post=False,
+                                   scheduler=sched)()
         if not ret:
+            sched.close()
             return False
 
     if o.debug:
@@ -229,27 +337,376 @@ def cmd_install(o):
     if o.install_temporary:
         LOG.log('\ninstalled to tmp \"{}\".'.format(tmpdir))
     LOG.log('\n{} dotfile(s) installed.'.format(installed))
+    sched.close()
     return True
 
 
-def cmd_compare(o, tmp):
-    """compare dotfiles and return True if all identical"""
+def _dotfile_plan(o, plan, dotfile, transcache=None, templater=None):
+    """
+    plan the install of a dotfile
+    @plan: the Plan
+    @transcache: the TransCache applying the transformations
+    @templater: the templater shared by the dotfiles, a new one if None
+    returns <changes, pre actions, post actions, err>
+    """
+    inst = _get_install_installer(o)
+    # the sources of transformed dotfiles are temporary
+    changes = plan.changes(sources=not dotfile.trans_r)
+    inst.plan = changes
+
+    # templater with the dotfile variables
+    t = templater or _get_templater(o)
+    t = t.overlay(dotfile.get_dotfile_variables())
+
+    if o.debug:
+        LOG.dbg('planning dotfile: \"{}\"'.format(dotfile.key))
+
+    ignores = uniq_list(o.install_ignore + dotfile.instignore)
+    ignores = patch_ignores(ignores, dotfile.dst, debug=o.debug)
+    if dotfile.link == LinkTypes.LINK:
+        _, err = inst.link(t, dotfile.src, dotfile.dst,
+                           template=dotfile.template)
+    elif dotfile.link == LinkTypes.LINK_CHILDREN:
+        _, err = inst.link_children(t, dotfile.src, dotfile.dst,
+                                    template=dotfile.template)
+    else:
+        src = dotfile.src
+        if dotfile.trans_r:
+            src = apply_trans(o, dotfile, t, transcache=transcache)
+            if not src:
+                return None, None, None, 'transformation failed'
+        _, err = inst.install(t, src, dotfile.dst,
+                              noempty=dotfile.noempty,
+                              ignore=ignores,
+                              template=dotfile.template)
+    if err:
+        return None, None, None, err
+
+    # the actions executed along the install
+    pre = []
+    post = []
+    if changes.changes or o.install_force_action:
+        pre = o.install_default_actions_pre + dotfile.get_pre_actions()
+        pre = serialize_actions(pre, t)
+        post = o.install_default_actions_post + dotfile.get_post_actions()
+        post = serialize_actions(post, t)
+        if pre is None or post is None:
+            return None, None, None, 'bad action'
+    return changes, pre, post, None
+
+
+def cmd_plan(o):
+    """plan the install of the dotfiles for this profile"""
     dotfiles = o.dotfiles
+    prof = o.conf.get_profile()
+    pro_pre_actions = prof.get_pre_actions() if prof else []
+    pro_post_actions = prof.get_post_actions() if prof else []
+
+    if o.plan_keys:
+        # filtered dotfiles to plan
+        uniq = uniq_list(o.plan_keys)
+        dotfiles = [d for d in dotfiles if d.key in uniq]
     if not dotfiles:
-        msg = 'no dotfile defined for this profile (\"{}\")'
+        msg = 'no dotfile to install for this profile (\"{}\")'
         LOG.warn(msg.format(o.profile))
+        return False
+
+    plan = Plan(o.workdir, profile=o.profile, debug=o.debug)
+    transcache = _get_transcache(o)
+    # shared by all dotfiles
+    t = _get_templater(o)
+    if o.install_parallel > 1:
+        # in parallel
+        with futures.ThreadPoolExecutor(o.install_parallel) as ex:
+            wait_for = [ex.submit(_dotfile_plan, o, plan, dotfile,
+                                  transcache=transcache, templater=t)
+                        for dotfile in dotfiles]
+            results = [f.result() for f in wait_for]
+    else:
+        # sequentially
+        results = [_dotfile_plan(o, plan, dotfile, transcache=transcache,
+                                 templater=t)
+                   for dotfile in dotfiles]
+    transcache.close()
+
+    failed = False
+    for dotfile, (changes, pre, post, err) in zip(dotfiles, results):
+        if err:
+            LOG.err('planning \"{}\" failed: {}'.format(dotfile.key, err))
+            failed = True
+            continue
+        plan.add(dotfile, changes, pre, post)
+
+    # the profile actions
+    plan.pre_actions = serialize_actions(pro_pre_actions, t)
+    if plan.count() > 0 or o.install_force_action:
+        plan.post_actions = serialize_actions(pro_post_actions, t)
+    if plan.pre_actions is None or plan.post_actions is None:
+        LOG.err('planning the profile actions failed')
+        failed = True
+    if failed:
+        plan.discard()
+        return False
+
+    if not o.plan_output:
+        LOG.raw(plan.dumps())
         return True
-    # compare only specific files
-    same = True
-    selected = dotfiles
-    if o.compare_focus:
-        selected = _select(o.compare_focus, dotfiles)
+    with open(o.plan_output, 'w') as f:
+        f.write(plan.dumps())
+    msg = '\n{} dotfile(s) to install, plan written to \"{}\".'
+    LOG.log(msg.format(plan.count(), o.plan_output))
+    return True
 
-    if len(selected) < 1:
+
+def cmd_apply(o):
+    """install the dotfiles as planned by cmd_plan"""
+    try:
+        plan = Plan.load(o.apply_path, o.workdir, debug=o.debug)
+    except ValueError as e:
+        LOG.err(str(e))
+        return False
+    if plan.profile != o.profile:
+        msg = 'plan is for profile \"{}\", not \"{}\"'
+        LOG.err(msg.format(plan.profile, o.profile))
         return False
 
-    t = _get_templater(o)
-    tvars = t.add_tmp_vars()
+    # nothing is installed unless the whole plan still applies
+    errs = plan.check()
+    if errs:
+        for err in errs:
+            LOG.err(err)
+        LOG.err('plan not applied, re-run plan')
+        return False
+
+    count = plan.count()
+    if o.safe and not o.dry and count > 0:
+        if not LOG.ask('Install {} dotfile(s) as planned'.format(count)):
+            return False
+
+    backup_suffix = None
+    if o.backup:
+        backup_suffix = o.install_backup_suffix
+    sched = _get_scheduler(o)
+    syncer = Syncer(mode=o.install_sync, debug=o.debug)
+    journal = _get_journal(o)
+
+    # execute profile pre-action
+    pre_actions = deserialize_actions(plan.pre_actions)
+    ret, err = action_executor(o, pre_actions, [], None, post=False,
+                               scheduler=sched)()
+    if not ret:
+        sched.close()
+        return False
+
+    installed = 0
+    for rank, dotfile in enumerate(plan.dotfiles):
+        key = dotfile['key']
+        pre_actions = deserialize_actions(dotfile['pre_actions'])
+        ret, err = action_executor(o, pre_actions, [], None, post=False,
+                                   scheduler=sched)()
+        if not ret:
+            LOG.err('installing \"{}\" failed: {}'.format(key, err))
+            continue
+        try:
+            for change in dotfile['changes']:
+                if o.dry:
+                    LOG.dry('would install {}'.format(change['dst']))
+                    continue
+                plan.apply(change, backup_suffix=backup_suffix,
+                           syncer=syncer, journal=journal)
+        except OSError as e:
+            LOG.err('installing \"{}\" failed: {}'.format(key, e))
+            continue
+        if dotfile['action'] == INSTALL:
+            installed += 1
+        # as in cmd_install
+        defer = rank if o.install_parallel > 1 else None
+        post_actions = deserialize_actions(dotfile['post_actions'])
+        action_executor(o, post_actions, [], None, post=True,
+                        scheduler=sched, defer=defer)()
+    syncer.commit()
+    if journal:
+        journal.close()
+
+    # execute the dotfiles post-action
+    sched.run_deferred()
+
+    # execute profile post-action
+    post_actions = deserialize_actions(plan.post_actions)
+    ret, err = action_executor(o, post_actions, [], None, post=False,
+                               scheduler=sched)()
+    if not o.dry:
+        plan.discard()
+    LOG.log('\n{} dotfile(s) installed.'.format(installed))
+    sched.close()
+    return ret
+
+
+def cmd_rollback(o):
+    """restore the paths changed by an install"""
+    journal = Journal(o.workdir, keep=o.install_journal, debug=o.debug)
+    runs = journal.runs()
+    if not runs:
+        LOG.warn('no install to rollback')
+        return False
+    run = o.rollback_run or runs[-1]
+    if run not in runs:
+        LOG.err('no install \"{}\" in the journal'.format(run))
+        return False
+    if o.debug:
+        LOG.dbg('rollback install \"{}\"'.format(run))
+
+    restored = 0
+    failed = False
+    # the last changed first
+    for entry in reversed(journal.entries(run)):
+        path = entry['path']
+        if journal.changed(entry):
+            msg = '\"{}\" changed since installed, restore anyway'
+            if o.safe and not LOG.ask(msg.format(path)):
+                LOG.warn('ignoring {}'.format(path))
+                continue
+        if o.dry:
+            LOG.dry('would restore {}'.format(path))
+            continue
+        try:
+            journal.restore(entry)
+        except OSError as e:
+            LOG.err('restoring \"{}\" failed: {}'.format(path, e))
+            failed = True
+            continue
+        LOG.sub('restored {}'.format(path))
+        restored += 1
+    if not o.dry and not failed:
+        # the previous install is rolled back next
+        journal.forget(run)
+    msg = '\n{} path(s) restored from install \"{}\".'
+    LOG.log(msg.format(restored, run))
+    return not failed
+
+
+def cmd_watch(o):
+    """install the dotfiles again each time their sources change"""
+    watcher = Watcher(debug=o.debug)
+    # the templates used by each dotfile
+    graph = DepGraph(get_cachedir(o.workdir), debug=o.debug)
+    try:
+        while True:
+            dotfiles = o.dotfiles
+            if o.watch_keys:
+                uniq = uniq_list(o.watch_keys)
+                dotfiles = [d for d in dotfiles if d.key in uniq]
+            if not dotfiles:
+                msg = 'no dotfile to install for this profile (\"{}\")'
+                LOG.warn(msg.format(o.profile))
+                return False
+            # changes to these reload the config
+            inputs = o.conf.get_inputs() + o.func_file + o.filter_file
+            inputs = set([os.path.abspath(p) for p in inputs])
+            for path in inputs:
+                watcher.add(path, recursive=False)
+            watcher.add(o.dotpath)
+
+            # the templater stays loaded
+            templater = _get_templater(o)
+            _watch_install(o, dotfiles, templater, graph)
+            LOG.log('watching \"{}\" for changes'.format(o.dotpath))
+            while True:
+                changed = watcher.changes()
+                if o.debug:
+                    LOG.dbg('changed: {}'.format(', '.join(sorted(changed))))
+                if Watcher.ALL in changed or changed & inputs:
+                    new = _reload_options(o)
+                    if new:
+                        o = new
+                        break
+                    continue
+                selected = _watch_affected(o, dotfiles, changed, graph)
+                if selected:
+                    _watch_install(o, selected, templater, graph)
+            LOG.log('config reloaded')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return True
+
+
+def _watch_install(o, dotfiles, templater, graph):
+    """
+    install dotfiles for cmd_watch
+    @templater: the templater used for all dotfiles
+    @graph: the DepGraph updated with the templates each dotfile uses
+    """
+    t0 = time.time()
+    sched = _get_scheduler(o)
+    transcache = _get_transcache(o)
+    syncer = Syncer(mode=o.install_sync, debug=o.debug)
+    journal = _get_journal(o)
+    installed = 0
+    for rank, dotfile in enumerate(dotfiles):
+        r, key, err = _dotfile_install(o, dotfile,
+                                       scheduler=sched, rank=rank,
+                                       transcache=transcache,
+                                       syncer=syncer, journal=journal,
+                                       templater=templater, graph=graph)
+        if r:
+            installed += 1
+        elif err:
+            LOG.err('installing \"{}\" failed: {}'.format(key, err))
+    syncer.commit()
+    if journal:
+        journal.close()
+    if installed and not o.dry:
+        graph.save()
+    transcache.close()
+    sched.run_deferred()
+    sched.close()
+    if installed:
+        msg = '{} dotfile(s) installed in {:.3f}s'
+        LOG.log(msg.format(installed, time.time() - t0))
+
+
+def _watch_affected(o, dotfiles, changed, graph):
+    """return the dotfiles using the changed paths"""
+    keys = set()
+    for path in changed:
+        keys.update(graph.dependents(path=path))
+    selected = []
+    for dotfile in dotfiles:
+        if dotfile.key in keys:
+            selected.append(dotfile)
+            continue
+        src = os.path.normpath(os.path.join(o.dotpath, dotfile.src))
+        for path in changed:
+            if path == src or path.startswith(src + os.sep):
+                selected.append(dotfile)
+                break
+    return selected
+
+
+def _reload_options(o):
+    """read the config again, returns None on error"""
+    args = o.args.copy()
+    args['--no-banner'] = True
+    try:
+        return Options(args=args)
+    except (YamlException, UndefinedException) as e:
+        LOG.err('config error: {}'.format(str(e)))
+    return None
+
+
+def _dotfile_compare(o, dotfile, transcache=None, templater=None):
+    """
+    compare a dotfile
+    @transcache: the TransCache applying the transformations
+    @templater: the templater shared by the dotfiles, a new one if None
+    returns <same, list of (log function, message) to print>
+    """
+    out = []
+    # templater with the dotfile variables
+    t = templater or _get_templater(o)
+    t = t.overlay(dotfile.get_dotfile_variables())
     inst = Installer(create=o.create, backup=o.backup,
                      dry=o.dry, base=o.dotpath,
                      workdir=o.workdir, debug=o.debug,
@@ -257,83 +714,116 @@ def cmd_compare(o, tmp):
                      diff_cmd=o.diff_command)
     comp = Comparator(diff_cmd=o.diff_command, debug=o.debug)
 
-    for dotfile in selected:
-        if not dotfile.src and not dotfile.dst:
-            # ignore fake dotfile
-            continue
-        # add dotfile variables
-        t.restore_vars(tvars)
-        newvars = dotfile.get_dotfile_variables()
-        t.add_tmp_vars(newvars=newvars)
-
-        # dotfiles does not exist / not installed
+    # dotfiles does not exist / not installed
+    if o.debug:
+        LOG.dbg('comparing {}'.format(dotfile))
+    src = dotfile.src
+    if not os.path.lexists(os.path.expanduser(dotfile.dst)):
+        line = '=> compare {}: \"{}\" does not exist on destination'
+        out.append((LOG.log, line.format(dotfile.key, dotfile.dst)))
+        return False, out
+
+    # apply transformation
+    tmpsrc = None
+    if dotfile.trans_r:
         if o.debug:
-            LOG.dbg('comparing {}'.format(dotfile))
-        src = dotfile.src
-        if not os.path.lexists(os.path.expanduser(dotfile.dst)):
-            line = '=> compare {}: \"{}\" does not exist on destination'
-            LOG.log(line.format(dotfile.key, dotfile.dst))
-            same = False
-            continue
+            LOG.dbg('applying transformation before comparing')
+        tmpsrc = apply_trans(o, dotfile, t, transcache=transcache)
+        if not tmpsrc:
+            # could not apply trans
+            return False, out
+        src = tmpsrc
+
+    # is a symlink pointing to itself
+    asrc = os.path.join(o.dotpath, os.path.expanduser(src))
+    adst = os.path.expanduser(dotfile.dst)
+    if os.path.samefile(asrc, adst):
+        if o.debug:
+            line = '=> compare {}: diffing with \"{}\"'
+            LOG.dbg(line.format(dotfile.key, dotfile.dst))
+            LOG.dbg('points to itself')
+        return True, out
+
+    # render dotfile in memory and compare
+    ignores = uniq_list(o.compare_ignore + dotfile.cmpignore)
+    ignores = patch_ignores(ignores, dotfile.dst, debug=o.debug)
+    render = None
+    if dotfile.template:
+        render = functools.partial(inst.render, t)
+    try:
+        diff = comp.compare_src(asrc, dotfile.dst, render=render,
+                                ignore=ignores)
+    except UndefinedException as e:
+        # failed to render
+        err = str(e)
+        line = '=> compare {}: error'
+        out.append((LOG.log, line.format(dotfile.key, err)))
+        out.append((LOG.err, err))
+        diff = None
+
+    if diff is None:
+        return False, out
+    if diff == '':
+        # no difference
+        if o.debug:
+            line = '=> compare {}: diffing with \"{}\"'
+            LOG.dbg(line.format(dotfile.key, dotfile.dst))
+            LOG.dbg('same file')
+        return True, out
+
+    # diff results
+    line = '=> compare {}: diffing with \"{}\"'
+    out.append((LOG.log, line.format(dotfile.key, dotfile.dst)))
+    if o.compare_fileonly:
+        out.append((LOG.raw, '<files are different>'))
+    else:
+        out.append((LOG.emph, diff))
+    return False, out
 
-        # apply transformation
-        tmpsrc = None
-        if dotfile.trans_r:
-            if o.debug:
-                LOG.dbg('applying transformation before comparing')
-            tmpsrc = apply_trans(o.dotpath, dotfile, t, debug=o.debug)
-            if not tmpsrc:
-                # could not apply trans
-                same = False
-                continue
-            src = tmpsrc
 
-        # is a symlink pointing to itself
-        asrc = os.path.join(o.dotpath, os.path.expanduser(src))
-        adst = os.path.expanduser(dotfile.dst)
-        if os.path.samefile(asrc, adst):
-            if o.debug:
-                line = '=> compare {}: diffing with \"{}\"'
-                LOG.dbg(line.format(dotfile.key, dotfile.dst))
-                LOG.dbg('points to itself')
-            continue
+def cmd_compare(o, tmp):
+    """compare dotfiles and return True if all identical"""
+    dotfiles = o.dotfiles
+    if not dotfiles:
+        msg = 'no dotfile defined for this profile (\"{}\")'
+        LOG.warn(msg.format(o.profile))
+        return True
+    # compare only specific files
+    same = True
+    selected = dotfiles
+    if o.compare_focus:
+        selected = _select(o.compare_focus, dotfiles)
 
-        # install dotfile to temporary dir and compare
-        ret, err, insttmp = inst.install_to_temp(t, tmp, src, dotfile.dst,
-                                                 template=dotfile.template)
-        if not ret:
-            # failed to install to tmp
-            line = '=> compare {}: error'
-            LOG.log(line.format(dotfile.key, err))
-            LOG.err(err)
-            same = False
-            continue
-        ignores = list(set(o.compare_ignore + dotfile.cmpignore))
-        ignores = patch_ignores(ignores, dotfile.dst, debug=o.debug)
-        diff = comp.compare(insttmp, dotfile.dst, ignore=ignores)
-
-        # clean tmp transformed dotfile if any
-        if tmpsrc:
-            tmpsrc = os.path.join(o.dotpath, tmpsrc)
-            if os.path.exists(tmpsrc):
-                removepath(tmpsrc, LOG)
-
-        if diff == '':
-            # no difference
-            if o.debug:
-                line = '=> compare {}: diffing with \"{}\"'
-                LOG.dbg(line.format(dotfile.key, dotfile.dst))
-                LOG.dbg('same file')
-        else:
-            # print diff results
-            line = '=> compare {}: diffing with \"{}\"'
-            LOG.log(line.format(dotfile.key, dotfile.dst))
-            if o.compare_fileonly:
-                LOG.raw('<files are different>')
-            else:
-                LOG.emph(diff)
-            same = False
+    if len(selected) < 1:
+        return False
+
+    # ignore fake dotfiles
+    selected = [d for d in selected if d.src or d.dst]
 
+    transcache = _get_transcache(o)
+    # shared by all dotfiles
+    t = _get_templater(o)
+    if o.compare_parallel > 1:
+        # in parallel, results are printed in order
+        ex = futures.ThreadPoolExecutor(max_workers=o.compare_parallel)
+        wait_for = [
+            ex.submit(_dotfile_compare, o, dotfile, transcache=transcache,
+                      templater=t)
+            for dotfile in selected
+        ]
+        results = (f.result() for f in wait_for)
+    else:
+        # sequentially
+        results = (_dotfile_compare(o, dotfile, transcache=transcache,
+                                    templater=t)
+                   for dotfile in selected)
+
+    for r, out in results:
+        for func, msg in out:
+            func(msg)
+        if not r:
+            same = False
+    transcache.close()
     return same
 
 
@@ -342,8 +832,6 @@ def cmd_update(o):
     ret = True
     paths = o.update_path
     iskey = o.update_iskey
-    ignore = o.update_ignore
-    showpatch = o.update_showpatch
 
     if not paths:
         # update the entire profile
@@ -359,35 +847,108 @@ def cmd_update(o):
         LOG.log('no dotfile to update')
         return True
     if o.debug:
-        LOG.dbg('dotfile to update: {}'.format(paths))
+        LOG.dbg('update by {}: {}'.format('keys' if iskey else 'paths',
+                                          paths))
+
+    # hashes of the files compared, kept between runs
+    hashes = HashCache(get_cachedir(o.workdir), debug=o.debug)
+    scancache = ScanCache(get_cachedir(o.workdir), debug=o.debug)
+    # shared by all updates
+    t = _get_templater(o)
+    if o.update_parallel > 1:
+        # in parallel, output is grouped and prompts serialized
+        ex = futures.ThreadPoolExecutor(max_workers=o.update_parallel)
+        wait_for = [
+            ex.submit(_dotfile_update, o, batch, iskey,
+                      hashes=hashes, scancache=scancache, templater=t,
+                      group=True)
+            for batch in _update_batches(o, paths, iskey)
+        ]
+        for f in futures.as_completed(wait_for):
+            if not f.result():
+                ret = False
+    elif not _dotfile_update(o, paths, iskey, hashes=hashes,
+                             scancache=scancache, templater=t):
+        ret = False
+    hashes.save()
+    scancache.save()
+    return ret
+
 
+def _dotfile_update(o, paths, iskey, hashes=None, scancache=None,
+                    templater=None, group=False):
+    """
+    update the dotfile(s) from a list of path(s) or key(s)
+    @hashes: the HashCache used to compare files
+    @scancache: the ScanCache used to identify templates
+    @templater: the templater shared by the updates
+    @group: log the output of each dotfile at once
+    returns True if all succeeded
+    """
+    # the updater is not shared between threads
     updater = Updater(o.dotpath, o.variables,
                       o.conf.get_dotfile,
                       o.conf.get_dotfile_by_dst,
                       o.conf.path_to_dotfile_dst,
                       dry=o.dry, safe=o.safe, debug=o.debug,
-                      ignore=ignore, showpatch=showpatch)
-    if not iskey:
-        # update paths
-        if o.debug:
-            LOG.dbg('update by paths: {}'.format(paths))
-        for path in paths:
-            if not updater.update_path(path):
-                ret = False
-    else:
-        # update keys
-        keys = paths
-        if not keys:
-            # if not provided, take all keys
-            keys = [d.key for d in o.dotfiles]
-        if o.debug:
-            LOG.dbg('update by keys: {}'.format(keys))
-        for key in keys:
-            if not updater.update_key(key):
-                ret = False
+                      ignore=o.update_ignore,
+                      showpatch=o.update_showpatch,
+                      hashes=hashes, scancache=scancache,
+                      templater=templater)
+    ret = True
+    for path in paths:
+        if group:
+            with LOG.group():
+                r = _update_one(updater, path, iskey)
+        else:
+            r = _update_one(updater, path, iskey)
+        if not r:
+            ret = False
     return ret
 
 
+def _update_one(updater, path, iskey):
+    """update a dotfile from a path or a key"""
+    if iskey:
+        return updater.update_key(path)
+    return updater.update_path(path)
+
+
+def _update_batches(o, paths, iskey):
+    """
+    split paths or keys in batches updating independent
+    dotfiles, that is not sharing any source in the dotpath
+    """
+    batches = []
+    for path in paths:
+        if iskey:
+            dotfile = o.conf.get_dotfile(path)
+            dotfiles = [dotfile] if dotfile else []
+        else:
+            dotfiles = o.conf.get_dotfile_by_dst(os.path.expanduser(path))
+        srcs = set([os.path.normpath(d.src) for d in dotfiles
+                    if d and d.src])
+        # merge with the batches sharing a source
+        batch = ([path], srcs)
+        for other in list(batches):
+            if _overlap(srcs, other[1]):
+                batches.remove(other)
+                batch = (other[0] + batch[0], other[1] | batch[1])
+        batches.append(batch)
+    return [batch for batch, _ in batches]
+
+
+def _overlap(left, right):
+    """return True if a path in left contains or is in right"""
+    for lpath in left:
+        for rpath in right:
+            if lpath == rpath or \
+                    lpath.startswith(rpath + os.sep) or \
+                    rpath.startswith(lpath + os.sep):
+                return True
+    return False
+
+
 def cmd_importer(o):
     """import dotfile(s) from paths"""
     ret = True
@@ -491,9 +1052,9 @@ def cmd_importer(o):
                 if os.path.isdir(dst):
                     if os.path.exists(srcf):
                         shutil.rmtree(srcf)
-                    shutil.copytree(dst, srcf)
+                    filecopy.copytree(dst, srcf)
                 else:
-                    shutil.copy2(dst, srcf)
+                    filecopy.copy2(dst, srcf)
         retconf = o.conf.new(src, dst, linktype)
         if retconf:
             LOG.sub('\"{}\" imported'.format(path))
@@ -531,10 +1092,11 @@ def cmd_list_files(o):
     if o.files_templateonly:
         what = 'Template(s)'
     LOG.emph('{} for profile \"{}\":\n'.format(what, o.profile))
+    scancache = ScanCache(get_cachedir(o.workdir), debug=o.debug)
     for dotfile in o.dotfiles:
         if o.files_templateonly:
             src = os.path.join(o.dotpath, dotfile.src)
-            if not Templategen.is_template(src):
+            if not Templategen.is_template(src, cache=scancache):
                 continue
         if o.files_grepable:
             fmt = '{},dst:{},src:{},link:{}'
@@ -546,6 +1108,7 @@ def cmd_list_files(o):
             LOG.sub('dst: {}'.format(dotfile.dst))
             LOG.sub('src: {}'.format(dotfile.src))
             LOG.sub('link: {}'.format(dotfile.link.name.lower()))
+    scancache.save()
     LOG.log('')
 
 
@@ -557,11 +1120,17 @@ def cmd_detail(o):
     dotfiles = o.dotfiles
     if o.detail_keys:
         # filtered dotfiles to install
-        uniq = uniq_list(o.details_keys)
+        uniq = uniq_list(o.detail_keys)
         dotfiles = [d for d in dotfiles if d.key in uniq]
     LOG.emph('dotfiles details for profile \"{}\":\n'.format(o.profile))
+    templater = _get_templater(o)
+    graph = DepGraph(get_cachedir(o.workdir), debug=o.debug)
+    scancache = ScanCache(get_cachedir(o.workdir), debug=o.debug)
     for d in dotfiles:
-        _detail(o.dotpath, d)
+        _detail(o.dotpath, d, templater=templater, graph=graph,
+                scancache=scancache)
+    # the graph is only displayed, saved when installing
+    scancache.save()
     LOG.log('')
 
 
@@ -656,7 +1225,7 @@ def cmd_remove(o):
 ###########################################################
 
 
-def _get_install_installer(o, tmpdir=None):
+def _get_install_installer(o, tmpdir=None, syncer=None, journal=None):
     """get an installer instance for cmd_install"""
     inst = Installer(create=o.create, backup=o.backup,
                      dry=o.dry, safe=o.safe,
@@ -665,36 +1234,97 @@ def _get_install_installer(o, tmpdir=None):
                      totemp=tmpdir,
                      showdiff=o.install_showdiff,
                      backup_suffix=o.install_backup_suffix,
-                     diff_cmd=o.diff_command)
+                     diff_cmd=o.diff_command,
+                     syncer=syncer, journal=journal)
     return inst
 
 
+def _get_journal(o):
+    """get the journal of this install, None if not journaled"""
+    if o.dry or o.install_temporary or not o.install_journal:
+        return None
+    return Journal(o.workdir, keep=o.install_journal, debug=o.debug)
+
+
 def _get_templater(o):
     """get an templater instance"""
+    cache = get_cachedir(o.workdir, name='templates')
     t = Templategen(base=o.dotpath, variables=o.variables,
                     func_file=o.func_file, filter_file=o.filter_file,
-                    debug=o.debug)
+                    cache_dir=cache, debug=o.debug)
     return t
 
 
-def _detail(dotpath, dotfile):
-    """display details on all files under a dotfile entry"""
+def _detail(dotpath, dotfile, templater=None, graph=None, scancache=None):
+    """
+    display details on all files under a dotfile entry
+    @templater, @graph: the templater and DepGraph to display
+                        what the templates depend on
+    @scancache: the ScanCache used to identify templates
+    """
     LOG.log('{} (dst: \"{}\", link: {})'.format(dotfile.key, dotfile.dst,
                                                 dotfile.link.name.lower()))
     path = os.path.join(dotpath, os.path.expanduser(dotfile.src))
+    templates = []
     if not os.path.isdir(path):
         template = 'no'
-        if Templategen.is_template(path):
+        if Templategen.is_template(path, cache=scancache):
             template = 'yes'
+            templates.append(path)
         LOG.sub('{} (template:{})'.format(path, template))
     else:
         for root, _, files in os.walk(path):
             for f in files:
                 p = os.path.join(root, f)
                 template = 'no'
-                if Templategen.is_template(p):
+                if Templategen.is_template(p, cache=scancache):
                     template = 'yes'
+                    templates.append(p)
                 LOG.sub('{} (template:{})'.format(p, template))
+    if not templates or not dotfile.template or not graph:
+        return
+    deps = graph.record(dotfile.key, templates, templater)
+    paths = [os.path.relpath(p, dotpath) for p in deps['templates']]
+    if deps['dynamic']:
+        paths.append('<dynamic>')
+    if paths:
+        LOG.sub('templates: {}'.format(', '.join(paths)))
+    if deps['variables']:
+        LOG.sub('variables: {}'.format(', '.join(deps['variables'])))
+    if deps['helpers']:
+        LOG.sub('helpers: {}'.format(', '.join(deps['helpers'])))
+
+
+def _state_vars(dotfile, templater, ignores, deps=None):
+    """
+    return the hash of everything besides files a dotfile install uses
+    @deps: what the dotfile templates use (see DepGraph),
+           all the variables are hashed when None
+    """
+    variables = None
+    if dotfile.template:
+        variables = _used_variables(templater.variables, deps)
+    trans = None
+    if dotfile.trans_r:
+        trans = dotfile.trans_r.get_key(templater=templater)
+    return hash_vars(VERSION, variables, dotfile.template,
+                     dotfile.noempty, ignores, trans)
+
+
+def _used_variables(variables, deps):
+    """return the variables used by the templates of a dotfile"""
+    if not deps or deps['dynamic']:
+        return variables
+    used = {}
+    for name in deps['variables']:
+        if name not in variables:
+            continue
+        value = variables[name]
+        if name == 'env' and deps['env'] is not None and \
+                isinstance(value, Mapping):
+            value = {k: value.get(k) for k in deps['env']}
+        used[name] = value
+    return used
 
 
 def _select(selections, dotfiles):
@@ -712,23 +1342,19 @@ def _select(selections, dotfiles):
     return selected
 
 
-def apply_trans(dotpath, dotfile, templater, debug=False):
+def apply_trans(o, dotfile, templater, transcache=None):
     """
     apply the read transformation to the dotfile
-    return None if fails and new source if succeed
+    return None if fails and the path of the new source if succeed
     """
-    src = dotfile.src
-    new_src = '{}.{}'.format(src, TRANS_SUFFIX)
-    trans = dotfile.trans_r
-    if debug:
-        LOG.dbg('executing transformation: {}'.format(trans))
-    s = os.path.join(dotpath, src)
-    temp = os.path.join(dotpath, new_src)
-    if not trans.transform(s, temp, templater=templater, debug=debug):
+    if not transcache:
+        transcache = _get_transcache(o)
+    src = os.path.join(o.dotpath, dotfile.src)
+    new_src = transcache.apply(dotfile.trans_r, src, dotfile.key,
+                               templater=templater)
+    if not new_src:
         msg = 'transformation \"{}\" failed for {}'
-        LOG.err(msg.format(trans.key, dotfile.key))
-        if new_src and os.path.exists(new_src):
-            removepath(new_src, LOG)
+        LOG.err(msg.format(dotfile.trans_r.key, dotfile.key))
         return None
     return new_src
 
@@ -787,6 +1413,34 @@ def main():
                 LOG.dbg('running cmd: {}'.format(command))
             ret = cmd_install(o)
 
+        elif o.cmd_plan:
+            # plan the install of the dotfiles
+            command = 'plan'
+            if o.debug:
+                LOG.dbg('running cmd: {}'.format(command))
+            ret = cmd_plan(o)
+
+        elif o.cmd_apply:
+            # install the dotfiles as planned
+            command = 'apply'
+            if o.debug:
+                LOG.dbg('running cmd: {}'.format(command))
+            ret = cmd_apply(o)
+
+        elif o.cmd_rollback:
+            # restore what an install changed
+            command = 'rollback'
+            if o.debug:
+                LOG.dbg('running cmd: {}'.format(command))
+            ret = cmd_rollback(o)
+
+        elif o.cmd_watch:
+            # install the dotfiles on change
+            command = 'watch'
+            if o.debug:
+                LOG.dbg('running cmd: {}'.format(command))
+            ret = cmd_watch(o)
+
         elif o.cmd_compare:
             # compare local dotfiles with dotfiles stored in dotdrop
             command = 'compare'
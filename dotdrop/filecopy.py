@@ -0,0 +1,204 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+copy files with the fastest method available:
+reflink (copy-on-write), copy_file_range, sendfile
+and finally through userspace buffers
+"""
+
+import os
+import sys
+import stat
+import errno
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # not available on windows
+    fcntl = None
+
+
+# ioctl cloning a file on btrfs/xfs (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+# size of the chunks copied by the kernel
+CHUNK = 1024 * 1024 * 8
+
+# methods
+REFLINK = 'reflink'
+COPY_RANGE = 'copy_file_range'
+SENDFILE = 'sendfile'
+USERSPACE = 'userspace'
+
+# errors meaning a method is not supported for these files
+UNSUPPORTED = set([errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.ENOTTY,
+                   errno.EOPNOTSUPP, errno.EBADF, errno.ETXTBSY,
+                   errno.EPERM])
+
+# methods not working between two devices: (src dev, dst dev, method)
+_FAILED = set()
+_LOCK = threading.Lock()
+
+
+def copyfile(src, dst, mode=False, times=False):
+    """
+    copy the content of the file src to dst (following symlinks)
+    @mode: also copy the permission bits of src
+    @times: also copy the access and modification times of src
+    returns the method used
+    """
+    if _samefile(src, dst):
+        err = '{} and {} are the same file'.format(src, dst)
+        raise shutil.SameFileError(err)
+    with open(src, 'rb') as fsrc:
+        st = os.fstat(fsrc.fileno())
+        if not stat.S_ISREG(st.st_mode):
+            # fifo, device, ...
+            shutil.copyfile(src, dst)
+            _copy_meta(dst, None, st, mode, times)
+            return USERSPACE
+        with open(dst, 'wb') as fdst:
+            method = _copy_content(fsrc, fdst, st)
+            fdst.flush()
+            _copy_meta(dst, fdst.fileno(), st, mode, times)
+    return method
+
+
+def copy2(src, dst):
+    """copy the content, the permission bits and times of src to dst"""
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    copyfile(src, dst, mode=True, times=True)
+    return dst
+
+
+def copytree(src, dst, ignore=None, symlinks=False):
+    """
+    copy the directory src to dst (that must not exist)
+    with the content, permission bits and times of the files
+    @ignore: function returning the names to ignore (see shutil.copytree)
+    @symlinks: copy symlinks as symlinks instead of their target
+    returns dst
+    """
+    st = os.stat(src)
+    os.makedirs(dst)
+    with os.scandir(src) as it:
+        entries = list(it)
+    ignored = set()
+    if ignore:
+        ignored = set(ignore(src, [e.name for e in entries]))
+    errors = []
+    for entry in entries:
+        if entry.name in ignored:
+            continue
+        target = os.path.join(dst, entry.name)
+        try:
+            if entry.is_symlink() and symlinks:
+                os.symlink(os.readlink(entry.path), target)
+            elif entry.is_dir():
+                copytree(entry.path, target, ignore=ignore,
+                         symlinks=symlinks)
+            else:
+                copyfile(entry.path, target, mode=True, times=True)
+        except shutil.Error as e:
+            errors.extend(e.args[0])
+        except OSError as e:
+            errors.append((entry.path, target, str(e)))
+    _copy_meta(dst, None, st, True, True)
+    if errors:
+        raise shutil.Error(errors)
+    return dst
+
+
+def _copy_content(fsrc, fdst, st):
+    """copy the content of an opened file, returns the method used"""
+    infd = fsrc.fileno()
+    outfd = fdst.fileno()
+    dst_dev = os.fstat(outfd).st_dev
+    for method, func in [(REFLINK, _reflink),
+                         (COPY_RANGE, _copy_range),
+                         (SENDFILE, _sendfile)]:
+        key = (st.st_dev, dst_dev, method)
+        if key in _FAILED:
+            continue
+        try:
+            if func(infd, outfd, st.st_size):
+                return method
+        except OSError as e:
+            if e.errno not in UNSUPPORTED:
+                raise
+        if os.lseek(outfd, 0, os.SEEK_CUR) != 0 or \
+                os.lseek(infd, 0, os.SEEK_CUR) != 0:
+            # partially copied, start over
+            os.lseek(infd, 0, os.SEEK_SET)
+            os.lseek(outfd, 0, os.SEEK_SET)
+            os.ftruncate(outfd, 0)
+        with _LOCK:
+            _FAILED.add(key)
+    shutil.copyfileobj(fsrc, fdst)
+    return USERSPACE
+
+
+def _reflink(infd, outfd, size):
+    """share the blocks of infd with outfd on copy-on-write filesystems"""
+    if not fcntl or not sys.platform.startswith('linux'):
+        return False
+    fcntl.ioctl(outfd, FICLONE, infd)
+    return True
+
+
+def _copy_range(infd, outfd, size):
+    """copy in the kernel (also reflinks on some filesystems)"""
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    return _kernel_copy(os.copy_file_range, infd, outfd, size)
+
+
+def _sendfile(infd, outfd, size):
+    """copy in the kernel with sendfile"""
+    if not hasattr(os, 'sendfile') or not sys.platform.startswith('linux'):
+        return False
+
+    def send(infd, outfd, count):
+        return os.sendfile(outfd, infd, None, count)
+    return _kernel_copy(send, infd, outfd, size)
+
+
+def _kernel_copy(func, infd, outfd, size):
+    """
+    copy everything with func(infd, outfd, count) from the offsets,
+    returns False if it did not copy the size bytes of the file
+    (some filesystems report an end of file too early)
+    """
+    total = 0
+    while True:
+        copied = func(infd, outfd, CHUNK)
+        if not copied:
+            break
+        total += copied
+    return total == size
+
+
+def _samefile(src, dst):
+    """return True if src and dst are the same file"""
+    try:
+        return os.path.samefile(src, dst)
+    except OSError:
+        return False
+
+
+def _copy_meta(path, fd, st, mode, times):
+    """copy the permission bits and times from st to path/fd"""
+    if mode:
+        if fd is not None and os.chmod in os.supports_fd:
+            os.chmod(fd, stat.S_IMODE(st.st_mode))
+        else:
+            os.chmod(path, stat.S_IMODE(st.st_mode))
+    if times:
+        ns = (st.st_atime_ns, st.st_mtime_ns)
+        if fd is not None and os.utime in os.supports_fd:
+            os.utime(fd, ns=ns)
+        else:
+            os.utime(path, ns=ns)
@@ -0,0 +1,192 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+ignore patterns compiled once and matched
+against paths and their parent directories
+up to the root of the dotfile
+"""
+
+import os
+import re
+import copy
+import fnmatch
+
+# local imports
+from dotdrop.logger import Logger
+
+
+NEGATE = '!'
+STAR = '*'
+WILDCARDS = '*?['
+
+
+class _Patterns:
+    """
+    set of patterns, matched without going through
+    each one of them for the most common forms
+    """
+
+    def __init__(self):
+        # "path"
+        self.exact = set()
+        # "path*" and "*path" indexed by their length
+        self.prefixes = {}
+        self.suffixes = {}
+        # "*path*"
+        self.contains = []
+        # anything else: (longest literal part, regex)
+        self.others = []
+
+    def add(self, pattern):
+        """add a shell-style pattern"""
+        inner = pattern.strip(STAR)
+        if any(c in WILDCARDS for c in inner) or not inner:
+            literal = max(re.split(r'[*?\[\]]', pattern), key=len)
+            regex = re.compile(fnmatch.translate(pattern))
+            self.others.append((literal, regex))
+        elif pattern.startswith(STAR) and pattern.endswith(STAR):
+            self.contains.append(inner)
+        elif pattern.endswith(STAR):
+            self.prefixes.setdefault(len(inner), set()).add(inner)
+        elif pattern.startswith(STAR):
+            self.suffixes.setdefault(len(inner), set()).add(inner)
+        else:
+            self.exact.add(pattern)
+
+    def match(self, path):
+        """return True if any pattern matches path"""
+        if path in self.exact:
+            return True
+        for size, prefixes in self.prefixes.items():
+            if path[:size] in prefixes:
+                return True
+        for size, suffixes in self.suffixes.items():
+            if path[-size:] in suffixes:
+                return True
+        for inner in self.contains:
+            if inner in path:
+                return True
+        for literal, regex in self.others:
+            if literal in path and regex.match(path):
+                return True
+        return False
+
+
+class Ignore:
+
+    def __init__(self, patterns, debug=False):
+        """
+        constructor
+        @patterns: list of shell-style patterns, the ones
+                   starting with "!" un-ignore what they match
+        @debug: enable debug
+        """
+        self.patterns = list(patterns)
+        self.debug = debug
+        self.log = Logger()
+        # consecutive patterns of the same kind
+        # compiled together: [(negate, _Patterns), ...]
+        self._runs = []
+        # literal prefixes of the negated patterns
+        self._prefixes = []
+        # directories whose content inherits
+        # from its parent directory
+        self.roots = []
+        # result for the paths already matched
+        self._matched = {}
+        self._compile()
+
+    def _compile(self):
+        """compile the patterns"""
+        for pattern in self.patterns:
+            negate = pattern.startswith(NEGATE)
+            if negate:
+                pattern = pattern[len(NEGATE):]
+                self._prefixes.append(self._literal_prefix(pattern))
+            if not self._runs or self._runs[-1][0] != negate:
+                self._runs.append((negate, _Patterns()))
+            self._runs[-1][1].add(pattern)
+
+    def __bool__(self):
+        return bool(self._runs)
+
+    def __repr__(self):
+        return repr(self.patterns)
+
+    def within(self, roots):
+        """
+        return these patterns bound to the dotfile roots
+        (for example its src and dst), the content of an
+        ignored directory is ignored only below those
+        @roots: list of directories
+        """
+        ign = copy.copy(self)
+        ign.roots = [r.rstrip(os.sep) or os.sep for r in roots if r]
+        ign._matched = {}
+        return ign
+
+    def match(self, path):
+        """
+        return True if path is ignored, that is
+        the last pattern matching it is not negated
+        or, if none matches, its parent directory
+        within the roots is ignored
+        """
+        if not self._runs:
+            return False
+        ret = self._matched.get(path)
+        if ret is not None:
+            return ret
+        ret = self._last_match(path)
+        if ret is None:
+            parent = os.path.dirname(path)
+            ret = parent != path and self._inherits(parent) and \
+                self.match(parent)
+        self._matched[path] = ret
+        return ret
+
+    def _inherits(self, parent):
+        """return True if parent is a root or is under one"""
+        for root in self.roots:
+            if parent == root:
+                return True
+            if parent.startswith(root.rstrip(os.sep) + os.sep):
+                return True
+        return False
+
+    def prune(self, directory):
+        """
+        return True if directory and everything
+        under it is ignored and doesn't need to be walked
+        """
+        if not self.match(directory):
+            return False
+        # a negated pattern may match something underneath
+        sub = directory.rstrip(os.sep) + os.sep
+        for prefix in self._prefixes:
+            if prefix.startswith(sub) or sub.startswith(prefix):
+                return False
+        return True
+
+    def _last_match(self, path):
+        """
+        return True/False if the last pattern matching path
+        is not negated/negated, None if no pattern matches
+        """
+        for negate, patterns in reversed(self._runs):
+            if patterns.match(path):
+                if self.debug:
+                    msg = 'ignore{} match: {}'
+                    self.log.dbg(msg.format(' negated' if negate else '',
+                                            path))
+                return not negate
+        return None
+
+    @staticmethod
+    def _literal_prefix(pattern):
+        """return the part of pattern before any wildcard"""
+        for i, c in enumerate(pattern):
+            if c in WILDCARDS:
+                return pattern[:i]
+        return pattern
@@ -7,13 +7,15 @@ handle the installation of dotfiles
 
 import os
 import errno
-import shutil
 
 # local imports
 from dotdrop.logger import Logger
 from dotdrop.templategen import Templategen
 import dotdrop.utils as utils
+import dotdrop.differ as differ
+import dotdrop.atomic as atomic
 from dotdrop.exceptions import UndefinedException
+from dotdrop.statedb import hash_content, hash_file
 
 
 class Installer:
@@ -21,7 +23,8 @@ class Installer:
     def __init__(self, base='.', create=True, backup=True,
                  dry=False, safe=False, workdir='~/.config/dotdrop',
                  debug=False, diff=True, totemp=None, showdiff=False,
-                 backup_suffix='.dotdropbak', diff_cmd=''):
+                 backup_suffix='.dotdropbak', diff_cmd='', syncer=None,
+                 journal=None):
         """constructor
         @base: directory path where to search for templates
         @create: create directory hierarchy if missing when installing
@@ -35,6 +38,8 @@ class Installer:
         @showdiff: show the diff before overwriting (or asking for)
         @backup_suffix: suffix for dotfile backup file
         @diff_cmd: diff command to use
+        @syncer: the Syncer flushing the written files to disk
+        @journal: the Journal recording the changed paths
         """
         self.create = create
         self.backup = backup
@@ -48,8 +53,15 @@ class Installer:
         self.showdiff = showdiff
         self.backup_suffix = backup_suffix
         self.diff_cmd = diff_cmd
+        self.syncer = syncer
+        self.journal = journal
         self.comparing = False
         self.action_executed = False
+        # when a dict, hash of the content of each deployed file
+        self.rendered = None
+        # when set, the plan.Changes recording what would be
+        # installed instead of installing it
+        self.plan = None
         self.log = Logger()
 
     def _log_install(self, boolean, err):
@@ -100,6 +112,9 @@ class Installer:
             # symlink loop
             err = 'dotfile points to itself: {}'.format(dst)
             return self._log_install(False, err)
+        if ignore:
+            ignore = utils.get_ignore(ignore, debug=self.debug,
+                                      roots=[src, dst])
         isdir = os.path.isdir(src)
         if self.debug:
             self.log.dbg('install {} to {}'.format(src, dst))
@@ -200,8 +215,13 @@ class Installer:
             return self._log_install(False, err)
 
         dst = os.path.normpath(os.path.expanduser(dst))
-        if not os.path.lexists(dst):
+        if self.plan is not None and os.path.isfile(dst):
+            err = 'regular file {} would be replaced by a directory'
+            return self._log_install(False, err.format(dst))
+        if not os.path.lexists(dst) and self.plan is None:
             self.log.sub('creating directory "{}"'.format(dst))
+            if self.journal:
+                self.journal.record_mkdir(dst)
             os.makedirs(dst)
 
         if os.path.isfile(dst):
@@ -213,6 +233,8 @@ class Installer:
             if self.safe and not self.log.ask(msg):
                 err = 'ignoring "{}", nothing installed'.format(dst)
                 return self._log_install(False, err)
+            if self.journal:
+                self.journal.record(dst)
             os.unlink(dst)
             os.mkdir(dst)
 
@@ -263,6 +285,8 @@ class Installer:
         - False, error_msg: error
         - False, None, ignored
         """
+        if self.plan is not None:
+            return self.plan.link(src, dst), None
         overwrite = not self.safe
         if os.path.lexists(dst):
             if os.path.realpath(dst) == os.path.realpath(src):
@@ -280,6 +304,8 @@ class Installer:
                 err = 'ignoring "{}", link was not created'.format(dst)
                 return False, err
             overwrite = True
+            if self.journal:
+                self.journal.record(dst)
             try:
                 utils.removepath(dst)
             except OSError as e:
@@ -306,7 +332,11 @@ class Installer:
             except OSError as e:
                 err = 'something went wrong with {}: {}'.format(src, e)
                 return False, err
+        if self.journal:
+            self.journal.record(dst)
         os.symlink(src, dst)
+        if self.journal:
+            self.journal.done(dst)
         self.log.sub('linked {} to {}'.format(dst, src))
         return True, None
 
@@ -316,6 +346,14 @@ class Installer:
         tmp['_dotfile_sub_abs_dst'] = dst
         return tmp
 
+    def render(self, templater, src, dst):
+        """
+        return the content of the template src once installed to dst
+        may raise a UndefinedException
+        """
+        filevars = self._get_tmp_file_vars(src, dst)
+        return templater.overlay(filevars).generate(src)
+
     def _install_file(self, templater, src, dst,
                       actionexec=None, noempty=False,
                       ignore=[], template=True):
@@ -345,13 +383,10 @@ class Installer:
         content = None
         if template:
             # template the file
-            saved = templater.add_tmp_vars(self._get_tmp_file_vars(src, dst))
             try:
-                content = templater.generate(src)
+                content = self.render(templater, src, dst)
             except UndefinedException as e:
                 return False, str(e)
-            finally:
-                templater.restore_vars(saved)
             if noempty and utils.content_empty(content):
                 if self.debug:
                     self.log.dbg('ignoring empty template: {}'.format(src))
@@ -363,6 +398,11 @@ class Installer:
                                content=content,
                                actionexec=actionexec,
                                template=template)
+        if ret >= 0 and self.rendered is not None:
+            if content is None:
+                self.rendered[dst] = hash_file(src)
+            else:
+                self.rendered[dst] = hash_content(content)
 
         # build return values
         if ret < 0:
@@ -375,7 +415,7 @@ class Installer:
             return False, None
         if ret == 0:
             # success
-            if not self.dry and not self.comparing:
+            if not self.dry and not self.comparing and self.plan is None:
                 self.log.sub('copied {} to {}'.format(src, dst))
             return True, None
         # error
@@ -391,6 +431,11 @@ class Installer:
             self.log.dbg('ignore empty: {}'.format(noempty))
         # default to nothing installed and no error
         ret = False, None
+        if utils.must_prune([src, dst], ignore, debug=self.debug):
+            # nothing to install under this directory
+            if self.debug:
+                self.log.dbg('ignoring install of {} to {}'.format(src, dst))
+            return ret
         if not self._create_dirs(dst):
             err = 'creating directory for {}'.format(dst)
             return False, err
@@ -449,6 +494,8 @@ class Installer:
         content is always empty if template is False
         and is to be ignored
         """
+        if self.plan is not None:
+            return self._plan_write(src, dst, content=content)
         overwrite = not self.safe
         if self.dry:
             self.log.dry('would install {}'.format(dst))
@@ -487,6 +534,10 @@ class Installer:
                     self.log.warn('ignoring {}'.format(dst))
                     return 1, None
                 overwrite = True
+        if self.journal:
+            # parents first to be removed last on rollback
+            self.journal.record_mkdir(os.path.dirname(dst))
+            self.journal.record(dst)
         if self.backup and os.path.lexists(dst):
             self._backup(dst)
         base = os.path.dirname(dst)
@@ -504,12 +555,18 @@ class Installer:
                 self.log.warn('ignoring {}'.format(dst))
                 return 1, None
 
+        # a symlink left in place is written through
+        target = None
+        if self.journal:
+            target = self.journal.record_target(dst)
+
+        # written to a temporary file renamed over dst
         if template:
             # write content the file
             try:
-                with open(dst, 'wb') as f:
-                    f.write(content)
-                shutil.copymode(src, dst)
+                atomic.write_content(dst, content,
+                                     mode=os.stat(src).st_mode,
+                                     syncer=self.syncer)
             except NotADirectoryError as e:
                 err = 'opening dest file: {}'.format(e)
                 return -1, err
@@ -518,24 +575,47 @@ class Installer:
         else:
             # copy file
             try:
-                shutil.copyfile(src, dst)
-                shutil.copymode(src, dst)
+                atomic.copy_file(src, dst, syncer=self.syncer)
             except Exception as e:
                 return -1, str(e)
+        if self.journal:
+            self.journal.done(dst)
+            if target:
+                self.journal.done(target)
+        return 0, None
+
+    def _plan_write(self, src, dst, content=None):
+        """record the write to dst in the plan, see _write"""
+        if os.path.islink(dst) and not os.path.exists(dst):
+            err = 'broken symlink {}'.format(dst)
+            return -1, err
+        try:
+            if not self.plan.write(src, dst, content=content):
+                if self.debug:
+                    self.log.dbg('{} is the same'.format(dst))
+                return 1, None
+        except OSError as e:
+            return -1, str(e)
         return 0, None
 
     def _diff_before_write(self, src, dst, content=None, quiet=False):
         """
         diff before writing
         using a temp file if content is not None
+        and an external diff command is used
         returns diff string ('' if same)
         """
         tmp = None
-        if content:
-            tmp = utils.write_to_tmpfile(content)
-            src = tmp
-        diff = utils.diff(modified=src, original=dst, raw=False,
-                          diff_cmd=self.diff_cmd)
+        builtin = self.diff_cmd in ['', utils.DIFF_CMD]
+        if content and builtin and differ.can_diff(dst, src):
+            # no need for a temp file
+            diff = differ.diff_with_content(dst, content, src)
+        else:
+            if content:
+                tmp = utils.write_to_tmpfile(content)
+                src = tmp
+            diff = utils.diff(modified=src, original=dst, raw=False,
+                              diff_cmd=self.diff_cmd)
         if tmp:
             utils.removepath(tmp, logger=self.log)
 
@@ -554,13 +634,15 @@ class Installer:
             if self.debug:
                 self.log.dbg('no mkdir as \"create\" set to false in config')
             return False
-        if os.path.exists(directory):
+        if os.path.exists(directory) or self.plan is not None:
             return True
         if self.dry:
             self.log.dry('would mkdir -p {}'.format(directory))
             return True
         if self.debug:
             self.log.dbg('mkdir -p {}'.format(directory))
+        if self.journal:
+            self.journal.record_mkdir(directory)
         os.makedirs(directory)
         return os.path.exists(directory)
 
@@ -570,7 +652,9 @@ class Installer:
             return
         dst = path.rstrip(os.sep) + self.backup_suffix
         self.log.log('backup {} to {}'.format(path, dst))
-        os.rename(path, dst)
+        if self.journal:
+            self.journal.record(dst)
+        atomic.backup(path, dst)
 
     def _pivot_path(self, path, newdir, striphome=False):
         """change path to be under newdir"""
@@ -0,0 +1,293 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+journal the paths changed by each install
+and restore them on rollback
+"""
+
+import os
+import json
+import stat
+import datetime
+import threading
+
+# local imports
+from dotdrop.logger import Logger
+from dotdrop.statedb import hash_file
+from dotdrop.utils import removepath
+import dotdrop.atomic as atomic
+
+
+# the types of snapshot
+MISSING = 'missing'
+FILE = 'file'
+LINK = 'link'
+DIRECTORY = 'directory'
+OTHER = 'other'
+# format of the run ids
+IDFMT = '%Y%m%d-%H%M%S-%f'
+# seconds of slack when comparing the time an
+# object was last used with the start of a run
+# (timestamps are coarse on some filesystems)
+SLACK = 2
+
+
+class Journal:
+
+    dirname = 'journal'
+    objects = 'objects'
+    suffix = '.jsonl'
+
+    def __init__(self, workdir, keep=10, debug=False):
+        """
+        constructor
+        @workdir: the workdir the journal is kept in
+        @keep: number of runs kept, 0 to disable the journal
+        @debug: enable debug
+        """
+        self.path = os.path.join(os.path.expanduser(workdir), self.dirname)
+        self.objpath = os.path.join(self.path, self.objects)
+        self.keep = keep
+        self.debug = debug
+        self.log = Logger()
+        self.lock = threading.Lock()
+        now = datetime.datetime.now()
+        self.id = now.strftime(IDFMT)
+        # the paths recorded during this run
+        self.recorded = set()
+        self._file = None
+
+    def record(self, path):
+        """record the state of path before it is changed by this run"""
+        if not self.keep:
+            return
+        path = os.path.normpath(path)
+        with self.lock:
+            if path in self.recorded:
+                # only its state before the run matters
+                return
+            self.recorded.add(path)
+        before = self._snapshot(path)
+        self._append({'path': path, 'before': before})
+
+    def record_mkdir(self, directory):
+        """record the creation of directory and its missing parents"""
+        directory = os.path.normpath(directory)
+        top = None
+        while directory and not os.path.lexists(directory):
+            top = directory
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+        if top:
+            self.record(top)
+
+    def record_target(self, path):
+        """
+        record the file the symlink at path points to,
+        returns it if written through the symlink, None otherwise
+        """
+        if not self.keep or not os.path.islink(path):
+            return None
+        target = os.path.realpath(path)
+        if not os.path.isfile(target):
+            return None
+        self.record(target)
+        return target
+
+    def done(self, path):
+        """record the state of path once changed"""
+        if not self.keep:
+            return
+        path = os.path.normpath(path)
+        self._append({'path': path, 'after': _state(path)})
+
+    def close(self):
+        """close this run and prune the old ones"""
+        with self.lock:
+            if not self._file:
+                return
+            self._file.close()
+            self._file = None
+        if self.debug:
+            msg = 'install journaled as \"{}\" in {}'
+            self.log.dbg(msg.format(self.id, self.path))
+        self._prune()
+
+    def runs(self):
+        """return the journaled runs, oldest first"""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted([f[:-len(self.suffix)] for f in os.listdir(self.path)
+                       if f.endswith(self.suffix)])
+
+    def entries(self, run):
+        """
+        return the paths changed by a run in the order they were changed
+        as dict with their path, state before and after (if known)
+        """
+        entries = {}
+        with open(self._journal(run), 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # interrupted while writing
+                    continue
+                path = record['path']
+                if 'before' in record:
+                    entries[path] = {'path': path,
+                                     'before': record['before'],
+                                     'after': None}
+                elif path in entries:
+                    entries[path]['after'] = record['after']
+        return list(entries.values())
+
+    def changed(self, entry):
+        """return True if the path changed since recorded"""
+        if entry['after'] is None:
+            return False
+        return _state(entry['path']) != entry['after']
+
+    def restore(self, entry):
+        """restore the state of a path before its run"""
+        self._restore(entry['path'], entry['before'])
+
+    def forget(self, run):
+        """remove a run from the journal"""
+        path = self._journal(run)
+        if os.path.exists(path):
+            os.remove(path)
+        self._prune()
+
+    def _append(self, record):
+        """append a record to the journal of this run"""
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            if not self._file:
+                os.makedirs(self.path, mode=0o700, exist_ok=True)
+                self._file = open(self._journal(self.id), 'a')
+            self._file.write(line)
+            self._file.flush()
+
+    def _journal(self, run):
+        """return the path of the journal of a run"""
+        return os.path.join(self.path, run + self.suffix)
+
+    def _snapshot(self, path):
+        """return the state of path, storing its content"""
+        if not os.path.lexists(path):
+            return {'type': MISSING}
+        if os.path.islink(path):
+            return {'type': LINK, 'target': os.readlink(path)}
+        st = os.lstat(path)
+        mode = stat.S_IMODE(st.st_mode)
+        if stat.S_ISDIR(st.st_mode):
+            entries = {}
+            for name in sorted(os.listdir(path)):
+                sub = os.path.join(path, name)
+                entries[name] = self._snapshot(sub)
+            return {'type': DIRECTORY, 'mode': mode, 'entries': entries}
+        if not stat.S_ISREG(st.st_mode):
+            return {'type': OTHER}
+        return {'type': FILE, 'hash': self._store(path), 'mode': mode}
+
+    def _store(self, path):
+        """store the content of a file, returns its hash"""
+        digest = hash_file(path)
+        obj = os.path.join(self.objpath, digest)
+        if not os.path.exists(obj):
+            os.makedirs(self.objpath, mode=0o700, exist_ok=True)
+            atomic.copy_file(path, obj, mode=0o600)
+        # last used by this run
+        os.utime(obj)
+        return digest
+
+    def _restore(self, path, snapshot):
+        """restore path to snapshot"""
+        kind = snapshot['type']
+        if kind == OTHER:
+            self.log.warn('cannot restore special file {}'.format(path))
+            return
+        if kind == MISSING:
+            if os.path.isdir(path) and not os.path.islink(path):
+                # created directory, keep what was added since
+                _remove_empty(path)
+                if os.path.exists(path):
+                    self.log.warn('{} is not empty'.format(path))
+            elif os.path.lexists(path):
+                removepath(path)
+            return
+        if os.path.lexists(path):
+            islink = os.path.islink(path)
+            isdir = os.path.isdir(path) and not islink
+            isfile = not islink and not isdir
+            # files are replaced atomically
+            if not (kind == DIRECTORY and isdir) and \
+                    not (kind == FILE and isfile):
+                removepath(path)
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        if kind == LINK:
+            os.symlink(snapshot['target'], path)
+        elif kind == FILE:
+            obj = os.path.join(self.objpath, snapshot['hash'])
+            atomic.copy_file(obj, path, mode=snapshot['mode'])
+        else:
+            os.makedirs(path, exist_ok=True)
+            for name, sub in snapshot['entries'].items():
+                self._restore(os.path.join(path, name), sub)
+            os.chmod(path, snapshot['mode'])
+
+    def _prune(self):
+        """remove the old runs and the content they only use"""
+        runs = self.runs()
+        if not self.keep:
+            # journal disabled, nothing new to prune
+            runs = []
+        for run in runs[:max(0, len(runs) - self.keep)]:
+            if self.debug:
+                self.log.dbg('pruning journal of \"{}\"'.format(run))
+            os.remove(self._journal(run))
+        if not os.path.isdir(self.objpath):
+            return
+        # the content is touched by each run storing it,
+        # what was last used before the oldest run is unused
+        runs = self.runs()
+        oldest = None
+        if runs:
+            try:
+                start = datetime.datetime.strptime(runs[0], IDFMT)
+            except ValueError:
+                # not a run of ours
+                return
+            oldest = start.timestamp() - SLACK
+        for obj in os.listdir(self.objpath):
+            path = os.path.join(self.objpath, obj)
+            if oldest is None or os.stat(path).st_mtime < oldest:
+                os.remove(path)
+
+
+def _state(path):
+    """return the state of path without storing its content"""
+    if not os.path.lexists(path):
+        return {'type': MISSING}
+    if os.path.islink(path):
+        return {'type': LINK, 'target': os.readlink(path)}
+    if os.path.isdir(path):
+        return {'type': DIRECTORY}
+    if not os.path.isfile(path):
+        return {'type': OTHER}
+    return {'type': FILE, 'hash': hash_file(path)}
+
+
+def _remove_empty(path):
+    """remove path and its sub-directories if they contain no file"""
+    for root, dirs, files in os.walk(path, topdown=False):
+        try:
+            os.rmdir(root)
+        except OSError:
+            pass
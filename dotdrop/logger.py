@@ -7,6 +7,14 @@ provide logging functions
 
 import sys
 import inspect
+import threading
+from contextlib import contextmanager
+
+
+# output buffered by the threads logging in group
+_LOCAL = threading.local()
+# held while writing a group or prompting
+_CONSOLE = threading.RLock()
 
 
 class Logger:
@@ -34,28 +42,30 @@ class Logger:
                                           end, ce)
         else:
             fmt = '{}{}{}{}{}'.format(pre, cs, string, end, ce)
-        sys.stdout.write(fmt)
+        self._write(sys.stdout, fmt)
 
     def sub(self, string, end='\n'):
         cs = self._color(self.BLUE)
         ce = self._color(self.RESET)
-        sys.stdout.write('\t{}->{} {}{}'.format(cs, ce, string, end))
+        line = '\t{}->{} {}{}'.format(cs, ce, string, end)
+        self._write(sys.stdout, line)
 
     def emph(self, string):
         cs = self._color(self.EMPH)
         ce = self._color(self.RESET)
-        sys.stderr.write('{}{}{}'.format(cs, string, ce))
+        self._write(sys.stderr, '{}{}{}'.format(cs, string, ce))
 
     def err(self, string, end='\n'):
         cs = self._color(self.RED)
         ce = self._color(self.RESET)
         msg = '{} {}'.format(string, end)
-        sys.stderr.write('{}[ERR] {}{}'.format(cs, msg, ce))
+        self._write(sys.stderr, '{}[ERR] {}{}'.format(cs, msg, ce))
 
     def warn(self, string, end='\n'):
         cs = self._color(self.YELLOW)
         ce = self._color(self.RESET)
-        sys.stderr.write('{}[WARN] {} {}{}'.format(cs, string, end, ce))
+        line = '{}[WARN] {} {}{}'.format(cs, string, end, ce)
+        self._write(sys.stderr, line)
 
     def dbg(self, string):
         frame = inspect.stack()[1]
@@ -66,23 +76,71 @@ class Logger:
         cl = self._color(self.LMAGENTA)
         bl = self._color(self.BOLD)
         line = '{}{}[DEBUG][{}.{}]{}{} {}{}\n'
-        sys.stderr.write(line.format(bl, cl, mod, func, ce, cs, string, ce))
+        line = line.format(bl, cl, mod, func, ce, cs, string, ce)
+        self._write(sys.stderr, line)
 
     def dry(self, string, end='\n'):
         cs = self._color(self.GREEN)
         ce = self._color(self.RESET)
-        sys.stdout.write('{}[DRY] {} {}{}'.format(cs, string, end, ce))
+        self._write(sys.stdout, '{}[DRY] {} {}{}'.format(cs, string, end, ce))
 
     def raw(self, string, end='\n'):
-        sys.stdout.write('{}{}'.format(string, end))
+        self._write(sys.stdout, '{}{}'.format(string, end))
 
     def ask(self, query):
+        if self._buffer() is not None and not _LOCAL.owner:
+            # keep the console until the end of the group
+            _CONSOLE.acquire()
+            _LOCAL.owner = True
+            self._flush()
         cs = self._color(self.BLUE)
         ce = self._color(self.RESET)
         q = '{}{}{}'.format(cs, query + ' [y/N] ? ', ce)
         r = input(q)
         return r == 'y'
 
+    @contextmanager
+    def group(self):
+        """
+        buffer what this thread logs and write it at once,
+        prompts are serialized and first write what
+        was buffered
+        """
+        _LOCAL.buffer = []
+        _LOCAL.owner = False
+        try:
+            yield
+        finally:
+            with _CONSOLE:
+                self._flush()
+            if _LOCAL.owner:
+                _CONSOLE.release()
+            _LOCAL.buffer = None
+            _LOCAL.owner = False
+
+    def _write(self, stream, string):
+        """write to stream or to the buffer of the group"""
+        buf = self._buffer()
+        if buf is None or _LOCAL.owner:
+            stream.write(string)
+            return
+        buf.append((stream, string))
+
+    def _flush(self):
+        """write what was buffered"""
+        buf = self._buffer()
+        if not buf:
+            return
+        for stream, string in buf:
+            stream.write(string)
+            stream.flush()
+        del buf[:]
+
+    @staticmethod
+    def _buffer():
+        """the buffer of the group of this thread if any"""
+        return getattr(_LOCAL, 'buffer', None)
+
     def _color(self, col):
         if not sys.stdout.isatty():
             return ''
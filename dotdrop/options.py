@@ -16,7 +16,7 @@ from dotdrop.linktypes import LinkTypes
 from dotdrop.logger import Logger
 from dotdrop.cfg_aggregator import CfgAggregator as Cfg
 from dotdrop.action import Action
-from dotdrop.utils import uniq_list
+from dotdrop.utils import uniq_list, get_cachedir
 from dotdrop.exceptions import YamlException
 
 ENV_PROFILE = 'DOTDROP_PROFILE'
@@ -54,12 +54,18 @@ USAGE = """
 Usage:
   dotdrop install   [-VbtfndDa] [-c <path>] [-p <profile>]
                                 [-w <nb>] [<key>...]
+  dotdrop plan      [-Vba]      [-c <path>] [-p <profile>]
+                                [-w <nb>] [-o <path>] [<key>...]
+  dotdrop apply     [-Vbfd]     [-c <path>] [-p <profile>]
+                                [-w <nb>] <plan>
+  dotdrop rollback  [-Vbfd]     [-c <path>] [-p <profile>] [<run>]
+  dotdrop watch     [-VbfnD]    [-c <path>] [-p <profile>] [<key>...]
   dotdrop import    [-Vbdf]     [-c <path>] [-p <profile>] [-s <path>]
                                 [-l <link>] <path>...
   dotdrop compare   [-LVb]      [-c <path>] [-p <profile>]
-                                [-C <file>...] [-i <pattern>...]
+                                [-w <nb>] [-C <file>...] [-i <pattern>...]
   dotdrop update    [-VbfdkP]   [-c <path>] [-p <profile>]
-                                [-i <pattern>...] [<path>...]
+                                [-w <nb>] [-i <pattern>...] [<path>...]
   dotdrop remove    [-Vbfdk]    [-c <path>] [-p <profile>] [<path>...]
   dotdrop files     [-VbTG]     [-c <path>] [-p <profile>]
   dotdrop detail    [-Vb]       [-c <path>] [-p <profile>] [<key>...]
@@ -82,6 +88,7 @@ Options:
   -i --ignore=<pattern>   Pattern to ignore.
   -k --key                Treat <path> as a dotfile key.
   -n --nodiff             Do not diff when installing.
+  -o --output=<path>      Write the plan to this file instead of stdout.
   -P --show-patch         Provide a one-liner to manually patch template.
   -s --as=<path>          Import as a different path from actual path.
   -t --temp               Install to a temporary directory for review.
@@ -138,7 +145,8 @@ class Options(AttrMonitor):
         self._fill_attr()
         if ENV_NOBANNER not in os.environ \
            and self.banner \
-           and not self.args['--no-banner']:
+           and not self.args['--no-banner'] \
+           and not (self.args['plan'] and not self.args['--output']):
             self._header()
         self._debug_attr()
         # start monitoring for bad attribute
@@ -190,8 +198,13 @@ class Options(AttrMonitor):
 
     def _read_config(self):
         """read the config file"""
+        cache = None
+        readonly = not self.args['import'] and not self.args['remove']
+        if readonly:
+            # the config is not modified
+            cache = get_cachedir(HOMECFG, name='config')
         self.conf = Cfg(self.confpath, self.profile, debug=self.debug,
-                        dry=self.dry)
+                        dry=self.dry, cache_dir=cache, readonly=readonly)
         # transform the config settings to self attribute
         self._debug_dict('effective settings', self.conf.get_settings())
         for k, v in self.conf.get_settings().items():
@@ -203,6 +216,10 @@ class Options(AttrMonitor):
         self.cmd_profiles = self.args['profiles']
         self.cmd_files = self.args['files']
         self.cmd_install = self.args['install']
+        self.cmd_plan = self.args['plan']
+        self.cmd_apply = self.args['apply']
+        self.cmd_rollback = self.args['rollback']
+        self.cmd_watch = self.args['watch']
         self.cmd_compare = self.args['compare']
         self.cmd_import = self.args['import']
         self.cmd_update = self.args['update']
@@ -246,10 +263,23 @@ class Options(AttrMonitor):
         except ValueError:
             self.log.err('bad option for --workers')
             sys.exit(USAGE)
-        if self.safe and self.install_parallel > 1:
+        if self.cmd_install and self.safe and self.install_parallel > 1:
             self.log.err('\"-w --workers\" must be used with \"-f --force\"')
             sys.exit(USAGE)
 
+        # "plan" specifics
+        self.plan_keys = self.args['<key>']
+        self.plan_output = self.args['--output']
+
+        # "apply" specifics
+        self.apply_path = self.args['<plan>']
+
+        # "watch" specifics
+        self.watch_keys = self.args['<key>']
+
+        # "rollback" specifics
+        self.rollback_run = self.args['<run>']
+
         # "compare" specifics
         self.compare_focus = self.args['--file']
         self.compare_ignore = self.args['--ignore']
@@ -257,6 +287,7 @@ class Options(AttrMonitor):
         self.compare_ignore.append('*{}'.format(self.install_backup_suffix))
         self.compare_ignore = uniq_list(self.compare_ignore)
         self.compare_fileonly = self.args['--file-only']
+        self.compare_parallel = self.install_parallel
 
         # "import" specifics
         self.import_path = self.args['<path>']
@@ -270,6 +301,7 @@ class Options(AttrMonitor):
         self.update_ignore.append('*{}'.format(self.install_backup_suffix))
         self.update_ignore = uniq_list(self.update_ignore)
         self.update_showpatch = self.args['--show-patch']
+        self.update_parallel = self.install_parallel
 
         # "detail" specifics
         self.detail_keys = self.args['<key>']
@@ -0,0 +1,315 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+plan the install of dotfiles and apply it later
+without templating them again
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+
+# local imports
+from dotdrop.logger import Logger
+from dotdrop.action import Action
+from dotdrop.statedb import hash_content, hash_file
+from dotdrop.utils import get_cachedir, removepath
+import dotdrop.atomic as atomic
+
+
+# the kinds of changes
+WRITE = 'write'
+LINK = 'link'
+
+# what is planned for a dotfile
+INSTALL = 'install'
+NOTHING = 'none'
+
+# the state of a directory
+DIRECTORY = 'directory'
+
+
+class Changes:
+
+    def __init__(self, blobs, sources=True):
+        """
+        the changes planned for a dotfile
+        @blobs: directory storing the content to write
+        @sources: check the sources did not change when applied
+        """
+        self.blobs = blobs
+        self.sources = sources
+        self.changes = []
+
+    def write(self, src, dst, content=None):
+        """
+        plan to write content (or the content of src
+        when None) to dst with the permission bits of src
+        returns True if a change is planned, False if
+        dst is already the same
+        """
+        if content is None:
+            digest = hash_file(src)
+        else:
+            digest = hash_content(content)
+        mode = os.stat(src).st_mode & 0o7777
+        previous = state(dst, follow=True)
+        if previous == digest and os.stat(dst).st_mode & 0o7777 == mode:
+            return False
+        blob = os.path.join(self.blobs, digest)
+        if not os.path.exists(blob):
+            os.makedirs(self.blobs, mode=0o700, exist_ok=True)
+            if content is None:
+                atomic.copy_file(src, blob, mode=0o600)
+            else:
+                atomic.write_content(blob, content, mode=0o600)
+        self.changes.append({
+            'kind': WRITE,
+            'src': src,
+            'dst': dst,
+            'hash': digest,
+            'mode': mode,
+            'source': state(src) if self.sources else None,
+            'previous': previous,
+        })
+        return True
+
+    def link(self, src, dst):
+        """
+        plan to symlink dst to src
+        returns True if a change is planned, False if
+        dst is already the same
+        """
+        if os.path.lexists(dst) and \
+                os.path.realpath(dst) == os.path.realpath(src):
+            return False
+        self.changes.append({
+            'kind': LINK,
+            'src': src,
+            'dst': dst,
+            'previous': state(dst),
+        })
+        return True
+
+    def digest(self):
+        """return the hash of all the changes"""
+        h = hashlib.sha256()
+        for change in self.changes:
+            h.update(json.dumps(change, sort_keys=True).encode('utf-8'))
+        return h.hexdigest()
+
+
+class Plan:
+
+    # version of the plan format
+    VERSION = 1
+
+    def __init__(self, workdir, profile=None, debug=False):
+        """
+        constructor
+        @workdir: the workdir the content to write is stored in
+        @profile: the profile planned
+        @debug: enable debug
+        """
+        self.id = '{}-{}'.format(time.strftime('%Y%m%d-%H%M%S'),
+                                 uuid.uuid4().hex[:8])
+        self.blobs = os.path.join(get_cachedir(workdir, name='plans'),
+                                  self.id)
+        self.profile = profile
+        self.debug = debug
+        self.log = Logger()
+        self.dotfiles = []
+        self.pre_actions = []
+        self.post_actions = []
+
+    def changes(self, sources=True):
+        """return a new object recording the changes of a dotfile"""
+        return Changes(self.blobs, sources=sources)
+
+    def add(self, dotfile, changes, pre_actions, post_actions):
+        """
+        add the planned changes of a dotfile
+        @pre_actions, @post_actions: the actions executed
+                                     (see serialize_actions)
+        """
+        action = INSTALL if changes.changes else NOTHING
+        self.dotfiles.append({
+            'key': dotfile.key,
+            'src': dotfile.src,
+            'dst': dotfile.dst,
+            'action': action,
+            'hash': changes.digest(),
+            'changes': changes.changes,
+            'pre_actions': pre_actions,
+            'post_actions': post_actions,
+        })
+
+    def count(self):
+        """return the number of dotfiles to install"""
+        return len([d for d in self.dotfiles if d['action'] == INSTALL])
+
+    def dumps(self):
+        """return the plan as json"""
+        return json.dumps({
+            'version': self.VERSION,
+            'id': self.id,
+            'profile': self.profile,
+            'blobs': self.blobs,
+            'pre_actions': self.pre_actions,
+            'post_actions': self.post_actions,
+            'dotfiles': self.dotfiles,
+        }, indent=2)
+
+    def discard(self):
+        """remove the content stored for this plan"""
+        if os.path.exists(self.blobs):
+            removepath(self.blobs, logger=self.log)
+
+    @classmethod
+    def load(cls, path, workdir, debug=False):
+        """load the plan from path, raises ValueError if invalid"""
+        try:
+            with open(os.path.expanduser(path), 'r') as f:
+                data = json.load(f)
+        except OSError as e:
+            raise ValueError('unable to read plan: {}'.format(e))
+        if not isinstance(data, dict) or \
+                data.get('version') != cls.VERSION:
+            raise ValueError('unsupported plan {}'.format(path))
+        plan = cls(workdir, profile=data.get('profile'), debug=debug)
+        try:
+            plan.id = data['id']
+            plan.blobs = data['blobs']
+            plan.pre_actions = data['pre_actions']
+            plan.post_actions = data['post_actions']
+            plan.dotfiles = data['dotfiles']
+        except KeyError as e:
+            raise ValueError('bad plan {}: missing {}'.format(path, e))
+        return plan
+
+    def check(self):
+        """
+        check the preconditions of each change still hold
+        returns the list of errors
+        """
+        errs = []
+        for dotfile in self.dotfiles:
+            if dotfile['action'] != INSTALL:
+                continue
+            for change in dotfile['changes']:
+                err = self._check(change)
+                if err:
+                    msg = '\"{}\": {}'.format(dotfile['key'], err)
+                    errs.append(msg)
+        return errs
+
+    def _check(self, change):
+        """check the preconditions of a change, returns the error if any"""
+        dst = change['dst']
+        if change['kind'] == LINK:
+            if state(dst) != change['previous']:
+                return '{} changed since planned'.format(dst)
+            return None
+        blob = os.path.join(self.blobs, change['hash'])
+        if not os.path.exists(blob) or hash_file(blob) != change['hash']:
+            return 'content for {} is missing or corrupted'.format(dst)
+        if change['source'] is not None and \
+                state(change['src']) != change['source']:
+            return '{} changed since planned'.format(change['src'])
+        if state(dst, follow=True) != change['previous']:
+            return '{} changed since planned'.format(dst)
+        return None
+
+    def apply(self, change, backup_suffix=None, syncer=None, journal=None):
+        """
+        apply a change
+        @backup_suffix: backup the replaced files with this suffix
+        @syncer: the Syncer flushing the written files
+        @journal: the Journal recording the changed paths
+        """
+        dst = change['dst']
+        directory = os.path.dirname(dst)
+        target = None
+        if journal:
+            journal.record_mkdir(directory)
+            journal.record(dst)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if change['kind'] == LINK:
+            if os.path.lexists(dst):
+                removepath(dst)
+            os.symlink(change['src'], dst)
+            self.log.sub('linked {} to {}'.format(dst, change['src']))
+        else:
+            if backup_suffix and os.path.lexists(dst):
+                bak = dst.rstrip(os.sep) + backup_suffix
+                self.log.log('backup {} to {}'.format(dst, bak))
+                if journal:
+                    journal.record(bak)
+                atomic.backup(dst, bak)
+            # a symlink left in place is written through
+            if journal:
+                target = journal.record_target(dst)
+            blob = os.path.join(self.blobs, change['hash'])
+            atomic.copy_file(blob, dst, mode=change['mode'], syncer=syncer)
+            self.log.sub('copied {} to {}'.format(change['src'], dst))
+        if journal:
+            journal.done(dst)
+            if target:
+                journal.done(target)
+
+
+def serialize_actions(actions, templater):
+    """
+    return the actions along with their templated command
+    as a list of dict, None if an action cannot be templated
+    """
+    lst = []
+    for action in actions:
+        cmd = action.get_cmd(templater=templater)
+        if cmd is None:
+            return None
+        lst.append({
+            'key': action.key,
+            'kind': action.kind,
+            'cmd': cmd,
+            'after': action.after,
+            'provides': action.provides,
+            'timeout': action.timeout,
+        })
+    return lst
+
+
+def deserialize_actions(lst):
+    """return the actions serialized with serialize_actions"""
+    actions = []
+    for item in lst:
+        # the command is already templated and formatted
+        cmd = item['cmd'].replace('{', '{{').replace('}', '}}')
+        actions.append(Action(item['key'], item['kind'], cmd,
+                              after=item['after'],
+                              provides=item['provides'],
+                              timeout=item['timeout']))
+    return actions
+
+
+def state(path, follow=False):
+    """
+    return the state of path compared before applying a change:
+    None if it does not exist, the target of a symlink
+    (unless follow), a marker for a directory and
+    the hash of the content of a file
+    """
+    if not os.path.lexists(path):
+        return None
+    if not follow and os.path.islink(path):
+        return 'link:{}'.format(os.readlink(path))
+    if os.path.isdir(path):
+        return DIRECTORY
+    if not os.path.exists(path):
+        # broken symlink
+        return 'link:{}'.format(os.readlink(path))
+    return hash_file(path)
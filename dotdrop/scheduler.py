@@ -0,0 +1,355 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+execute actions following their dependencies
+"""
+
+import os
+import time
+import threading
+from concurrent import futures
+
+# local imports
+from dotdrop.logger import Logger
+
+
+class Job:
+
+    def __init__(self, action, templater=None, descr='action'):
+        """
+        an action to execute
+        @action: the action
+        @templater: the templater used to render the action
+        @descr: description used in the logs (def-post-action, ...)
+        """
+        self.action = action
+        self.templater = templater
+        self.descr = descr
+        # the templated command
+        self.cmd = None
+
+
+class Scheduler:
+
+    def __init__(self, workers=1, timeout=0, logpath=None, debug=False):
+        """
+        constructor
+        @workers: number of actions executed concurrently
+        @timeout: seconds after which an action without
+                  its own timeout is killed, 0 for none
+        @logpath: file the output of the actions is written to
+        @debug: enable debug
+        """
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.logpath = logpath
+        self.debug = debug
+        self.log = Logger()
+        self.lock = threading.Lock()
+        # executed invocations and their result
+        self.invocations = {}
+        self.results = {}
+        # jobs executed at the end: [(rank, job), ...]
+        self.deferred = []
+        # executed jobs: [(job, code, duration), ...]
+        self.stats = []
+        self._logfile = None
+
+    def defer(self, jobs, rank=0):
+        """
+        defer the execution of jobs to run_deferred
+        @rank: jobs are executed by rank
+        """
+        with self.lock:
+            self.deferred.extend([(rank, job) for job in jobs])
+
+    def run_deferred(self):
+        """execute the deferred jobs, see run"""
+        with self.lock:
+            jobs = sorted(self.deferred, key=lambda x: x[0])
+            self.deferred = []
+        return self.run([job for _, job in jobs], keep_going=True)
+
+    def run(self, jobs, keep_going=False):
+        """
+        execute jobs, independent ones concurrently
+        and those depending on others once these succeeded
+        @keep_going: execute everything not depending
+                     on a failed job instead of stopping
+        returns True, None if ok
+                False, errstring if issue
+        """
+        jobs, err = self._prepare(jobs)
+        if err and not keep_going:
+            return False, err
+        order, deps, loop = self._sort(jobs)
+        if loop:
+            keys = ', '.join(['\"{}\"'.format(jobs[i].action.key)
+                              for i in loop])
+            err = 'dependency loop between actions {}'.format(keys)
+            self.log.err(err)
+            return False, err
+
+        if self.workers > 1 and len(order) > 1:
+            failed = self._run_parallel(jobs, order, deps, keep_going)
+        else:
+            failed = self._run_serial(jobs, order, deps, keep_going)
+        for i in order:
+            if i in failed:
+                job = jobs[i]
+                err = '{} \"{}\" failed'.format(job.descr, job.action.key)
+                self.log.err(err)
+                return False, err
+        return err is None, err
+
+    def _prepare(self, jobs):
+        """
+        template the jobs and remove the duplicated ones
+        returns the jobs to execute and the error if any
+        """
+        new = []
+        seen = set()
+        err = None
+        for job in jobs:
+            job.cmd = job.action.get_cmd(templater=job.templater,
+                                         debug=self.debug)
+            if job.cmd is None:
+                if not err:
+                    err = '{} \"{}\" failed'.format(job.descr,
+                                                    job.action.key)
+                    self.log.err(err)
+                continue
+            invocation = self._invocation(job)
+            if invocation in seen:
+                if self.debug:
+                    msg = 'duplicate {} \"{}\" ignored'
+                    self.log.dbg(msg.format(job.descr, job.action.key))
+                continue
+            seen.add(invocation)
+            new.append(job)
+        return new, err
+
+    def _sort(self, jobs):
+        """
+        sort jobs by dependencies keeping the declared order
+        returns the order, the dependencies of each job
+        and the jobs in a loop if any
+        """
+        names = {}
+        for i, job in enumerate(jobs):
+            provides = getattr(job.action, 'provides', [])
+            for name in [job.action.key] + provides:
+                names.setdefault(name, []).append(i)
+        deps = []
+        for i, job in enumerate(jobs):
+            dep = set()
+            for name in getattr(job.action, 'after', []):
+                # dependencies not part of this run are ignored
+                dep.update([j for j in names.get(name, []) if j != i])
+            deps.append(dep)
+
+        order = []
+        done = set()
+        remaining = list(range(len(jobs)))
+        while remaining:
+            ready = [i for i in remaining if deps[i] <= done]
+            if not ready:
+                return order, deps, remaining
+            order.append(ready[0])
+            done.add(ready[0])
+            remaining.remove(ready[0])
+        return order, deps, []
+
+    def _run_serial(self, jobs, order, deps, keep_going):
+        """execute jobs one after the other, returns the failed ones"""
+        failed = set()
+        for i in order:
+            job = jobs[i]
+            if deps[i] & failed:
+                self._log_blocked(job)
+                failed.add(i)
+                continue
+            # the output is printed once the job is done
+            # when written to the log file
+            capture = self.logpath is not None
+            result = self._exec(job, capture=capture)
+            ret, _, executed = result
+            if not executed and self.debug:
+                msg = '{} \"{}\" already executed'
+                self.log.dbg(msg.format(job.descr, job.action.key))
+            if executed and capture:
+                self._log_result(job, result)
+            if not ret:
+                failed.add(i)
+                if not keep_going:
+                    break
+        return failed
+
+    def _run_parallel(self, jobs, order, deps, keep_going):
+        """
+        execute jobs concurrently, their output is logged in order
+        when written to the log file, returns the failed ones
+        """
+        # the terminal is inherited otherwise
+        capture = self.logpath is not None
+        failed = set()
+        succeeded = set()
+        started = set()
+        results = {}
+        pending = {}
+        nxt = 0
+        with futures.ThreadPoolExecutor(max_workers=self.workers) as ex:
+            while True:
+                if keep_going or not failed:
+                    for i in order:
+                        if i in started:
+                            continue
+                        if deps[i] & failed:
+                            # will never be executed
+                            started.add(i)
+                            failed.add(i)
+                            results[i] = None
+                        elif deps[i] <= succeeded:
+                            started.add(i)
+                            pending[ex.submit(self._exec, jobs[i],
+                                              capture=capture)] = i
+                if not pending:
+                    break
+                finished, _ = futures.wait(
+                    pending, return_when=futures.FIRST_COMPLETED)
+                for future in finished:
+                    i = pending.pop(future)
+                    results[i] = future.result()
+                    if results[i][0]:
+                        succeeded.add(i)
+                    else:
+                        failed.add(i)
+                # log in order what is done
+                while nxt < len(order) and order[nxt] in results:
+                    self._log_result(jobs[order[nxt]], results[order[nxt]])
+                    nxt += 1
+        for i in order[nxt:]:
+            if i in results:
+                self._log_result(jobs[i], results[i])
+        return failed
+
+    def _exec(self, job, capture=False):
+        """
+        execute a job unless the same invocation
+        was already executed during this run
+        returns success, output, True if executed
+        """
+        invocation = self._invocation(job)
+        with self.lock:
+            event = self.invocations.get(invocation)
+            first = event is None
+            if first:
+                event = threading.Event()
+                self.invocations[invocation] = event
+        if not first:
+            # executed once only
+            event.wait()
+            return self.results[invocation], None, False
+        if not capture:
+            job.action.log_exec(job.cmd, debug=self.debug)
+        timeout = getattr(job.action, 'timeout', None) or self.timeout
+        code = 1
+        out = None
+        start = time.time()
+        try:
+            code, out = job.action.run(job.cmd, capture=capture,
+                                       timeout=timeout)
+        finally:
+            self.results[invocation] = code == 0
+            event.set()
+            self._record(job, code, time.time() - start, out)
+        if not capture and code != 0:
+            job.action.log_failure(code)
+        return code == 0, (code, out), True
+
+    def _record(self, job, code, duration, out):
+        """record the execution of a job and write its output to the log"""
+        with self.lock:
+            self.stats.append((job, code, duration))
+            if not self.logpath:
+                return
+            if not self._logfile:
+                self._logfile = self._open_log()
+            cmd = job.cmd
+            if job.action.silent:
+                cmd = '<silenced>'
+            f = self._logfile
+            line = '==> {} \"{}\": {}\n'
+            f.write(line.format(job.descr, job.action.key, cmd))
+            if out:
+                f.write(out if out.endswith('\n') else out + '\n')
+            f.write('<== {} in {:.3f}s\n'.format(self._code_str(code),
+                                                 duration))
+            f.flush()
+
+    def _open_log(self):
+        """open the log file for this run"""
+        d = os.path.dirname(self.logpath)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        if self.debug:
+            self.log.dbg('writing actions output to {}'.format(self.logpath))
+        return open(self.logpath, 'a')
+
+    def close(self):
+        """close the log file and print the summary of the executed jobs"""
+        with self.lock:
+            if self._logfile:
+                self._logfile.close()
+                self._logfile = None
+            stats = list(self.stats)
+        if not stats:
+            return
+        total = sum([duration for _, _, duration in stats])
+        msg = '\n{} action(s) executed, {:.2f}s cumulated'
+        self.log.log(msg.format(len(stats), total))
+        # slowest first
+        for job, code, duration in sorted(stats, key=lambda x: -x[2]):
+            line = '{:>8.2f}s  {:<8} {} \"{}\"'
+            self.log.sub(line.format(duration, self._code_str(code),
+                                     job.descr, job.action.key))
+        if self.logpath:
+            self.log.log('actions output written to {}'.format(self.logpath))
+
+    @staticmethod
+    def _code_str(code):
+        """printable return code"""
+        if code is None:
+            return 'timeout'
+        return 'code {}'.format(code)
+
+    def _log_result(self, job, result):
+        """log the result of a job executed concurrently"""
+        if result is None:
+            self._log_blocked(job)
+            return
+        ret, output, executed = result
+        if not executed:
+            if self.debug:
+                msg = '{} \"{}\" already executed'
+                self.log.dbg(msg.format(job.descr, job.action.key))
+            return
+        if not self.logpath:
+            # already logged when executed
+            return
+        code, out = output
+        job.action.log_exec(job.cmd, debug=self.debug)
+        if out:
+            self.log.raw(out.rstrip('\n'))
+        if code != 0:
+            job.action.log_failure(code)
+
+    def _log_blocked(self, job):
+        """log a job not executed because a dependency failed"""
+        msg = '{} \"{}\" not executed, a dependency failed'
+        self.log.warn(msg.format(job.descr, job.action.key))
+
+    def _invocation(self, job):
+        """identify an invocation of an action"""
+        return job.action.key, job.cmd
@@ -8,6 +8,7 @@ settings block
 # local imports
 from dotdrop.linktypes import LinkTypes
 from dotdrop.dictparser import DictParser
+from dotdrop.utils import DIFF_CMD
 
 
 class Settings(DictParser):
@@ -15,6 +16,8 @@ class Settings(DictParser):
     key_yaml = 'config'
 
     # settings item keys
+    key_action_log = 'action_log'
+    key_action_timeout = 'action_timeout'
     key_backup = 'backup'
     key_banner = 'banner'
     key_create = 'create'
@@ -29,12 +32,16 @@ class Settings(DictParser):
     key_upignore = 'upignore'
     key_cmpignore = 'cmpignore'
     key_instignore = 'instignore'
+    key_install_state = 'install_state'
+    key_install_sync = 'install_sync'
+    key_install_journal = 'install_journal'
     key_workdir = 'workdir'
     key_minversion = 'minversion'
     key_func_file = 'func_file'
     key_filter_file = 'filter_file'
     key_diff_command = 'diff_command'
     key_template_dotfile_default = 'template_dotfile_default'
+    key_trans_cache = 'trans_cache'
 
     # import keys
     key_import_actions = 'import_actions'
@@ -50,8 +57,10 @@ class Settings(DictParser):
                  upignore=[], cmpignore=[], instignore=[],
                  workdir='~/.config/dotdrop', showdiff=False,
                  minversion=None, func_file=[], filter_file=[],
-                 diff_command='diff -r -u {0} {1}',
-                 template_dotfile_default=True):
+                 diff_command=DIFF_CMD,
+                 template_dotfile_default=True, install_state=False,
+                 action_timeout=0, action_log=False, trans_cache=False,
+                 install_sync='none', install_journal=0):
         self.backup = backup
         self.banner = banner
         self.create = create
@@ -75,6 +84,12 @@ class Settings(DictParser):
         self.filter_file = filter_file
         self.diff_command = diff_command
         self.template_dotfile_default = template_dotfile_default
+        self.install_state = install_state
+        self.action_timeout = action_timeout
+        self.action_log = action_log
+        self.trans_cache = trans_cache
+        self.install_sync = install_sync
+        self.install_journal = install_journal
 
     def _serialize_seq(self, name, dic):
         """serialize attribute 'name' into 'dic'"""
@@ -98,6 +113,12 @@ class Settings(DictParser):
             self.key_minversion: self.minversion,
             self.key_diff_command: self.diff_command,
             self.key_template_dotfile_default: self.template_dotfile_default,
+            self.key_install_state: self.install_state,
+            self.key_action_timeout: self.action_timeout,
+            self.key_action_log: self.action_log,
+            self.key_trans_cache: self.trans_cache,
+            self.key_install_sync: self.install_sync,
+            self.key_install_journal: self.install_journal,
         }
         self._serialize_seq(self.key_default_actions, dic)
         self._serialize_seq(self.key_import_actions, dic)
@@ -0,0 +1,227 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+persistent install state of the dotfiles
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from collections.abc import Mapping
+
+# local imports
+from dotdrop.logger import Logger
+
+
+class StateDb:
+
+    filename = 'state.db'
+    schema = '''CREATE TABLE IF NOT EXISTS state (
+        key TEXT NOT NULL,
+        dst TEXT NOT NULL,
+        vars TEXT NOT NULL,
+        inputs TEXT NOT NULL,
+        outputs TEXT NOT NULL,
+        PRIMARY KEY (key, dst))'''
+
+    def __init__(self, workdir, dry=False, debug=False):
+        """constructor
+        @workdir: directory where the database is stored
+        @dry: do not record anything
+        @debug: enable debug
+        """
+        self.path = os.path.join(os.path.expanduser(workdir), self.filename)
+        self.dry = dry
+        self.debug = debug
+        self.log = Logger()
+        self.lock = threading.Lock()
+        self.db = None
+
+    def _open(self):
+        """open the database if not already opened"""
+        if self.db:
+            return self.db
+        directory = os.path.dirname(self.path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        if self.debug:
+            self.log.dbg('opening state db {}'.format(self.path))
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute(self.schema)
+        return self.db
+
+    def unchanged(self, key, dst, variables):
+        """
+        return True if the dotfile was installed previously
+        with the same inputs and its deployed files are untouched
+        @key: dotfile key
+        @dst: dotfile dst
+        @variables: hash of the variables and flags (see hash_vars)
+        """
+        with self.lock:
+            try:
+                cur = self._open().execute(
+                    'SELECT vars, inputs, outputs FROM state '
+                    'WHERE key=? AND dst=?', (key, dst))
+                row = cur.fetchone()
+            except sqlite3.Error as e:
+                self.log.warn('state db error: {}'.format(e))
+                return False
+        if not row:
+            if self.debug:
+                self.log.dbg('no state for {}'.format(key))
+            return False
+        rvars, rinputs, routputs = row
+        if rvars != variables:
+            if self.debug:
+                self.log.dbg('variables changed for {}'.format(key))
+            return False
+        paths, inputs = json.loads(rinputs)
+        if self.fingerprint(paths) != inputs:
+            if self.debug:
+                self.log.dbg('inputs changed for {}'.format(key))
+            return False
+        for output in json.loads(routputs):
+            if not self._same_output(*output):
+                if self.debug:
+                    self.log.dbg('{} changed on filesystem'.format(output[0]))
+                return False
+        return True
+
+    def record(self, key, dst, variables, inputs, outputs):
+        """
+        record the state of an installed dotfile
+        @key: dotfile key
+        @dst: dotfile dst
+        @variables: hash of the variables and flags (see hash_vars)
+        @inputs: list of paths the installation depends on
+        @outputs: dictionary of deployed path and the hash of its content
+        """
+        if self.dry:
+            return False
+        if not outputs:
+            # nothing was deployed
+            self.forget(key, dst)
+            return False
+        deployed = []
+        for path, digest in sorted(outputs.items()):
+            try:
+                st = os.stat(path)
+                same = hash_file(path) == digest
+            except OSError:
+                self.forget(key, dst)
+                return False
+            if not same:
+                # not what was rendered (for example not overwritten)
+                if self.debug:
+                    self.log.dbg('not recording state for {}'.format(key))
+                self.forget(key, dst)
+                return False
+            deployed.append([path, digest, st.st_size,
+                             st.st_mtime_ns, st.st_mode])
+        inputs = [sorted(set(inputs)), self.fingerprint(inputs)]
+        if self.debug:
+            self.log.dbg('recording state for {}'.format(key))
+        with self.lock:
+            try:
+                self._open().execute(
+                    'INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?, ?)',
+                    (key, dst, variables, json.dumps(inputs),
+                     json.dumps(deployed)))
+            except sqlite3.Error as e:
+                self.log.warn('state db error: {}'.format(e))
+                return False
+        return True
+
+    def forget(self, key, dst):
+        """remove the state of a dotfile"""
+        if self.dry:
+            return
+        with self.lock:
+            try:
+                self._open().execute(
+                    'DELETE FROM state WHERE key=? AND dst=?', (key, dst))
+            except sqlite3.Error as e:
+                self.log.warn('state db error: {}'.format(e))
+
+    def close(self):
+        """commit and close the database"""
+        with self.lock:
+            if not self.db:
+                return
+            try:
+                self.db.commit()
+                self.db.close()
+            except sqlite3.Error as e:
+                self.log.warn('state db error: {}'.format(e))
+            self.db = None
+
+    def _same_output(self, path, digest, size, mtime, mode):
+        """return True if deployed file still has the recorded content"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_size != size or st.st_mode != mode:
+            return False
+        if st.st_mtime_ns == mtime:
+            return True
+        # file was touched, check its content
+        try:
+            return hash_file(path) == digest
+        except OSError:
+            return False
+
+    @staticmethod
+    def fingerprint(paths):
+        """return the list of [path, mtime, size, mode] of files in paths"""
+        res = []
+        for path in sorted(set(paths)):
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs.sort()
+                    for f in sorted(files):
+                        res.append(StateDb._stat(os.path.join(root, f)))
+                continue
+            res.append(StateDb._stat(path))
+        return res
+
+    @staticmethod
+    def _stat(path):
+        """return [path, mtime, size, mode] for path"""
+        try:
+            st = os.stat(path)
+            return [path, st.st_mtime_ns, st.st_size, st.st_mode]
+        except OSError:
+            return [path, 0, -1, 0]
+
+
+def hash_vars(*elems):
+    """return a hash of variables and flags"""
+    def conv(obj):
+        if isinstance(obj, Mapping):
+            return dict(obj)
+        return str(obj)
+    try:
+        data = json.dumps(elems, sort_keys=True, default=conv)
+    except TypeError:
+        # keys of different types can't be sorted
+        data = str(elems)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def hash_content(content):
+    """return the hash of some bytes"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_file(path):
+    """return the hash of the content of a file"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.hexdigest()
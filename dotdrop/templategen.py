@@ -6,10 +6,15 @@ jinja2 template generator
 """
 
 import os
+import copy
+import stat
+import threading
+from collections import ChainMap
 from jinja2 import Environment, FileSystemLoader, \
     ChoiceLoader, FunctionLoader, TemplateNotFound, \
-    StrictUndefined
+    StrictUndefined, FileSystemBytecodeCache
 from jinja2.exceptions import UndefinedError
+from jinja2 import meta, nodes
 
 
 # local imports
@@ -17,6 +22,7 @@ import dotdrop.utils as utils
 from dotdrop.logger import Logger
 import dotdrop.jhelpers as jhelpers
 from dotdrop.exceptions import UndefinedException
+from dotdrop.dirsync import HashCache, CHUNK
 
 BLOCK_START = '{%@@'
 BLOCK_END = '@@%}'
@@ -24,36 +30,68 @@ VAR_START = '{{@@'
 VAR_END = '@@}}'
 COMMENT_START = '{#@@'
 COMMENT_END = '@@#}'
+# what identifies a template
+MARKERS = [m.encode('utf-8') for m in [BLOCK_START, VAR_START, COMMENT_START]]
+
+
+class _TrackingEnvironment(Environment):
+    """environment keeping track of the templates used by each thread"""
+
+    def __init__(self, **kwargs):
+        super(_TrackingEnvironment, self).__init__(**kwargs)
+        self.local = threading.local()
+
+    @property
+    def loaded(self):
+        """the paths of the templates loaded by this thread"""
+        if not hasattr(self.local, 'loaded'):
+            self.local.loaded = set()
+        return self.local.loaded
+
+    def _load_template(self, name, globals):
+        # also called when the template is in the memory cache
+        template = super(_TrackingEnvironment, self)._load_template(name,
+                                                                    globals)
+        if template.filename:
+            self.loaded.add(template.filename)
+        return template
 
 
 class Templategen:
 
     def __init__(self, base='.', variables={},
-                 func_file=[], filter_file=[], debug=False):
+                 func_file=[], filter_file=[], cache_dir=None,
+                 debug=False):
         """constructor
         @base: directory path where to search for templates
         @variables: dictionary of variables for templates
         @func_file: file path to load functions from
         @filter_file: file path to load filters from
+        @cache_dir: directory where compiled templates are cached
         @debug: enable debug
         """
         self.base = base.rstrip(os.sep)
         self.debug = debug
         self.log = Logger()
         self.variables = {}
+        # name: path of the module of the functions and filters loaded
+        self.funcs = {}
+        self.filters = {}
         loader1 = FileSystemLoader(self.base)
         loader2 = FunctionLoader(self._template_loader)
-        loader = ChoiceLoader([loader1, loader2])
-        self.env = Environment(loader=loader,
-                               trim_blocks=True, lstrip_blocks=True,
-                               keep_trailing_newline=True,
-                               block_start_string=BLOCK_START,
-                               block_end_string=BLOCK_END,
-                               variable_start_string=VAR_START,
-                               variable_end_string=VAR_END,
-                               comment_start_string=COMMENT_START,
-                               comment_end_string=COMMENT_END,
-                               undefined=StrictUndefined)
+        self.loader = ChoiceLoader([loader1, loader2])
+        cache = self._get_cache(cache_dir)
+        self.env = _TrackingEnvironment(loader=self.loader,
+                                        trim_blocks=True, lstrip_blocks=True,
+                                        keep_trailing_newline=True,
+                                        block_start_string=BLOCK_START,
+                                        block_end_string=BLOCK_END,
+                                        variable_start_string=VAR_START,
+                                        variable_end_string=VAR_END,
+                                        comment_start_string=COMMENT_START,
+                                        comment_end_string=COMMENT_END,
+                                        undefined=StrictUndefined,
+                                        bytecode_cache=cache)
 
         # adding variables
         self.variables['env'] = os.environ
@@ -70,12 +108,12 @@ class Templategen:
             for f in func_file:
                 if self.debug:
                     self.log.dbg('load custom functions from {}'.format(f))
-                self._load_path_to_dic(f, self.env.globals)
+                self._load_path_to_dic(f, self.env.globals, self.funcs)
         if filter_file:
             for f in filter_file:
                 if self.debug:
                     self.log.dbg('load custom filters from {}'.format(f))
-                self._load_path_to_dic(f, self.env.filters)
+                self._load_path_to_dic(f, self.env.filters, self.filters)
         if self.debug:
             self._debug_dict('template additional variables', variables)
 
@@ -102,33 +140,79 @@ class Templategen:
         if not string:
             return ''
         try:
-            return self.env.from_string(string).render(self.variables)
+            return self._render(self.env.from_string(string))
         except UndefinedError as e:
             err = 'undefined variable: {}'.format(e.message)
             raise UndefinedException(err)
 
-    def add_tmp_vars(self, newvars={}):
-        """add vars to the globals, make sure to call restore_vars"""
-        saved_variables = self.variables.copy()
-        if not newvars:
-            return saved_variables
-        self.variables.update(newvars)
-        return saved_variables
-
-    def restore_vars(self, saved_globals):
-        """restore globals from add_tmp_vars"""
-        self.variables = saved_globals.copy()
+    def overlay(self, variables):
+        """
+        return a templater sharing this one's environment (and
+        thus its cache) with variables added over its own ones,
+        variables are not copied
+        the variables are layered as: the config ones (including
+        the profile ones), the dotfile ones and the ones of a file
+        """
+        t = copy.copy(self)
+        if isinstance(self.variables, ChainMap):
+            # keep a single level of layers
+            t.variables = self.variables.new_child(variables)
+        else:
+            t.variables = ChainMap(variables, self.variables)
+        return t
 
     def update_variables(self, variables):
         """update variables"""
         self.variables.update(variables)
 
-    def _load_path_to_dic(self, path, dic):
+    def get_loaded_templates(self, clear=False):
+        """
+        return the paths of the templates loaded so far by this thread
+        @clear: forget them
+        """
+        loaded = sorted(self.env.loaded)
+        if clear:
+            self.env.loaded.clear()
+        return loaded
+
+    def get_references(self, path):
+        """
+        parse the template at path and return what it references:
+        the paths of the templates it includes, imports or extends
+        (None when computed at rendering), the undeclared names,
+        the names of the filters and tests it uses and the keys
+        of env it reads (None when it may read any)
+        may raise a TemplateSyntaxError
+        """
+        try:
+            with open(path, 'r') as f:
+                source = f.read()
+        except UnicodeDecodeError:
+            # binary files are not templated
+            return [], [], [], []
+        ast = self.env.parse(source, filename=path)
+        templates = []
+        for name in meta.find_referenced_templates(ast):
+            if name is not None:
+                name = os.path.normpath(os.path.join(self.base, name))
+            templates.append(name)
+        names = meta.find_undeclared_variables(ast)
+        # globals are not reported as undeclared
+        names.update([n.name for n in ast.find_all(nodes.Name)
+                      if n.name in self.env.globals])
+        filters = set([n.name for n in ast.find_all((nodes.Filter,
+                                                     nodes.Test))])
+        return templates, sorted(names), sorted(filters), _env_keys(ast)
+
+    def _load_path_to_dic(self, path, dic, helpers=None):
         mod = utils.get_module_from_path(path)
         if not mod:
             self.log.warn('cannot load module \"{}\"'.format(path))
             return
         self._load_funcs_to_dic(mod, dic)
+        if helpers is not None:
+            for name, _ in utils.get_module_functions(mod):
+                helpers[name] = path
 
     def _load_funcs_to_dic(self, mod, dic):
         """dynamically load functions from module to dic"""
@@ -146,37 +230,27 @@ class Templategen:
 
     def _handle_file(self, src):
         """generate the file content from template"""
-        try:
-            import magic
-            filetype = magic.from_file(src, mime=True)
-            if self.debug:
-                self.log.dbg('using \"magic\" for filetype identification')
-        except ImportError:
-            # fallback
-            _, filetype = utils.run(['file', '-b', '--mime-type', src],
-                                    raw=False, debug=self.debug)
-            if self.debug:
-                self.log.dbg('using \"file\" for filetype identification')
-            filetype = filetype.strip()
-        istext = self._is_text(filetype)
-        if self.debug:
-            self.log.dbg('filetype \"{}\": {}'.format(src, filetype))
-        if self.debug:
-            self.log.dbg('is text \"{}\": {}'.format(src, istext))
+        istext = utils.is_text_file(src, debug=self.debug)
         if not istext:
             return self._handle_bin_file(src)
         return self._handle_text_file(src)
 
-    def _is_text(self, fileoutput):
-        """return if `file -b` output is ascii text"""
-        out = fileoutput.lower()
-        if out.startswith('text'):
-            return True
-        if 'empty' in out:
-            return True
-        if 'json' in out:
-            return True
-        return False
+    def _get_cache(self, directory):
+        """
+        return the bytecode cache for compiled templates,
+        jinja2 recompiles a template when its source changes
+        """
+        if not directory:
+            return None
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            if self.debug:
+                self.log.dbg('no template cache: {}'.format(e))
+            return None
+        if self.debug:
+            self.log.dbg('template cache in {}'.format(directory))
+        return FileSystemBytecodeCache(directory)
 
     def _template_loader(self, relpath):
         """manually load template when outside of base"""
@@ -186,19 +260,31 @@ class Templategen:
             raise TemplateNotFound(path)
         with open(path, 'r') as f:
             content = f.read()
-        return content
+            sig = _signature(os.fstat(f.fileno()))
+
+        def uptodate():
+            # reloaded once changed, like with FileSystemLoader
+            try:
+                return _signature(os.stat(path)) == sig
+            except OSError:
+                return False
+        return content, path, uptodate
 
     def _handle_text_file(self, src):
         """write text to file"""
         template_rel_path = os.path.relpath(src, self.base)
         try:
             template = self.env.get_template(template_rel_path)
-            content = template.render(self.variables)
+            content = self._render(template)
         except UnicodeDecodeError:
             data = self._read_bad_encoded_text(src)
             content = self.generate_string(data)
         return content.encode('utf-8')
 
+    def _render(self, template):
+        """render template with the (layered) variables"""
+        return template.render(self.variables)
+
     def _handle_bin_file(self, src):
         """write binary to file"""
         # this is dirty
@@ -215,26 +301,48 @@ class Templategen:
         return data.decode('utf-8', 'replace')
 
     @staticmethod
-    def is_template(path):
-        """recursively check if any file is a template within path"""
+    def is_template(path, cache=None):
+        """
+        recursively check if any file is a template within path
+        @cache: the ScanCache of the files already checked
+        """
         path = os.path.expanduser(path)
-        if not os.path.exists(path):
+        try:
+            st = os.stat(path)
+        except OSError:
             return False
-        if os.path.isfile(path):
+        if stat.S_ISREG(st.st_mode):
             # is file
-            return Templategen._is_template(path)
-        for entry in os.listdir(path):
-            fpath = os.path.join(path, entry)
-            if not os.path.isfile(fpath):
+            return Templategen._check_file(path, st, cache)
+        if not stat.S_ISDIR(st.st_mode):
+            return False
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return False
+        for entry in entries:
+            try:
+                isfile = entry.is_file()
+                st = entry.stat() if isfile else None
+            except OSError:
+                continue
+            if not isfile:
                 # recursively explore directory
-                if Templategen.is_template(fpath):
-                    return True
-            else:
-                # check if file is a template
-                if Templategen._is_template(fpath):
+                if Templategen.is_template(entry.path, cache=cache):
                     return True
+            elif Templategen._check_file(entry.path, st, cache):
+                # file is a template
+                return True
         return False
 
+    @staticmethod
+    def _check_file(path, st, cache):
+        """test if file is a template through the cache if any"""
+        if cache:
+            return cache.is_template(path, st)
+        return Templategen._is_template(path)
+
     @staticmethod
     def var_is_template(string):
         """check if variable contains template(s)"""
@@ -242,19 +350,25 @@ class Templategen:
 
     @staticmethod
     def _is_template(path):
-        """test if file pointed by path is a template"""
+        """
+        test if file pointed by path is a template,
+        read by chunk until a marker is found
+        """
         if not os.path.isfile(path):
             return False
-        try:
-            with open(path, 'r') as f:
-                data = f.read()
-        except UnicodeDecodeError:
+        if not utils.is_text_file(path):
             # is binary so surely no template
             return False
-        markers = [BLOCK_START, VAR_START, COMMENT_START]
-        for marker in markers:
-            if marker in data:
-                return True
+        # a marker can span two chunks
+        keep = max([len(m) for m in MARKERS]) - 1
+        tail = b''
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK), b''):
+                data = tail + chunk
+                for marker in MARKERS:
+                    if marker in data:
+                        return True
+                tail = data[-keep:]
         return False
 
     def _debug_dict(self, title, elems):
@@ -266,3 +380,66 @@ class Templategen:
             return
         for k, v in elems.items():
             self.log.dbg('  - \"{}\": {}'.format(k, v))
+
+
+def _is_env(node):
+    """return True if node reads the env variable"""
+    return isinstance(node, nodes.Name) and node.name == 'env' and \
+        node.ctx == 'load'
+
+
+def _env_keys(ast):
+    """
+    return the keys of env read by a template,
+    None if it is used otherwise (or with computed keys)
+    """
+    keys = set()
+    seen = set()
+    # env.get('KEY')
+    for call in ast.find_all(nodes.Call):
+        node = call.node
+        if not isinstance(node, nodes.Getattr) or node.attr != 'get' or \
+                not _is_env(node.node) or not call.args or \
+                not isinstance(call.args[0], nodes.Const):
+            continue
+        keys.add(str(call.args[0].value))
+        seen.update([id(node), id(node.node)])
+    # env.KEY
+    for node in ast.find_all(nodes.Getattr):
+        if id(node) not in seen and _is_env(node.node):
+            keys.add(node.attr)
+            seen.add(id(node.node))
+    # env['KEY']
+    for node in ast.find_all(nodes.Getitem):
+        if _is_env(node.node) and isinstance(node.arg, nodes.Const):
+            keys.add(str(node.arg.value))
+            seen.add(id(node.node))
+    for node in ast.find_all(nodes.Name):
+        if _is_env(node) and id(node) not in seen:
+            return None
+    return sorted(keys)
+
+
+def _signature(st):
+    """return what identifies a version of a file from its stat"""
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ScanCache(HashCache):
+    """
+    cache of the files identified as template or not
+    per (size, mtime, inode), persisted like the HashCache
+    """
+
+    filename = 'templates.json'
+
+    def is_template(self, path, st=None):
+        """
+        return True if the file at path is a template
+        @st: the stat of path if already known
+        """
+        return self.digest(path, st=st)
+
+    @staticmethod
+    def _hash(path):
+        return Templategen._is_template(path)
@@ -0,0 +1,166 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+apply read transformations outside of the dotpath
+and cache their result
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+
+# local imports
+from dotdrop.logger import Logger
+from dotdrop.utils import get_cachedir, removepath, ENV_TEMP, get_tmpdir
+
+
+CHUNK = 65536
+# tmpfs used for the intermediate files when available
+SHM = '/dev/shm'
+
+
+class TransCache:
+
+    # files of a cache entry
+    KEY = 'key'
+    OUT = 'out'
+
+    def __init__(self, workdir, cache=False, debug=False):
+        """
+        constructor
+        @workdir: the workdir the results are cached in
+        @cache: cache the results
+        @debug: enable debug
+        """
+        self.path = get_cachedir(workdir, name='trans')
+        self.cache = cache
+        self.debug = debug
+        self.log = Logger()
+        self.lock = threading.Lock()
+        self.tmpdir = None
+
+    def apply(self, trans, src, name, templater=None):
+        """
+        apply the transformation trans to src
+        @name: unique name for src (the dotfile key)
+        returns the path of the result, None on failure
+        """
+        if not self.cache:
+            return self._transform(trans, src, templater)
+        key = trans.get_key(templater=templater)
+        if key is None:
+            return None
+        key = '{}:{}'.format(self._hash_path(src), key)
+        entry = os.path.join(self.path, self._hash(name, trans.key))
+        out = os.path.join(entry, self.OUT)
+        keypath = os.path.join(entry, self.KEY)
+        if os.path.lexists(out) and self._read(keypath) == key:
+            if self.debug:
+                msg = 'transformation \"{}\" cached for {}'
+                self.log.dbg(msg.format(trans.key, src))
+            return out
+
+        tmp = self._transform(trans, src, templater)
+        if not tmp:
+            return None
+        try:
+            os.makedirs(entry, mode=0o700, exist_ok=True)
+            if os.path.lexists(keypath):
+                os.remove(keypath)
+            if os.path.lexists(out):
+                removepath(out)
+            # only readable by the user, likely decrypted content
+            os.chmod(tmp, 0o700 if os.path.isdir(tmp) else 0o600)
+            shutil.move(tmp, out)
+            # the key is written last to validate the entry
+            fd = os.open(keypath, os.O_WRONLY | os.O_CREAT, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(key)
+        except OSError as e:
+            # not cached
+            self.log.warn('caching transformation failed: {}'.format(e))
+            if os.path.lexists(tmp):
+                return tmp
+            return None
+        return out
+
+    def close(self):
+        """remove the intermediate files"""
+        with self.lock:
+            if self.tmpdir and os.path.exists(self.tmpdir):
+                removepath(self.tmpdir, self.log)
+            self.tmpdir = None
+
+    def _transform(self, trans, src, templater):
+        """apply the transformation to a file in the temporary directory"""
+        # unique even when transforming the same file in parallel
+        directory = tempfile.mkdtemp(dir=self._get_tmpdir())
+        tmp = os.path.join(directory, self.OUT)
+        if self.debug:
+            self.log.dbg('executing transformation: {}'.format(trans))
+        if not trans.transform(src, tmp, templater=templater,
+                               debug=self.debug):
+            removepath(directory, self.log)
+            return None
+        return tmp
+
+    def _get_tmpdir(self):
+        """return the directory for the intermediate files of this run"""
+        with self.lock:
+            if self.tmpdir:
+                return self.tmpdir
+            parent = None
+            if ENV_TEMP in os.environ:
+                parent = get_tmpdir()
+            elif os.access(SHM, os.W_OK):
+                parent = SHM
+            self.tmpdir = tempfile.mkdtemp(prefix='dotdrop-trans-',
+                                           dir=parent)
+            return self.tmpdir
+
+    def _hash_path(self, path):
+        """hash the content of a file or of a directory"""
+        h = hashlib.sha256()
+        if not os.path.isdir(path):
+            self._hash_file(h, path)
+            return h.hexdigest()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                sub = os.path.join(root, name)
+                h.update(os.path.relpath(sub, path).encode('utf-8'))
+                h.update(b'\0')
+                if os.path.islink(sub):
+                    h.update(os.readlink(sub).encode('utf-8'))
+                else:
+                    self._hash_file(h, sub)
+                h.update(b'\0')
+        return h.hexdigest()
+
+    @staticmethod
+    def _hash_file(h, path):
+        """update the hash h with the content of a file"""
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK)
+                if not chunk:
+                    break
+                h.update(chunk)
+
+    @staticmethod
+    def _hash(*parts):
+        """hash a list of strings"""
+        data = '\0'.join(parts).encode('utf-8')
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def _read(path):
+        """read a file, None if it does not exist"""
+        try:
+            with open(path, 'r') as f:
+                return f.read()
+        except OSError:
+            return None
@@ -6,15 +6,16 @@ handle the update of dotfiles
 """
 
 import os
-import shutil
-import filecmp
 
 # local imports
 from dotdrop.logger import Logger
 from dotdrop.templategen import Templategen
 from dotdrop.utils import patch_ignores, removepath, get_unique_tmp_name, \
-    write_to_tmpfile, must_ignore, mirror_file_rights
+    write_to_tmpfile, must_ignore, must_prune, mirror_file_rights, \
+    uniq_list, get_ignore
 from dotdrop.exceptions import UndefinedException
+import dotdrop.dirsync as dirsync
+import dotdrop.filecopy as filecopy
 
 
 TILD = '~'
@@ -26,7 +27,8 @@ class Updater:
                  dotfile_key_getter, dotfile_dst_getter,
                  dotfile_path_normalizer,
                  dry=False, safe=True,
-                 debug=False, ignore=[], showpatch=False):
+                 debug=False, ignore=[], showpatch=False, hashes=None,
+                 scancache=None, templater=None):
         """constructor
         @dotpath: path where dotfiles are stored
         @variables: dictionary of variables for the templates
@@ -38,6 +40,9 @@ class Updater:
         @debug: enable debug
         @ignore: pattern to ignore when updating
         @showpatch: show patch if dotfile to update is a template
+        @hashes: the HashCache used to compare files
+        @scancache: the ScanCache used to identify templates
+        @templater: the templater shared by the updates, a new one if None
         """
         self.dotpath = dotpath
         self.variables = variables
@@ -49,11 +54,13 @@ class Updater:
         self.debug = debug
         self.ignore = ignore
         self.showpatch = showpatch
-        self.templater = Templategen(variables=self.variables,
-                                     base=self.dotpath,
-                                     debug=self.debug)
-        # save template vars
-        self.tvars = self.templater.add_tmp_vars()
+        self.hashes = hashes or dirsync.HashCache(debug=debug)
+        self.scancache = scancache
+        self.templater = templater
+        if not self.templater:
+            self.templater = Templategen(variables=self.variables,
+                                         base=self.dotpath,
+                                         debug=self.debug)
         self.log = Logger()
 
     def update_path(self, path):
@@ -92,14 +99,16 @@ class Updater:
         """update dotfile from file pointed by path"""
         ret = False
         new_path = None
-        ignores = list(set(self.ignore + dotfile.upignore))
-        self.ignores = patch_ignores(ignores, dotfile.dst, debug=self.debug)
+        ignores = uniq_list(self.ignore + dotfile.upignore)
+        ignores = patch_ignores(ignores, dotfile.dst, debug=self.debug)
         if self.debug:
-            self.log.dbg('ignore pattern(s): {}'.format(self.ignores))
+            self.log.dbg('ignore pattern(s): {}'.format(ignores))
 
         path = os.path.expanduser(path)
         dtpath = os.path.join(self.dotpath, dotfile.src)
         dtpath = os.path.expanduser(dtpath)
+        self.ignores = get_ignore(ignores, debug=self.debug,
+                                  roots=[path, dtpath])
 
         if self._ignore([path, dtpath]):
             self.log.sub('\"{}\" ignored'.format(dotfile.key))
@@ -108,6 +117,8 @@ class Updater:
         new_path = self._apply_trans_w(path, dotfile)
         if not new_path:
             return False
+        if new_path != path:
+            self.ignores = self.ignores.within([path, new_path, dtpath])
         if os.path.isdir(new_path):
             ret = self._handle_dir(new_path, dtpath)
         else:
@@ -125,10 +136,9 @@ class Updater:
         if self.debug:
             self.log.dbg('executing write transformation {}'.format(trans))
         tmp = get_unique_tmp_name()
-        self.templater.restore_vars(self.tvars)
         newvars = dotfile.get_dotfile_variables()
-        self.templater.add_tmp_vars(newvars=newvars)
-        if not trans.transform(path, tmp, templater=self.templater,
+        templater = self.templater.overlay(newvars)
+        if not trans.transform(path, tmp, templater=templater,
                                debug=self.debug):
             msg = 'transformation \"{}\" failed for {}'
             self.log.err(msg.format(trans.key, dotfile.key))
@@ -138,7 +148,7 @@ class Updater:
         return tmp
 
     def _is_template(self, path):
-        if not Templategen.is_template(path):
+        if not Templategen.is_template(path, cache=self.scancache):
             if self.debug:
                 self.log.dbg('{} is NO template'.format(path))
             return False
@@ -156,7 +166,6 @@ class Updater:
 
     def _resolve_template(self, tpath):
         """resolve the template to a temporary file"""
-        self.templater.restore_vars(self.tvars)
         return self.templater.generate(tpath)
 
     def _same_rights(self, left, right):
@@ -193,7 +202,7 @@ class Updater:
                     msg = 'unable to show patch for {}: {}'.format(path, e)
                     self.log.warn(msg)
             return False
-        if compare and filecmp.cmp(path, dtpath, shallow=False) and \
+        if compare and self._same_content(path, dtpath) and \
                 self._same_rights(path, dtpath):
             # no difference
             if self.debug:
@@ -207,8 +216,7 @@ class Updater:
             else:
                 if self.debug:
                     self.log.dbg('cp {} {}'.format(path, dtpath))
-                shutil.copyfile(path, dtpath)
-                self._mirror_rights(path, dtpath)
+                filecopy.copyfile(path, dtpath, mode=True)
                 self.log.sub('\"{}\" updated'.format(dtpath))
         except IOError as e:
             self.log.warn('{} update failed, do manually: {}'.format(path, e))
@@ -222,126 +230,86 @@ class Updater:
         # paths must be absolute (no tildes)
         path = os.path.expanduser(path)
         dtpath = os.path.expanduser(dtpath)
-        if self._ignore([path, dtpath]):
+        if self._prune([path, dtpath]):
             self.log.sub('\"{}\" ignored'.format(dtpath))
             return True
         # find the differences
-        diff = filecmp.dircmp(path, dtpath, ignore=None)
-        # handle directories diff
-        return self._merge_dirs(diff)
-
-    def _merge_dirs(self, diff):
-        """Synchronize directories recursively."""
-        left, right = diff.left, diff.right
+        changes = dirsync.plan(path, dtpath, self.hashes,
+                               ignore=self._ignore, prune=self._prune)
         if self.debug:
-            self.log.dbg('sync dir {} to {}'.format(left, right))
-        if self._ignore([left, right]):
-            return True
+            self.log.dbg('{} change(s) to apply'.format(len(changes)))
+        # and apply them
+        for change in changes:
+            self._apply_change(change)
+        return True
 
-        # create dirs that don't exist in dotdrop
-        for toadd in diff.left_only:
-            exist = os.path.join(left, toadd)
-            if not os.path.isdir(exist):
-                # ignore files for now
-                continue
-            # match to dotdrop dotpath
-            new = os.path.join(right, toadd)
-            if self._ignore([exist, new]):
-                self.log.sub('\"{}\" ignored'.format(exist))
-                continue
+    def _apply_change(self, change):
+        """apply a change from the plan to the dotpath"""
+        src, dst = change.src, change.dst
+        if change.kind == dirsync.MODIFY:
             if self.dry:
-                self.log.dry('would cp -r {} {}'.format(exist, new))
-                continue
+                self.log.dry('would cp {} {}'.format(src, dst))
+                return
             if self.debug:
-                self.log.dbg('cp -r {} {}'.format(exist, new))
-            # Newly created directory should be copied as is (for efficiency).
-            shutil.copytree(exist, new)
-            self.log.sub('\"{}\" dir added'.format(new))
-
-        # remove dirs that don't exist in deployed version
-        for toremove in diff.right_only:
-            old = os.path.join(right, toremove)
-            if not os.path.isdir(old):
-                # ignore files for now
-                continue
-            if self._ignore([old]):
-                continue
+                self.log.dbg('cp {} {}'.format(src, dst))
+            self._handle_file(src, dst, compare=False)
+        elif change.kind == dirsync.MODE:
+            self._mirror_rights(src, dst)
+        elif change.kind == dirsync.ADD and change.isdir:
             if self.dry:
-                self.log.dry('would rm -r {}'.format(old))
-                continue
+                self.log.dry('would cp -r {} {}'.format(src, dst))
+                return
             if self.debug:
-                self.log.dbg('rm -r {}'.format(old))
-            if not self._confirm_rm_r(old):
-                continue
-            removepath(old, logger=self.log)
-            self.log.sub('\"{}\" dir removed'.format(old))
-
-        # handle files diff
-        # sync files that exist in both but are different
-        fdiff = diff.diff_files
-        fdiff.extend(diff.funny_files)
-        fdiff.extend(diff.common_funny)
-        for f in fdiff:
-            fleft = os.path.join(left, f)
-            fright = os.path.join(right, f)
-            if self._ignore([fleft, fright]):
-                continue
+                self.log.dbg('cp -r {} {}'.format(src, dst))
+            # newly created directory copied at once
+            filecopy.copytree(src, dst,
+                              ignore=self._copytree_ignore(src, dst))
+            self.log.sub('\"{}\" dir added'.format(dst))
+        elif change.kind == dirsync.ADD:
             if self.dry:
-                self.log.dry('would cp {} {}'.format(fleft, fright))
-                continue
+                self.log.dry('would cp {} {}'.format(src, dst))
+                return
             if self.debug:
-                self.log.dbg('cp {} {}'.format(fleft, fright))
-            self._handle_file(fleft, fright, compare=False)
-
-        # copy files that don't exist in dotdrop
-        for toadd in diff.left_only:
-            exist = os.path.join(left, toadd)
-            if os.path.isdir(exist):
-                # ignore dirs, done above
-                continue
-            new = os.path.join(right, toadd)
-            if self._ignore([exist, new]):
-                continue
+                self.log.dbg('cp {} {}'.format(src, dst))
+            filecopy.copyfile(src, dst, mode=True)
+            self.log.sub('\"{}\" added'.format(dst))
+        elif change.kind == dirsync.REMOVE and change.isdir:
             if self.dry:
-                self.log.dry('would cp {} {}'.format(exist, new))
-                continue
+                self.log.dry('would rm -r {}'.format(dst))
+                return
             if self.debug:
-                self.log.dbg('cp {} {}'.format(exist, new))
-            shutil.copyfile(exist, new)
-            self._mirror_rights(exist, new)
-            self.log.sub('\"{}\" added'.format(new))
-
-        # remove files that don't exist in deployed version
-        for toremove in diff.right_only:
-            new = os.path.join(right, toremove)
-            if not os.path.exists(new):
-                continue
-            if os.path.isdir(new):
-                # ignore dirs, done above
-                continue
-            if self._ignore([new]):
-                continue
+                self.log.dbg('rm -r {}'.format(dst))
+            if not self._confirm_rm_r(dst):
+                return
+            removepath(dst, logger=self.log)
+            self.hashes.forget(dst)
+            self.log.sub('\"{}\" dir removed'.format(dst))
+        elif change.kind == dirsync.REMOVE:
             if self.dry:
-                self.log.dry('would rm {}'.format(new))
-                continue
+                self.log.dry('would rm {}'.format(dst))
+                return
             if self.debug:
-                self.log.dbg('rm {}'.format(new))
-            removepath(new, logger=self.log)
-            self.log.sub('\"{}\" removed'.format(new))
-
-        # compare rights
-        for common in diff.common_files:
-            leftf = os.path.join(left, common)
-            rightf = os.path.join(right, common)
-            if not self._same_rights(leftf, rightf):
-                self._mirror_rights(leftf, rightf)
-
-        # Recursively decent into common subdirectories.
-        for subdir in diff.subdirs.values():
-            self._merge_dirs(subdir)
-
-        # Nothing more to do here.
-        return True
+                self.log.dbg('rm {}'.format(dst))
+            removepath(dst, logger=self.log)
+            self.hashes.forget(dst)
+            self.log.sub('\"{}\" removed'.format(dst))
+
+    def _copytree_ignore(self, src, dst):
+        """return the ignore function of copytree from src to dst"""
+        def ignore(directory, names):
+            sub = os.path.join(dst, os.path.relpath(directory, src))
+            return [name for name in names
+                    if self._ignore([os.path.join(directory, name),
+                                     os.path.join(sub, name)])]
+        return ignore
+
+    def _same_content(self, left, right):
+        """return True if both files have the same content"""
+        try:
+            return dirsync.same_content(left, right, self.hashes)
+        except OSError as e:
+            self.log.err(e)
+            return False
 
     def _overwrite(self, src, dst):
         """ask for overwritting"""
@@ -363,3 +331,11 @@ class Updater:
                 self.log.dbg('ignoring update for {}'.format(paths))
             return True
         return False
+
+    def _prune(self, paths):
+        """return True if these directories are ignored with their content"""
+        if must_prune(paths, self.ignores, debug=self.debug):
+            if self.debug:
+                self.log.dbg('ignoring update for {}'.format(paths))
+            return True
+        return False
@@ -9,20 +9,33 @@ import subprocess
 import tempfile
 import os
 import uuid
-import fnmatch
 import inspect
+import functools
 import importlib
+import codecs
 from shutil import rmtree, which
 
 # local import
 from dotdrop.logger import Logger
+import dotdrop.differ as differ
+from dotdrop.ignore import Ignore, NEGATE
 
 LOG = Logger()
 STAR = '*'
+# the default diff command, uses the builtin diff
+DIFF_CMD = 'diff -r -u {0} {1}'
 # the environment variable for temporary
 ENV_TEMP = 'DOTDROP_TMPDIR'
 # the temporary directory
 TMPDIR = None
+# the cache directory in workdir
+CACHEDIR = 'cache'
+# size of the block read to identify text files
+SNIFF_SIZE = 8192
+# control characters not expected in text files
+NOTEXT = bytes(set(range(0x20)) - set(b'\a\b\t\n\v\f\r\x1b') | {0x7f})
+# number of identified file types cached
+FILETYPES_SIZE = 4096
 
 # files dotdrop refuses to remove
 DONOTDELETE = [
@@ -77,7 +90,15 @@ def diff(original, modified, raw=True,
          diff_cmd='', debug=False):
     """compare two files, returns '' if same"""
     if not diff_cmd:
-        diff_cmd = 'diff -r -u {0} {1}'
+        diff_cmd = DIFF_CMD
+
+    if diff_cmd == DIFF_CMD and differ.can_diff(original, modified):
+        if debug:
+            LOG.dbg('builtin diff {} {}'.format(original, modified))
+        out = differ.diff_files(original, modified)
+        if raw:
+            return out.encode('utf-8').splitlines(keepends=True)
+        return out
 
     replacements = {
         "{0}": original,
@@ -115,6 +136,12 @@ def _get_tmpdir():
     return tempfile.mkdtemp(prefix='dotdrop-')
 
 
+def get_cachedir(workdir, name=''):
+    """return the path of the directory for cached data in workdir"""
+    path = os.path.join(os.path.expanduser(workdir), CACHEDIR, name)
+    return os.path.normpath(path)
+
+
 def get_tmpfile():
     """create a temporary file"""
     tmpdir = get_tmpdir()
@@ -198,18 +225,50 @@ def strip_home(path):
     return path
 
 
+def get_ignore(ignores, debug=False, roots=None):
+    """
+    return the compiled ignore patterns
+    @roots: dotfile directories under which the content
+            of an ignored directory is ignored
+    """
+    if not isinstance(ignores, Ignore):
+        ignores = _compile_ignores(tuple(ignores), debug)
+    if roots is not None:
+        ignores = ignores.within(roots)
+    return ignores
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_ignores(patterns, debug):
+    """compile ignore patterns once"""
+    return Ignore(patterns, debug=debug)
+
+
 def must_ignore(paths, ignores, debug=False):
-    """return true if any paths in list matches any ignore patterns"""
+    """return true if any paths in list is ignored by the patterns"""
     if not ignores:
         return False
     if debug:
         LOG.dbg('must ignore? {} against {}'.format(paths, ignores))
+    ignore = get_ignore(ignores, debug=debug)
     for p in paths:
-        for i in ignores:
-            if fnmatch.fnmatch(p, i):
-                if debug:
-                    LOG.dbg('ignore \"{}\" match: {}'.format(i, p))
-                return True
+        if ignore.match(p):
+            if debug:
+                LOG.dbg('ignore match: {}'.format(p))
+            return True
+    return False
+
+
+def must_prune(paths, ignores, debug=False):
+    """return true if any directory in list is ignored with its content"""
+    if not ignores:
+        return False
+    ignore = get_ignore(ignores, debug=debug)
+    for p in paths:
+        if ignore.prune(p):
+            if debug:
+                LOG.dbg('prune: {}'.format(p))
+            return True
     return False
 
 
@@ -228,18 +287,22 @@ def patch_ignores(ignores, prefix, debug=False):
     if debug:
         LOG.dbg('ignores before patching: {}'.format(ignores))
     for ignore in ignores:
+        negate = ''
+        if ignore.startswith(NEGATE):
+            negate = NEGATE
+            ignore = ignore[len(NEGATE):]
         if os.path.isabs(ignore):
             # is absolute
-            new.append(ignore)
+            new.append(negate + ignore)
             continue
         if STAR in ignore:
             if ignore.startswith(STAR) or ignore.startswith(os.sep):
                 # is glob
-                new.append(ignore)
+                new.append(negate + ignore)
                 continue
         # patch ignore
         path = os.path.join(prefix, ignore)
-        new.append(path)
+        new.append(negate + path)
     if debug:
         LOG.dbg('ignores after patching: {}'.format(new))
     return new
@@ -266,10 +329,65 @@ def get_module_from_path(path):
     return mod
 
 
+def is_text_file(path, debug=False):
+    """
+    return True if the file is text and False if binary
+    by looking at its leading block, results are cached
+    """
+    st = os.stat(path)
+    return _filetype(path, st.st_mtime_ns, st.st_size, debug)
+
+
+@functools.lru_cache(maxsize=FILETYPES_SIZE)
+def _filetype(path, mtime, size, debug):
+    """identify a file as of its mtime and size"""
+    with open(path, 'rb') as f:
+        block = f.read(SNIFF_SIZE)
+    istext = _sniff_text(block, final=len(block) < SNIFF_SIZE)
+    if istext is None:
+        # neither plain utf-8 nor clearly binary
+        istext = _magic_text(path, block, debug=debug)
+    if debug:
+        LOG.dbg('is text \"{}\": {}'.format(path, istext))
+    return istext
+
+
+def _sniff_text(block, final=True):
+    """
+    identify a block of data
+    returns True if text, False if binary and None if unsure
+    """
+    if b'\0' in block:
+        return False
+    if any(c in NOTEXT for c in block):
+        # may still be text, left to the mime type
+        return None
+    try:
+        # a multi-byte character may be cut at the end of the block
+        codecs.getincrementaldecoder('utf-8')().decode(block, final=final)
+        return True
+    except UnicodeDecodeError:
+        return None
+
+
+def _magic_text(path, block, debug=False):
+    """identify an ambiguous file using python-magic if available"""
+    try:
+        import magic
+        filetype = magic.from_file(path, mime=True)
+        if debug:
+            LOG.dbg('using \"magic\" for filetype identification')
+        return filetype.lower().startswith('text')
+    except (ImportError, AttributeError):
+        pass
+    # text in some other encoding has no control characters
+    return not any(c in NOTEXT for c in block)
+
+
 def dependencies_met():
     """make sure all dependencies are met"""
     # check unix tools deps
-    deps = ['file', 'diff']
+    deps = ['diff']
     err = 'The tool \"{}\" was not found in the PATH!'
     for dep in deps:
         if not which(dep):
@@ -277,15 +395,6 @@ def dependencies_met():
     # check python deps
     err = 'missing python module \"{}\"'
 
-    # python-magic
-    try:
-        import magic
-        assert(magic)
-        if not hasattr(magic, 'from_file'):
-            LOG.warn(err.format('python-magic'))
-    except ImportError:
-        LOG.warn(err.format('python-magic'))
-
     # docopt
     try:
         from docopt import docopt
@@ -0,0 +1,267 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+watch files for changes with inotify
+or by polling when not available
+"""
+
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+
+# local imports
+from dotdrop.logger import Logger
+
+
+# inotify events
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+# inotify_init1 flags
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | \
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+# struct inotify_event without its name
+EVENT = struct.Struct('iIII')
+BUFSIZE = 65536
+
+# seconds without change ending a batch of changes
+DEBOUNCE = 0.05
+# maximum seconds spent batching changes
+MAXWAIT = 1
+
+
+class Watcher:
+
+    # reported when events were lost
+    ALL = '*'
+
+    def __init__(self, interval=0.2, debug=False):
+        """
+        constructor
+        @interval: seconds between two scans when polling
+        @debug: enable debug
+        """
+        self.interval = interval
+        self.debug = debug
+        self.log = Logger()
+        # watched path: recursive
+        self.roots = {}
+        # inotify watch descriptor: directory
+        self.wds = {}
+        self.fd = _inotify_init()
+        # the state of the files when polling
+        self.snapshot = {}
+        if self.debug:
+            method = 'inotify' if self.fd is not None else 'polling'
+            self.log.dbg('watching files with {}'.format(method))
+
+    def add(self, path, recursive=True):
+        """
+        watch a directory (with its sub-directories if recursive)
+        or a file (through its directory)
+        """
+        path = os.path.normpath(os.path.abspath(path))
+        if not os.path.isdir(path):
+            path = os.path.dirname(path)
+            recursive = False
+        if self.roots.get(path):
+            return
+        self.roots[path] = recursive
+        if self.fd is None:
+            self.snapshot = self._scan()
+            return
+        self._add_watch(path, recursive)
+
+    def wait(self, timeout=None):
+        """
+        wait for changes for up to timeout seconds (None for ever)
+        returns the set of changed paths, containing ALL
+        if some changes were lost
+        """
+        if self.fd is None:
+            return self._poll(timeout)
+        changed = set()
+        while not changed:
+            try:
+                ready, _, _ = select.select([self.fd], [], [], timeout)
+            except InterruptedError:
+                continue
+            if not ready:
+                return changed
+            changed = self._read()
+        return changed
+
+    def changes(self, debounce=DEBOUNCE, maxwait=MAXWAIT):
+        """
+        wait for changes and return them once none
+        happened for debounce seconds (or after maxwait)
+        """
+        changed = self.wait()
+        start = time.time()
+        while time.time() - start < maxwait:
+            more = self.wait(timeout=debounce)
+            if not more:
+                break
+            changed.update(more)
+        return changed
+
+    def close(self):
+        """stop watching"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _add_watch(self, path, recursive):
+        """add an inotify watch on the directory path"""
+        wd = _LIBC.inotify_add_watch(self.fd, os.fsencode(path),
+                                     MASK | IN_ONLYDIR)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err not in [errno.ENOENT, errno.ENOTDIR]:
+                msg = 'cannot watch {}: {}'
+                self.log.warn(msg.format(path, os.strerror(err)))
+            return
+        self.wds[wd] = path
+        if not recursive:
+            return
+        try:
+            with os.scandir(path) as it:
+                subs = [e.path for e in it
+                        if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+        for sub in subs:
+            self._add_watch(sub, recursive)
+
+    def _read(self):
+        """read the pending inotify events, returns the changed paths"""
+        changed = set()
+        try:
+            data = os.read(self.fd, BUFSIZE)
+        except BlockingIOError:
+            return changed
+        pos = 0
+        while pos + EVENT.size <= len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, pos)
+            pos += EVENT.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            if mask & IN_Q_OVERFLOW:
+                changed.add(self.ALL)
+                continue
+            directory = self.wds.get(wd)
+            if mask & IN_IGNORED:
+                self.wds.pop(wd, None)
+                continue
+            if not directory:
+                continue
+            path = directory
+            if name:
+                path = os.path.join(directory, os.fsdecode(name))
+            changed.add(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and \
+                    self._recursive(directory):
+                # watch the new directory and report its content
+                self._add_watch(path, True)
+                for root, _, files in os.walk(path):
+                    changed.update([os.path.join(root, f) for f in files])
+        return changed
+
+    def _recursive(self, directory):
+        """return True if directory is watched recursively"""
+        for root, recursive in self.roots.items():
+            if directory == root:
+                return recursive
+            if recursive and directory.startswith(root + os.sep):
+                return True
+        return False
+
+    def _poll(self, timeout):
+        """scan the watched paths until something changed"""
+        start = time.time()
+        while True:
+            current = self._scan()
+            changed = set()
+            for path in set(current) | set(self.snapshot):
+                if current.get(path) != self.snapshot.get(path):
+                    changed.add(path)
+            self.snapshot = current
+            if changed:
+                return changed
+            if timeout is not None and time.time() - start >= timeout:
+                return changed
+            wait = self.interval
+            if timeout is not None:
+                wait = min(wait, max(0, start + timeout - time.time()))
+            time.sleep(wait)
+
+    def _scan(self):
+        """return the state of the files under the watched paths"""
+        state = {}
+        for root, recursive in self.roots.items():
+            self._scan_dir(root, recursive, state)
+        return state
+
+    def _scan_dir(self, path, recursive, state):
+        """add the state of the files in directory path to state"""
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            state[entry.path] = (st.st_mtime_ns, st.st_size,
+                                 st.st_ino, st.st_mode)
+            if recursive and entry.is_dir(follow_symlinks=False):
+                self._scan_dir(entry.path, recursive, state)
+
+
+def _load_libc():
+    """return the libc when it provides inotify"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                       ctypes.c_uint32]
+    return libc
+
+
+_LIBC = _load_libc()
+
+
+def _inotify_init():
+    """return an inotify file descriptor, None if not available"""
+    if not _LIBC:
+        return None
+    fd = _LIBC.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0:
+        return None
+    return fd
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+benchmark the config parsing with the round-trip
+and the fast (readonly) yaml loaders
+
+usage example:
+    ./bench-config.py --dotfiles=5000
+"""
+
+from docopt import docopt
+import sys
+import os
+import time
+import shutil
+import tempfile
+
+# local imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from dotdrop.cfg_yaml import CfgYaml  # noqa: E402
+
+USAGE = """
+bench-config.py
+
+Usage:
+  bench-config.py [--dotfiles=<nb>] [--runs=<nb>]
+  bench-config.py --help
+
+Options:
+  -d --dotfiles=<nb>  Number of dotfiles in the config [default: 3000].
+  -r --runs=<nb>      Number of runs for each loader [default: 3].
+  -h --help           Show this screen.
+
+"""
+
+PROFILE = 'bench'
+
+
+def create(directory, nb):
+    """create a config with nb dotfiles all in one profile"""
+    path = os.path.join(directory, 'config.yaml')
+    with open(path, 'w') as f:
+        f.write('config:\n')
+        f.write('  backup: true\n')
+        f.write('  create: true\n')
+        f.write('  dotpath: dotfiles\n')
+        f.write('variables:\n')
+        f.write('  var1: value1\n')
+        f.write('dotfiles:\n')
+        for i in range(nb):
+            f.write('  f_file{}:\n'.format(i))
+            f.write('    src: file{}\n'.format(i))
+            f.write('    dst: ~/.file{}\n'.format(i))
+        f.write('profiles:\n')
+        f.write('  {}:\n'.format(PROFILE))
+        f.write('    dotfiles:\n')
+        for i in range(nb):
+            f.write('    - f_file{}\n'.format(i))
+    return path
+
+
+def bench(path, readonly, runs):
+    """return the best time it took to parse the config"""
+    best = None
+    for _ in range(runs):
+        t0 = time.time()
+        CfgYaml(path, profile=PROFILE, readonly=readonly)
+        elapsed = time.time() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    args = docopt(USAGE)
+    nb = int(args['--dotfiles'])
+    runs = int(args['--runs'])
+    directory = tempfile.mkdtemp(prefix='dotdrop-bench-')
+    try:
+        path = create(directory, nb)
+        roundtrip = bench(path, False, runs)
+        fast = bench(path, True, runs)
+    finally:
+        shutil.rmtree(directory)
+    print('{} dotfiles (best of {} runs)'.format(nb, runs))
+    print('round-trip loader: {:.3f}s'.format(roundtrip))
+    print('fast loader:       {:.3f}s'.format(fast))
+    print('speedup: {:.1f}x'.format(roundtrip / fast))
+    return True
+
+
+if __name__ == '__main__':
+    if main():
+        sys.exit(0)
+    sys.exit(1)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+benchmark the builtin diff against the external diff command
+
+usage example:
+    ./bench-diff.py --files=2000
+"""
+
+from docopt import docopt
+import sys
+import os
+import time
+import shutil
+import tempfile
+
+# local imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from dotdrop.utils import diff, DIFF_CMD  # noqa: E402
+
+USAGE = """
+bench-diff.py
+
+Usage:
+  bench-diff.py [--files=<nb>] [--changed=<percent>]
+  bench-diff.py --help
+
+Options:
+  -f --files=<nb>         Number of files to diff [default: 1000].
+  -c --changed=<percent>  Percentage of files that differ [default: 10].
+  -h --help               Show this screen.
+
+"""
+
+# an external command producing the same output as the builtin
+EXTERNAL = 'diff -u {0} {1}'
+
+
+def create(directory, nb, changed):
+    """create nb pairs of files where changed percent differ"""
+    pairs = []
+    lines = ''.join(['line {}\n'.format(i) for i in range(100)])
+    for i in range(nb):
+        left = os.path.join(directory, 'left-{}'.format(i))
+        right = os.path.join(directory, 'right-{}'.format(i))
+        with open(left, 'w') as f:
+            f.write(lines)
+        with open(right, 'w') as f:
+            f.write(lines)
+            if i < nb * changed / 100:
+                f.write('changed\n')
+        pairs.append((left, right))
+    return pairs
+
+
+def bench(pairs, diff_cmd):
+    """return the time it took to diff all pairs"""
+    t0 = time.time()
+    for left, right in pairs:
+        diff(original=left, modified=right, raw=False, diff_cmd=diff_cmd)
+    return time.time() - t0
+
+
+def main():
+    args = docopt(USAGE)
+    nb = int(args['--files'])
+    changed = int(args['--changed'])
+    directory = tempfile.mkdtemp(prefix='dotdrop-bench-')
+    try:
+        pairs = create(directory, nb, changed)
+        builtin = bench(pairs, DIFF_CMD)
+        external = bench(pairs, EXTERNAL)
+    finally:
+        shutil.rmtree(directory)
+    print('{} files ({}% different)'.format(nb, changed))
+    print('builtin diff:  {:.3f}s'.format(builtin))
+    msg = 'external diff: {:.3f}s ({} processes spawned)'
+    print(msg.format(external, nb))
+    print('speedup: {:.1f}x'.format(external / builtin))
+    return True
+
+
+if __name__ == '__main__':
+    if main():
+        sys.exit(0)
+    sys.exit(1)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+benchmark the indexed dotfile lookups of the config
+against linear scans of the dotfiles
+
+usage example:
+    ./bench-lookup.py --dotfiles=10000
+"""
+
+from docopt import docopt
+import sys
+import os
+import time
+import shutil
+import tempfile
+
+# local imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from dotdrop.cfg_aggregator import CfgAggregator  # noqa: E402
+
+USAGE = """
+bench-lookup.py
+
+Usage:
+  bench-lookup.py [--dotfiles=<nb>] [--lookups=<nb>]
+  bench-lookup.py --help
+
+Options:
+  -d --dotfiles=<nb>  Number of dotfiles in the config [default: 10000].
+  -l --lookups=<nb>   Number of lookups of each kind [default: 1000].
+  -h --help           Show this screen.
+
+"""
+
+PROFILES = ['bench1', 'bench2']
+
+
+def create(directory, nb):
+    """create a config with nb dotfiles in all profiles"""
+    path = os.path.join(directory, 'config.yaml')
+    with open(path, 'w') as f:
+        f.write('config:\n')
+        f.write('  dotpath: dotfiles\n')
+        f.write('dotfiles:\n')
+        for i in range(nb):
+            f.write('  f_file{}:\n'.format(i))
+            f.write('    src: file{}\n'.format(i))
+            f.write('    dst: ~/.file{}\n'.format(i))
+        f.write('profiles:\n')
+        for profile in PROFILES:
+            f.write('  {}:\n'.format(profile))
+            f.write('    dotfiles:\n')
+            for i in range(nb):
+                f.write('    - f_file{}\n'.format(i))
+    return path
+
+
+def linear_by_dst(conf, dst):
+    """get dotfiles by dst with a linear scan"""
+    dst = conf._norm_path(dst)
+    return [d for d in conf.dotfiles if conf._norm_path(d.dst) == dst]
+
+
+def linear_by_key(conf, key):
+    """get a dotfile by key with a linear scan"""
+    return next((d for d in conf.dotfiles if d.key == key), None)
+
+
+def linear_profiles(conf, key):
+    """get the profiles of a dotfile with a linear scan"""
+    return [p for p in conf.profiles
+            if key in [d.key for d in p.dotfiles]]
+
+
+def bench(func, conf, args):
+    """return the time it took to call func for all args"""
+    t0 = time.time()
+    for arg in args:
+        func(conf, arg)
+    return time.time() - t0
+
+
+def main():
+    args = docopt(USAGE)
+    nb = int(args['--dotfiles'])
+    lookups = int(args['--lookups'])
+    directory = tempfile.mkdtemp(prefix='dotdrop-bench-')
+    try:
+        path = create(directory, nb)
+        t0 = time.time()
+        conf = CfgAggregator(path, PROFILES[0], readonly=True)
+        load = time.time() - t0
+    finally:
+        shutil.rmtree(directory)
+
+    # spread the lookups over the whole config
+    step = max(1, nb // lookups)
+    dotfiles = conf.dotfiles[::step][:lookups]
+    dsts = [d.dst for d in dotfiles]
+    keys = [d.key for d in dotfiles]
+    benches = [
+        ('by dst', CfgAggregator.get_dotfile_by_dst, linear_by_dst, dsts),
+        ('by key', CfgAggregator.get_dotfile, linear_by_key, keys),
+        ('profiles', CfgAggregator.get_profiles_by_dotfile_key,
+         linear_profiles, keys),
+    ]
+
+    print('{} dotfiles, config loaded in {:.3f}s'.format(nb, load))
+    print('{} lookups of each kind'.format(len(dotfiles)))
+    for name, indexed, linear, elems in benches:
+        ti = bench(indexed, conf, elems)
+        tl = bench(linear, conf, elems)
+        msg = '{:<9} indexed: {:.4f}s, linear: {:.3f}s ({:.0f}x)'
+        print(msg.format(name, ti, tl, tl / max(ti, 1e-9)))
+    return True
+
+
+if __name__ == '__main__':
+    if main():
+        sys.exit(0)
+    sys.exit(1)
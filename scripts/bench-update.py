@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+
+benchmark the comparison of identical directories
+with filecmp.dircmp and with the dirsync plan
+
+usage example:
+    ./bench-update.py --files=5000
+"""
+
+from docopt import docopt
+import sys
+import os
+import time
+import shutil
+import filecmp
+import tempfile
+
+# local imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import dotdrop.dirsync as dirsync  # noqa: E402
+
+USAGE = """
+bench-update.py
+
+Usage:
+  bench-update.py [--files=<nb>] [--size=<bytes>] [--runs=<nb>]
+  bench-update.py --help
+
+Options:
+  -f --files=<nb>     Number of files in the directory [default: 3000].
+  -s --size=<bytes>   Size of each file [default: 16384].
+  -r --runs=<nb>      Number of runs for each method [default: 3].
+  -h --help           Show this screen.
+
+"""
+
+PER_DIR = 100
+
+
+def create(directory, nb, size):
+    """create a tree of nb files and a copy with different mtimes"""
+    left = os.path.join(directory, 'deployed')
+    right = os.path.join(directory, 'dotpath')
+    for i in range(nb):
+        sub = os.path.join('dir{}'.format(i // PER_DIR))
+        os.makedirs(os.path.join(left, sub), exist_ok=True)
+        with open(os.path.join(left, sub, 'file{}'.format(i)), 'wb') as f:
+            f.write(os.urandom(size))
+    shutil.copytree(left, right, copy_function=shutil.copyfile)
+    # files with different mtimes not too recent to be cached
+    for i, path in enumerate([left, right]):
+        old = time.time() - 3600 * (i + 1)
+        for root, _, files in os.walk(path):
+            for name in files:
+                os.utime(os.path.join(root, name), (old, old))
+    return left, right
+
+
+def dircmp(left, right):
+    """compare the way dircmp was used, return number of differences"""
+    diff = filecmp.dircmp(left, right, ignore=None)
+    cnt = len(diff.left_only) + len(diff.right_only) + len(diff.diff_files)
+    for sub in diff.subdirs.values():
+        cnt += dircmp(sub.left, sub.right)
+    return cnt
+
+
+def plan(left, right, hashes):
+    """compare with the dirsync plan, return number of differences"""
+    return len(dirsync.plan(left, right, hashes))
+
+
+def bench(func, runs):
+    """return the best time it took to run func"""
+    best = None
+    for _ in range(runs):
+        filecmp.clear_cache()
+        t0 = time.time()
+        cnt = func()
+        elapsed = time.time() - t0
+        if cnt:
+            print('unexpected differences: {}'.format(cnt))
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    args = docopt(USAGE)
+    nb = int(args['--files'])
+    size = int(args['--size'])
+    runs = int(args['--runs'])
+    directory = tempfile.mkdtemp(prefix='dotdrop-bench-')
+    try:
+        left, right = create(directory, nb, size)
+        old = bench(lambda: dircmp(left, right), runs)
+        hashes = dirsync.HashCache(os.path.join(directory, 'cache'))
+        cold = bench(lambda: plan(left, right, hashes), 1)
+        hashes.save()
+        hashes = dirsync.HashCache(os.path.join(directory, 'cache'))
+        warm = bench(lambda: plan(left, right, hashes), runs)
+    finally:
+        shutil.rmtree(directory)
+    print('{} files of {} bytes (best of {} runs)'.format(nb, size, runs))
+    print('dircmp:            {:.3f}s'.format(old))
+    print('plan (cold cache): {:.3f}s'.format(cold))
+    print('plan (warm cache): {:.3f}s'.format(warm))
+    print('speedup: {:.1f}x'.format(old / warm))
+    return True
+
+
+if __name__ == '__main__':
+    if main():
+        sys.exit(0)
+    sys.exit(1)
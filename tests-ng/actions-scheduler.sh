@@ -0,0 +1,194 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test actions dependencies and concurrent execution
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+
+# the action temp
+tmpa=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the dotfile destination
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${tmps}/config.yaml"
+
+cat > ${cfg} << _EOF
+actions:
+  post:
+    first:
+      cmd: sleep 1 && echo first >> ${tmpa}/order
+      provides: [base]
+    second:
+      cmd: echo second >> ${tmpa}/order
+      after: [base]
+    third:
+      cmd: echo third >> ${tmpa}/order
+      after: [second]
+    once: echo once >> ${tmpa}/once
+    slow: sleep 2 && echo '{0}' >> ${tmpa}/slow
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+  default_actions:
+  - once
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+    actions:
+    - third
+    - second
+  f_def:
+    dst: ${tmpd}/def
+    src: def
+    actions:
+    - first
+  f_slow1:
+    dst: ${tmpd}/slow1
+    src: slow1
+    actions:
+    - slow 1
+  f_slow2:
+    dst: ${tmpd}/slow2
+    src: slow2
+    actions:
+    - slow 2
+  f_slow3:
+    dst: ${tmpd}/slow3
+    src: slow3
+    actions:
+    - slow 3
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+    - f_def
+  p2:
+    dotfiles:
+    - f_slow1
+    - f_slow2
+    - f_slow3
+_EOF
+#cat ${cfg}
+
+# create the dotfiles
+echo 'abc' > ${tmps}/dotfiles/abc
+echo 'def' > ${tmps}/dotfiles/def
+echo 'slow1' > ${tmps}/dotfiles/slow1
+echo 'slow2' > ${tmps}/dotfiles/slow2
+echo 'slow3' > ${tmps}/dotfiles/slow3
+
+# install
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+
+# actions are executed following their dependencies
+# right after their dotfile is installed
+[ ! -e ${tmpa}/order ] && echo 'actions not executed' && exit 1
+order=`cat ${tmpa}/order | tr '\n' ' '`
+[ "${order}" != "second third first " ] && echo "bad order: ${order}" && exit 1
+
+# the same action is executed once
+cnt=`cat ${tmpa}/once | wc -l`
+[ "${cnt}" != "1" ] && echo "default action executed ${cnt} times" && exit 1
+
+# actions are executed concurrently
+rm -f ${tmpa}/order ${tmpa}/once
+start=`date +%s`
+cd ${ddpath} | ${bin} install -f -w 4 -c ${cfg} -p p2 -V
+end=`date +%s`
+cnt=`cat ${tmpa}/slow | wc -l`
+[ "${cnt}" != "3" ] && echo "actions not all executed" && exit 1
+[ "$((end-start))" -ge "6" ] && echo "actions not executed concurrently" && exit 1
+
+# dependencies are followed across dotfiles when concurrent
+rm -f ${tmpa}/order ${tmpa}/once ${tmpd}/abc ${tmpd}/def
+cd ${ddpath} | ${bin} install -f -w 4 -c ${cfg} -p p1 -V
+order=`cat ${tmpa}/order | tr '\n' ' '`
+[ "${order}" != "first second third " ] && echo "bad order: ${order}" && exit 1
+
+# dependency loop
+cat > ${cfg} << _EOF
+actions:
+  post:
+    loop1:
+      cmd: echo loop1 >> ${tmpa}/loop
+      after: [loop2]
+    loop2:
+      cmd: echo loop2 >> ${tmpa}/loop
+      after: [loop1]
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+    actions:
+    - loop1
+    - loop2
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+_EOF
+rm -f ${tmpd}/abc
+set +e
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V 2>&1 | grep 'dependency loop'
+ret="$?"
+set -e
+[ "${ret}" != "0" ] && echo 'dependency loop not detected' && exit 1
+[ -e ${tmpa}/loop ] && echo 'actions in a loop executed' && exit 1
+
+## CLEANING
+rm -rf ${tmps} ${tmpd} ${tmpa}
+
+echo "OK"
+exit 0
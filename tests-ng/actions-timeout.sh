@@ -0,0 +1,153 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test actions timeout, output log and summary
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+
+# the action temp
+tmpa=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the dotfile destination
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the workdir
+tmpw=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${tmps}/config.yaml"
+
+cat > ${cfg} << _EOF
+actions:
+  post:
+    hang:
+      cmd: sleep 30 && echo hang > ${tmpa}/hang
+      timeout: 1
+    talk: echo "some output" && echo talk > ${tmpa}/talk
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+  workdir: ${tmpw}
+  action_log: true
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+    actions:
+    - hang
+    - talk
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+_EOF
+#cat ${cfg}
+
+# create the dotfile
+echo 'abc' > ${tmps}/dotfiles/abc
+
+# install
+start=`date +%s`
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V 2>&1 | tee ${tmpa}/out
+end=`date +%s`
+
+# the hanging action is killed
+[ "$((end-start))" -ge "20" ] && echo "action not killed" && exit 1
+[ -e ${tmpa}/hang ] && echo "action not killed" && exit 1
+[ ! -e ${tmpa}/talk ] && echo "action not executed" && exit 1
+
+# output is printed and summarized
+grep 'some output' ${tmpa}/out >/dev/null
+grep '2 action(s) executed' ${tmpa}/out >/dev/null
+grep 'timeout.*post-action "hang"' ${tmpa}/out >/dev/null
+grep 'code 0.*post-action "talk"' ${tmpa}/out >/dev/null
+
+# output is written to the log
+cnt=`ls ${tmpw}/logs/actions-*.log | wc -l`
+[ "${cnt}" != "1" ] && echo "no log file" && exit 1
+grep 'some output' ${tmpw}/logs/actions-*.log >/dev/null
+grep '<== code 0' ${tmpw}/logs/actions-*.log >/dev/null
+grep '<== timeout' ${tmpw}/logs/actions-*.log >/dev/null
+
+# global timeout
+cat > ${cfg} << _EOF
+actions:
+  pre:
+    hang: sleep 30 && echo hang > ${tmpa}/hang
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+  workdir: ${tmpw}
+  action_timeout: 1
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+    actions:
+    - hang
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+_EOF
+rm -f ${tmpd}/abc
+start=`date +%s`
+set +e
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+set -e
+end=`date +%s`
+[ "$((end-start))" -ge "20" ] && echo "action not killed" && exit 1
+[ -e ${tmpa}/hang ] && echo "action not killed" && exit 1
+# failing pre action prevents the install
+[ -e ${tmpd}/abc ] && echo "dotfile installed" && exit 1
+
+## CLEANING
+rm -rf ${tmps} ${tmpd} ${tmpa} ${tmpw}
+
+echo "OK"
+exit 0
@@ -0,0 +1,97 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test compare with workers
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+
+# dotdrop directory
+basedir=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+echo "[+] dotdrop dir: ${basedir}"
+echo "[+] dotpath dir: ${basedir}/dotfiles"
+
+# the dotfiles to be imported
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${basedir}/config.yaml"
+create_conf ${cfg} # sets token
+
+# import
+echo "[+] import"
+for i in `seq 1 10`; do
+  echo "content${i}" > ${tmpd}/file${i}
+  mkdir -p ${tmpd}/dir${i}
+  echo "content${i}" > ${tmpd}/dir${i}/sub
+  cd ${ddpath} | ${bin} import -c ${cfg} ${tmpd}/file${i} ${tmpd}/dir${i}
+done
+
+# no diff expected
+echo "[+] comparing with workers - no diff expected"
+cd ${ddpath} | ${bin} compare -c ${cfg} -w 4
+
+# modify files
+for i in `seq 1 10`; do
+  echo "modified${i}" > ${tmpd}/file${i}
+  echo "modified${i}" > ${tmpd}/dir${i}/sub
+done
+
+# diff expected in config order
+echo "[+] comparing with workers - diff expected"
+# debug logs contain timings
+export DOTDROP_FORCE_NODEBUG=yes
+set +e
+cd ${ddpath} | ${bin} compare -c ${cfg} -b -w 1 > ${basedir}/seq.log 2>&1
+[ "$?" = "0" ] && exit 1
+cd ${ddpath} | ${bin} compare -c ${cfg} -b -w 4 > ${basedir}/par.log 2>&1
+[ "$?" = "0" ] && exit 1
+set -e
+cat ${basedir}/par.log
+diff ${basedir}/seq.log ${basedir}/par.log || exit 1
+unset DOTDROP_FORCE_NODEBUG
+
+## CLEANING
+rm -rf ${basedir} ${tmpd}
+
+echo "OK"
+exit 0
@@ -0,0 +1,123 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test the cache of the parsed config
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the home where the cache is stored
+tmph=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+export HOME="${tmph}"
+unset DOTDROP_TEST_VAR
+
+# create the config file
+cfg="${tmps}/config.yaml"
+cat > ${cfg} << _EOF
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+  import_variables:
+  - vars*.yaml
+variables:
+  var: "{{@@ env['DOTDROP_TEST_VAR'] | default('unset') @@}}"
+dotfiles:
+  f_abc:
+    dst: "~/{{@@ var @@}}-{{@@ imported @@}}"
+    src: abc
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+_EOF
+echo "variables:" > ${tmps}/vars1.yaml
+echo "  imported: first" >> ${tmps}/vars1.yaml
+echo "abc" > ${tmps}/dotfiles/abc
+
+# parse and cache
+echo "[+] files"
+cd ${ddpath} | ${bin} files -G -c ${cfg} -p p1 | grep "unset-first"
+[ -z "`ls -A ${tmph}/.config/dotdrop/cache/config`" ] && echo "config not cached" && exit 1
+
+# load from cache
+echo "[+] files from cache"
+cd ${ddpath} | ${bin} files -G -c ${cfg} -p p1 --verbose 2>&1 | grep 'config loaded from'
+
+# environment variable changed
+echo "[+] env changed"
+export DOTDROP_TEST_VAR="set"
+cd ${ddpath} | ${bin} files -G -c ${cfg} -p p1 | grep "set-first"
+unset DOTDROP_TEST_VAR
+
+# imported file changed
+echo "[+] imported file changed"
+sed -i 's/first/second/g' ${tmps}/vars1.yaml
+cd ${ddpath} | ${bin} files -G -c ${cfg} -p p1 | grep "unset-second"
+
+# new file matching the glob
+echo "[+] glob changed"
+echo "variables:" > ${tmps}/vars0.yaml
+echo "  other: value" >> ${tmps}/vars0.yaml
+cd ${ddpath} | ${bin} files -G -c ${cfg} -p p1 --verbose 2>&1 | grep 'config cache is outdated'
+
+# random content is never cached
+echo "[+] lipsum"
+echo "  rnd: \"{{@@ lipsum(1) @@}}\"" >> ${tmps}/vars0.yaml
+cd ${ddpath} | ${bin} files -G -c ${cfg} -p p1 --verbose 2>&1 | grep 'config is not cached'
+sed -i '/rnd:/d' ${tmps}/vars0.yaml
+
+# dynvariables are never cached
+echo "[+] dynvariables"
+echo "dynvariables:" >> ${tmps}/vars0.yaml
+echo "  dvar: echo dyn" >> ${tmps}/vars0.yaml
+cd ${ddpath} | ${bin} files -G -c ${cfg} -p p1 --verbose 2>&1 | grep 'config is not cached'
+
+## CLEANING
+rm -rf ${tmps} ${tmph}
+
+echo "OK"
+exit 0
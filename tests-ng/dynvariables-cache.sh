@@ -0,0 +1,131 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test the parallel execution and the cache of dynvariables
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the home where the cache is stored
+tmph=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+export HOME="${tmph}"
+# the dotfile destination
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${tmps}/config.yaml"
+cat > ${cfg} << _EOF
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+dynvariables:
+  slow1: sleep 1 && echo slow1
+  slow2: sleep 1 && echo slow2
+  slow3: sleep 1 && echo slow3
+  slow4: sleep 1 && echo slow4
+  cached:
+    cmd: echo run >> ${tmps}/runs && echo cached
+    ttl: 3600
+  notcached: echo run >> ${tmps}/noruns && echo notcached
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+_EOF
+echo "{{@@ slow1 @@}} {{@@ slow4 @@}} {{@@ cached @@}} {{@@ notcached @@}}" > ${tmps}/dotfiles/abc
+
+# dynvariables are executed concurrently
+echo "[+] install"
+start=`date +%s`
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1
+end=`date +%s`
+[ "$((end - start))" -ge "4" ] && echo "dynvariables not executed concurrently" && exit 1
+grep "slow1 slow4 cached notcached" ${tmpd}/abc
+[ ! -e ${tmph}/.config/dotdrop/cache/dynvariables.json ] && echo "dynvariables not cached" && exit 1
+
+# cached output is used while valid
+echo "[+] install again"
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1
+grep "slow1 slow4 cached notcached" ${tmpd}/abc
+[ "`wc -l < ${tmps}/runs`" != "1" ] && echo "cached dynvariable executed again" && exit 1
+[ "`wc -l < ${tmps}/noruns`" != "2" ] && echo "dynvariable not executed" && exit 1
+
+# the output depends on the environment and the directory
+echo "[+] other environment"
+cd ${ddpath} | DOTDROP_TEST_DVAR=other ${bin} files -c ${cfg} -p p1
+[ "`wc -l < ${tmps}/runs`" != "2" ] && echo "cached dynvariable used in other env" && exit 1
+echo "[+] other directory"
+(cd ${tmps} && ${bin} files -c ${cfg} -p p1)
+[ "`wc -l < ${tmps}/runs`" != "3" ] && echo "cached dynvariable used in other dir" && exit 1
+cd ${ddpath} | ${bin} files -c ${cfg} -p p1
+[ "`wc -l < ${tmps}/runs`" != "3" ] && echo "cached dynvariable executed again" && exit 1
+
+# expired output
+echo "[+] expired"
+sed -i 's/ttl: 3600/ttl: 1/g' ${cfg}
+sleep 2
+cd ${ddpath} | ${bin} files -c ${cfg} -p p1
+[ "`wc -l < ${tmps}/runs`" != "4" ] && echo "expired dynvariable not executed" && exit 1
+
+# bad entry
+echo "[+] bad entry"
+sed -i 's/ttl: 1/ttl: abc/g' ${cfg}
+set +e
+cd ${ddpath} | ${bin} files -c ${cfg} -p p1
+[ "$?" = "0" ] && echo "bad dynvariable accepted" && exit 1
+set -e
+
+## CLEANING
+rm -rf ${tmps} ${tmph} ${tmpd}
+
+echo "OK"
+exit 0
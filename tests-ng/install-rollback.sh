@@ -0,0 +1,175 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test rolling back installs from the journal
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+
+
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the dotfile destination
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the workdir
+tmpw=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${tmps}/config.yaml"
+
+cat > ${cfg} << _EOF
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+  workdir: ${tmpw}
+  install_journal: 2
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+  f_new:
+    dst: ${tmpd}/sub/dir/new
+    src: new
+  f_lnk:
+    dst: ${tmpd}/lnk
+    src: lnk
+    link: link
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+    - f_new
+    - f_lnk
+_EOF
+#cat ${cfg}
+
+# create the dotfiles
+echo 'abc' > ${tmps}/dotfiles/abc
+echo 'new' > ${tmps}/dotfiles/new
+echo 'lnk' > ${tmps}/dotfiles/lnk
+
+# the existing files
+echo 'original' > ${tmpd}/abc
+chmod 600 ${tmpd}/abc
+mkdir -p ${tmpd}/lnk
+echo 'file' > ${tmpd}/lnk/file
+
+# first install
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+[ "`cat ${tmpd}/abc`" != "abc" ] && echo "not installed" && exit 1
+[ ! -h ${tmpd}/lnk ] && echo "not linked" && exit 1
+cnt=`ls ${tmpw}/journal/*.jsonl | wc -l`
+[ "${cnt}" != "1" ] && echo "install not journaled" && exit 1
+
+# second install
+echo 'abc2' > ${tmps}/dotfiles/abc
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+[ "`cat ${tmpd}/abc`" != "abc2" ] && echo "not installed" && exit 1
+cnt=`ls ${tmpw}/journal/*.jsonl | wc -l`
+[ "${cnt}" != "2" ] && echo "install not journaled" && exit 1
+
+# rollback the second install
+cd ${ddpath} | ${bin} rollback -f -c ${cfg} -p p1 -V
+[ "`cat ${tmpd}/abc`" != "abc" ] && echo "not rolled back" && exit 1
+[ "`cat ${tmpd}/abc.dotdropbak`" != "original" ] && echo "bad backup" && exit 1
+[ "`cat ${tmpd}/sub/dir/new`" != "new" ] && echo "bad rollback" && exit 1
+
+# rollback the first install
+cd ${ddpath} | ${bin} rollback -f -c ${cfg} -p p1 -V
+[ "`cat ${tmpd}/abc`" != "original" ] && echo "not rolled back" && exit 1
+[ "`stat -c '%a' ${tmpd}/abc`" != "600" ] && echo "bad mode" && exit 1
+[ -e ${tmpd}/abc.dotdropbak ] && echo "backup not removed" && exit 1
+[ -e ${tmpd}/sub ] && echo "created directories not removed" && exit 1
+[ -h ${tmpd}/lnk ] && echo "link not removed" && exit 1
+[ "`cat ${tmpd}/lnk/file`" != "file" ] && echo "directory not restored" && exit 1
+
+# written through a symlink
+sed -i 's/  backup: true/  backup: false/' ${cfg}
+echo 'target' > ${tmpd}/target
+rm ${tmpd}/abc
+ln -s ${tmpd}/target ${tmpd}/abc
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+[ ! -h ${tmpd}/abc ] && echo "symlink replaced" && exit 1
+[ "`cat ${tmpd}/target`" != "abc2" ] && echo "not written through" && exit 1
+cd ${ddpath} | ${bin} rollback -f -c ${cfg} -p p1 -V
+[ ! -h ${tmpd}/abc ] && echo "symlink not restored" && exit 1
+[ "`cat ${tmpd}/target`" != "target" ] && echo "target not rolled back" && exit 1
+sed -i 's/  backup: false/  backup: true/' ${cfg}
+
+# nothing left to rollback
+set +e
+cd ${ddpath} | ${bin} rollback -f -c ${cfg} -p p1 -V
+[ "$?" = "0" ] && echo "nothing to rollback" && exit 1
+set -e
+cnt=`ls ${tmpw}/journal/objects | wc -l`
+[ "${cnt}" != "0" ] && echo "content not pruned" && exit 1
+
+# old installs and their content pruned
+sed -i 's/  install_journal: 2/  install_journal: 1/' ${cfg}
+echo 'abc3' > ${tmps}/dotfiles/abc
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+grep -qx 'file' ${tmpw}/journal/objects/* || (echo "content not stored" && exit 1)
+sleep 3
+echo 'abc4' > ${tmps}/dotfiles/abc
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+cnt=`ls ${tmpw}/journal/*.jsonl | wc -l`
+[ "${cnt}" != "1" ] && echo "install not pruned" && exit 1
+grep -qx 'file' ${tmpw}/journal/objects/* && echo "content not pruned" && exit 1
+grep -qx 'abc3' ${tmpw}/journal/objects/* || (echo "content pruned" && exit 1)
+
+# disabled journal (the default)
+rm -r ${tmpw}/journal
+sed -i '/  install_journal: 1/d' ${cfg}
+echo 'abc5' > ${tmps}/dotfiles/abc
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+[ "`cat ${tmpd}/abc`" != "abc5" ] && echo "not installed" && exit 1
+[ -e ${tmpw}/journal ] && echo "journal not disabled" && exit 1
+
+## CLEANING
+rm -rf ${tmps} ${tmpd} ${tmpw}
+
+echo "OK"
+exit 0
@@ -0,0 +1,145 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test install_state
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the dotfile destination
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the workdir
+tmpw=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${tmps}/config.yaml"
+cat > ${cfg} << _EOF
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+  workdir: ${tmpw}
+  install_state: true
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+  d_dir:
+    dst: ${tmpd}/dir
+    src: dir
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+    - d_dir
+variables:
+  var: value
+_EOF
+
+# create the dotfiles
+echo "{{@@ var @@}}" > ${tmps}/dotfiles/abc
+echo "{{@@ env.DD_STATE_USED @@}}" >> ${tmps}/dotfiles/abc
+export DD_STATE_USED="used"
+mkdir -p ${tmps}/dotfiles/dir/sub
+echo "file" > ${tmps}/dotfiles/dir/sub/file
+
+# dry install and detail do not save anything
+echo "[+] dry install"
+cd ${ddpath} | ${bin} install -f -d -c ${cfg} -p p1
+cd ${ddpath} | ${bin} detail -c ${cfg} -p p1
+[ -e ${tmpw}/cache/depgraph.json ] && echo "dependency graph saved" && exit 1
+
+# first install
+echo "[+] install"
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 | grep '^2 dotfile(s) installed.$'
+[ ! -e ${tmpw}/state.db ] && echo "state not saved" && exit 1
+[ ! -e ${tmpw}/cache/depgraph.json ] && echo "dependency graph not saved" && exit 1
+grep '^value$' ${tmpd}/abc
+
+# nothing changed
+echo "[+] re-install"
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 --verbose 2>&1 | tee ${tmpd}/log
+cat ${tmpd}/log | grep '^0 dotfile(s) installed.$'
+[ "`grep -c 'unchanged since last install' ${tmpd}/log`" != "2" ] && exit 1
+
+echo "[+] change unused environment"
+cd ${ddpath} | DD_STATE_UNUSED="x" ${bin} install -f -c ${cfg} -p p1 --verbose 2>&1 | tee ${tmpd}/log
+cat ${tmpd}/log | grep '^0 dotfile(s) installed.$'
+[ "`grep -c 'unchanged since last install' ${tmpd}/log`" != "2" ] && exit 1
+
+echo "[+] change used environment"
+cd ${ddpath} | DD_STATE_USED="changed" ${bin} install -f -c ${cfg} -p p1 | grep '^1 dotfile(s) installed.$'
+grep '^changed$' ${tmpd}/abc
+
+# change the source
+echo "[+] change source"
+echo "new" >> ${tmps}/dotfiles/abc
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 | grep '^1 dotfile(s) installed.$'
+grep '^new$' ${tmpd}/abc
+
+# add a file in the source directory
+echo "[+] add file in directory"
+echo "file2" > ${tmps}/dotfiles/dir/sub/file2
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 | grep '^1 dotfile(s) installed.$'
+[ ! -e ${tmpd}/dir/sub/file2 ] && echo "file2 not installed" && exit 1
+
+# change the destination
+echo "[+] change destination"
+echo "edited" > ${tmpd}/dir/sub/file
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 | grep '^1 dotfile(s) installed.$'
+grep '^file$' ${tmpd}/dir/sub/file
+
+# change a variable
+echo "[+] change variable"
+sed -i 's/var: value/var: other/g' ${cfg}
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 | grep '^1 dotfile(s) installed.$'
+grep '^other$' ${tmpd}/abc
+
+## CLEANING
+rm -rf ${tmps} ${tmpd} ${tmpw}
+
+echo "OK"
+exit 0
@@ -0,0 +1,155 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test planning an install and applying the plan
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+
+
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the dotfile destination
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the workdir
+tmpw=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the plan and the actions counter
+tmpa=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${tmps}/config.yaml"
+
+cat > ${cfg} << _EOF
+actions:
+  pre:
+    preaction: echo pre >> ${tmpa}/pre
+  post:
+    postaction: echo {{@@ name @@}} >> ${tmpa}/post
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+  workdir: ${tmpw}
+variables:
+  name: first
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+    actions:
+    - preaction
+    - postaction
+  d_dir:
+    dst: ${tmpd}/dir
+    src: dir
+  f_lnk:
+    dst: ${tmpd}/lnk
+    src: lnk
+    link: link
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+    - d_dir
+    - f_lnk
+_EOF
+#cat ${cfg}
+
+# create the dotfiles
+echo '{{@@ name @@}}' > ${tmps}/dotfiles/abc
+chmod 700 ${tmps}/dotfiles/abc
+mkdir -p ${tmps}/dotfiles/dir/sub
+echo 'file' > ${tmps}/dotfiles/dir/sub/file
+echo 'lnk {{@@ name @@}}' > ${tmps}/dotfiles/lnk
+
+# plan to stdout
+cd ${ddpath} | ${bin} plan -c ${cfg} -p p1 > ${tmpa}/stdout.json
+python3 -m json.tool ${tmpa}/stdout.json > /dev/null
+
+# plan to a file
+cd ${ddpath} | ${bin} plan -c ${cfg} -p p1 -o ${tmpa}/plan.json -V
+[ ! -e ${tmpa}/plan.json ] && echo "plan not written" && exit 1
+# nothing installed and no action executed
+cnt=`ls ${tmpd} | wc -l`
+[ "${cnt}" != "0" ] && echo "dotfiles installed by plan" && exit 1
+[ -e ${tmpa}/pre ] && echo "action executed by plan" && exit 1
+grep -q '"action": "install"' ${tmpa}/plan.json || (echo "bad plan" && exit 1)
+
+# the variables change after the plan is made
+sed -i 's/name: first/name: second/' ${cfg}
+
+# apply
+cd ${ddpath} | ${bin} apply -f -c ${cfg} -p p1 -V ${tmpa}/plan.json
+
+# the planned content is installed
+[ "`cat ${tmpd}/abc`" != "first" ] && echo "bad content" && exit 1
+[ "`stat -c '%a' ${tmpd}/abc`" != "700" ] && echo "bad mode" && exit 1
+[ "`cat ${tmpd}/dir/sub/file`" != "file" ] && echo "bad directory" && exit 1
+[ ! -h ${tmpd}/lnk ] && echo "not linked" && exit 1
+[ "`cat ${tmpd}/lnk`" != "lnk first" ] && echo "bad link" && exit 1
+# the actions are executed as planned
+[ "`cat ${tmpa}/pre`" != "pre" ] && echo "pre action not executed" && exit 1
+[ "`cat ${tmpa}/post`" != "first" ] && echo "post action not executed" && exit 1
+
+# nothing to install anymore
+sed -i 's/name: second/name: first/' ${cfg}
+cd ${ddpath} | ${bin} plan -c ${cfg} -p p1 -o ${tmpa}/plan.json -V
+grep -q '"action": "install"' ${tmpa}/plan.json && echo "bad plan" && exit 1
+
+# a plan is not applied when the destination changed
+echo 'changed' > ${tmps}/dotfiles/dir/sub/file
+cd ${ddpath} | ${bin} plan -c ${cfg} -p p1 -o ${tmpa}/plan.json -V
+echo 'edited' > ${tmpd}/dir/sub/file
+set +e
+cd ${ddpath} | ${bin} apply -f -c ${cfg} -p p1 -V ${tmpa}/plan.json
+[ "$?" = "0" ] && echo "stale plan applied" && exit 1
+set -e
+[ "`cat ${tmpd}/dir/sub/file`" != "edited" ] && echo "stale plan applied" && exit 1
+
+## CLEANING
+rm -rf ${tmps} ${tmpd} ${tmpw} ${tmpa}
+
+echo "OK"
+exit 0
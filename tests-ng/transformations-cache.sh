@@ -0,0 +1,133 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test streamed and cached read transformations
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the dotfile destination
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the workdir
+tmpw=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the counter
+tmpa=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${tmps}/config.yaml"
+
+cat > ${cfg} << _EOF
+trans_read:
+  stream: echo run >> ${tmpa}/stream && base64 -d
+  files: echo run >> ${tmpa}/files && base64 -d < {0} > {1}
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+  workdir: ${tmpw}
+  trans_cache: true
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+    trans_read: stream
+  f_def:
+    dst: ${tmpd}/def
+    src: def
+    trans_read: files
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+    - f_def
+_EOF
+#cat ${cfg}
+
+# create the dotfiles
+echo 'abc' | base64 > ${tmps}/dotfiles/abc
+echo 'def' | base64 > ${tmps}/dotfiles/def
+
+# install
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+
+# dotfiles are transformed
+[ "`cat ${tmpd}/abc`" != "abc" ] && echo "bad streamed transformation" && exit 1
+[ "`cat ${tmpd}/def`" != "def" ] && echo "bad transformation" && exit 1
+# nothing written to the dotpath
+cnt=`ls ${tmps}/dotfiles | wc -l`
+[ "${cnt}" != "2" ] && echo "files created in the dotpath" && exit 1
+# cached results are private
+for out in ${tmpw}/cache/trans/*/out; do
+  [ "`stat -c '%a' ${out}`" != "600" ] && echo "cached result readable" && exit 1
+done
+
+# compare and install again use the cache
+cd ${ddpath} | ${bin} compare -c ${cfg} -p p1 -V
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+cnt=`cat ${tmpa}/stream | wc -l`
+[ "${cnt}" != "1" ] && echo "transformation not cached" && exit 1
+cnt=`cat ${tmpa}/files | wc -l`
+[ "${cnt}" != "1" ] && echo "transformation not cached" && exit 1
+
+# changing the source invalidates the cache
+echo 'abc2' | base64 > ${tmps}/dotfiles/abc
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+[ "`cat ${tmpd}/abc`" != "abc2" ] && echo "cache not invalidated" && exit 1
+cnt=`cat ${tmpa}/stream | wc -l`
+[ "${cnt}" != "2" ] && echo "transformation not executed" && exit 1
+
+# the cache is disabled by default
+sed -i '/trans_cache: true/d' ${cfg}
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+cnt=`cat ${tmpa}/stream | wc -l`
+[ "${cnt}" != "3" ] && echo "cache not disabled" && exit 1
+
+## CLEANING
+rm -rf ${tmps} ${tmpd} ${tmpw} ${tmpa}
+
+echo "OK"
+exit 0
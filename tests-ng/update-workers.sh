@@ -0,0 +1,135 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test updating dotfiles in parallel
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the dotfile destination
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${tmps}/config.yaml"
+
+cat > ${cfg} << _EOF
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+dotfiles:
+  f_1:
+    dst: ${tmpd}/f1
+    src: f1
+  f_2:
+    dst: ${tmpd}/f2
+    src: f2
+  f_3:
+    dst: ${tmpd}/f3
+    src: f3
+  f_4:
+    dst: ${tmpd}/f4
+    src: f4
+  d_dir:
+    dst: ${tmpd}/dir
+    src: dir
+  f_sub:
+    dst: ${tmpd}/sub
+    src: dir/sub
+profiles:
+  p1:
+    dotfiles:
+    - f_1
+    - f_2
+    - f_3
+    - f_4
+    - d_dir
+    - f_sub
+_EOF
+#cat ${cfg}
+
+# create the dotfiles
+for i in 1 2 3 4; do
+  echo "f${i}" > ${tmps}/dotfiles/f${i}
+done
+mkdir -p ${tmps}/dotfiles/dir
+echo 'a' > ${tmps}/dotfiles/dir/a
+echo 'sub' > ${tmps}/dotfiles/dir/sub
+
+# install
+cd ${ddpath} | ${bin} install -f -c ${cfg} -p p1 -V
+
+# modify the dotfiles
+for i in 1 2 3 4; do
+  echo "modified${i}" > ${tmpd}/f${i}
+done
+echo 'modified' > ${tmpd}/dir/a
+echo 'modified' > ${tmpd}/dir/new
+
+# update the profile
+cd ${ddpath} | ${bin} update -f -w 4 -c ${cfg} -p p1 -V
+
+for i in 1 2 3 4; do
+  [ "`cat ${tmps}/dotfiles/f${i}`" != "modified${i}" ] && echo "f${i} not updated" && exit 1
+done
+[ "`cat ${tmps}/dotfiles/dir/a`" != "modified" ] && echo "dir not updated" && exit 1
+[ ! -e ${tmps}/dotfiles/dir/new ] && echo "dir not updated" && exit 1
+
+# prompts are serialized
+for i in 1 2 3 4; do
+  echo "again${i}" > ${tmpd}/f${i}
+done
+cd ${ddpath} | yes | ${bin} update -w 4 -c ${cfg} -p p1 -k f_1 f_2 f_3 f_4 -V
+for i in 1 2 3 4; do
+  [ "`cat ${tmps}/dotfiles/f${i}`" != "again${i}" ] && echo "f${i} not updated" && exit 1
+done
+
+## CLEANING
+rm -rf ${tmps} ${tmpd}
+
+echo "OK"
+exit 0
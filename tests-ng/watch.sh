@@ -0,0 +1,128 @@
+#!/usr/bin/env bash
+# author: deadc0de6 (https://github.com/deadc0de6)
+# Copyright (c) 2020, deadc0de6
+#
+# test installing dotfiles again when they change with watch
+# returns 1 in case of error
+#
+
+# exit on first error
+set -e
+
+# all this crap to get current path
+rl="readlink -f"
+if ! ${rl} "${0}" >/dev/null 2>&1; then
+  rl="realpath"
+
+  if ! hash ${rl}; then
+    echo "\"${rl}\" not found !" && exit 1
+  fi
+fi
+cur=$(dirname "$(${rl} "${0}")")
+
+#hash dotdrop >/dev/null 2>&1
+#[ "$?" != "0" ] && echo "install dotdrop to run tests" && exit 1
+
+#echo "called with ${1}"
+
+# dotdrop path can be pass as argument
+ddpath="${cur}/../"
+[ "${1}" != "" ] && ddpath="${1}"
+[ ! -d ${ddpath} ] && echo "ddpath \"${ddpath}\" is not a directory" && exit 1
+
+export PYTHONPATH="${ddpath}:${PYTHONPATH}"
+bin="python3 -m dotdrop.dotdrop"
+hash coverage 2>/dev/null && bin="coverage run -a --source=dotdrop -m dotdrop.dotdrop" || true
+
+echo "dotdrop path: ${ddpath}"
+echo "pythonpath: ${PYTHONPATH}"
+
+# get the helpers
+source ${cur}/helpers
+
+echo -e "$(tput setaf 6)==> RUNNING $(basename $BASH_SOURCE) <==$(tput sgr0)"
+
+################################################################
+# this is the test
+################################################################
+
+
+# the dotfile source
+tmps=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+mkdir -p ${tmps}/dotfiles
+# the dotfile destination
+tmpd=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+# the workdir
+tmpw=`mktemp -d --suffix='-dotdrop-tests' || mktemp -d`
+
+# create the config file
+cfg="${tmps}/config.yaml"
+
+cat > ${cfg} << _EOF
+config:
+  backup: true
+  create: true
+  dotpath: dotfiles
+  workdir: ${tmpw}
+dotfiles:
+  f_abc:
+    dst: ${tmpd}/abc
+    src: abc
+  f_def:
+    dst: ${tmpd}/def
+    src: def
+variables:
+  var: value
+profiles:
+  p1:
+    dotfiles:
+    - f_abc
+    - f_def
+_EOF
+#cat ${cfg}
+
+# create the dotfiles
+echo 'abc {%@@ include "inc" @@%}' > ${tmps}/dotfiles/abc
+echo 'def {{@@ var @@}}' > ${tmps}/dotfiles/def
+echo 'inc' > ${tmps}/dotfiles/inc
+
+# wait for the content of a file
+wait_for()
+{
+  for i in `seq 100`; do
+    [ "`cat ${1} 2>/dev/null`" = "${2}" ] && return 0
+    sleep 0.1
+  done
+  echo "${1} is \"`cat ${1}`\" instead of \"${2}\""
+  cat ${tmpw}/log
+  return 1
+}
+
+# start watching
+cd ${ddpath} | ${bin} watch -f -c ${cfg} -p p1 -V > ${tmpw}/log 2>&1 &
+pid=$!
+trap "kill ${pid} 2>/dev/null || true" EXIT
+wait_for ${tmpd}/abc "abc inc"
+wait_for ${tmpd}/def "def value"
+
+# a dotfile changed
+echo 'abc2 {%@@ include "inc" @@%}' > ${tmps}/dotfiles/abc
+wait_for ${tmpd}/abc "abc2 inc"
+
+# an included template changed
+echo 'inc2' > ${tmps}/dotfiles/inc
+wait_for ${tmpd}/abc "abc2 inc2"
+
+# the config changed
+sed -i 's/var: value/var: changed/' ${cfg}
+wait_for ${tmpd}/def "def changed"
+
+kill ${pid}
+wait ${pid} || true
+trap - EXIT
+
+## CLEANING
+rm -rf ${tmps} ${tmpd} ${tmpw}
+
+echo "OK"
+exit 0
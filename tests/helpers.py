@@ -132,10 +132,17 @@ def _fake_args():
     args['--as'] = None
     args['--file-only'] = False
     args['--workers'] = 1
+    args['--output'] = None
+    args['<plan>'] = None
+    args['<run>'] = None
     # cmds
     args['profiles'] = False
     args['files'] = False
     args['install'] = False
+    args['plan'] = False
+    args['apply'] = False
+    args['rollback'] = False
+    args['watch'] = False
     args['compare'] = False
     args['import'] = False
     args['update'] = False
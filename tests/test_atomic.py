@@ -0,0 +1,115 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the atomic writes
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+import dotdrop.atomic as atomic
+from tests.helpers import clean, get_tempdir, edit_content
+
+
+class TestAtomic(unittest.TestCase):
+
+    def test_write(self):
+        """Test replacing files through a temporary file"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+
+        # new file
+        dst = os.path.join(tmp, 'dst')
+        atomic.write_content(dst, b'content', mode=0o100640)
+        with open(dst, 'rb') as f:
+            self.assertEqual(f.read(), b'content')
+        self.assertEqual(os.stat(dst).st_mode & 0o777, 0o640)
+
+        # the existing mode is kept
+        atomic.write_content(dst, b'other')
+        self.assertEqual(os.stat(dst).st_mode & 0o777, 0o640)
+
+        # a backup keeps the old content
+        bak = os.path.join(tmp, 'bak')
+        atomic.backup(dst, bak)
+        src = os.path.join(tmp, 'src')
+        edit_content(src, 'copied')
+        os.chmod(src, 0o600)
+        atomic.copy_file(src, dst)
+        with open(dst, 'r') as f:
+            self.assertEqual(f.read(), 'copied')
+        with open(bak, 'rb') as f:
+            self.assertEqual(f.read(), b'other')
+        self.assertEqual(os.stat(bak).st_mode & 0o777, 0o640)
+        self.assertEqual(os.stat(dst).st_mode & 0o777, 0o600)
+
+        # written through symlinks
+        link = os.path.join(tmp, 'link')
+        os.symlink(dst, link)
+        atomic.write_content(link, b'through')
+        self.assertTrue(os.path.islink(link))
+        with open(dst, 'rb') as f:
+            self.assertEqual(f.read(), b'through')
+
+        # failure leaves dst untouched
+        with patch('os.replace', side_effect=OSError('failed')):
+            with self.assertRaises(OSError):
+                atomic.write_content(dst, b'failed')
+        with open(dst, 'rb') as f:
+            self.assertEqual(f.read(), b'through')
+
+        # hard links are written in place
+        other = os.path.join(tmp, 'other')
+        os.link(dst, other)
+        inode = os.stat(dst).st_ino
+        atomic.write_content(dst, b'linked')
+        self.assertEqual(os.stat(dst).st_ino, inode)
+        with open(other, 'rb') as f:
+            self.assertEqual(f.read(), b'linked')
+        os.remove(other)
+
+        # not writable directory, written in place
+        inode = os.stat(dst).st_ino
+        with patch('tempfile.mkstemp', side_effect=PermissionError('denied')):
+            atomic.copy_file(src, dst)
+        self.assertEqual(os.stat(dst).st_ino, inode)
+        with open(dst, 'r') as f:
+            self.assertEqual(f.read(), 'copied')
+
+        # no temporary file left
+        names = os.listdir(tmp)
+        self.assertFalse([n for n in names if n.endswith(atomic.SUFFIX)])
+
+    def test_syncer(self):
+        """Test flushing the files on commit"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+
+        syncer = atomic.Syncer(mode=atomic.Syncer.DEFERRED)
+        paths = [os.path.join(tmp, 'file{}'.format(i)) for i in range(3)]
+        for path in paths:
+            atomic.write_content(path, b'content', syncer=syncer)
+        self.assertEqual(syncer.files, paths)
+        self.assertEqual(syncer.dirs, set([tmp]))
+        with patch('dotdrop.atomic._fsync') as fsync:
+            syncer.commit()
+        self.assertEqual(fsync.call_count, len(paths) + 1)
+        self.assertEqual(syncer.files, [])
+
+        # immediate syncs the file and its directory
+        syncer = atomic.Syncer(mode=atomic.Syncer.IMMEDIATE)
+        with patch('dotdrop.atomic._fsync') as fsync:
+            atomic.write_content(paths[0], b'content', syncer=syncer)
+        self.assertEqual(fsync.call_count, 2)
+        self.assertEqual(syncer.files, [])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
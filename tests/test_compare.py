@@ -7,6 +7,7 @@ basic unittest for the compare function
 
 import unittest
 import os
+import functools
 
 from dotdrop.dotdrop import cmd_importer
 from dotdrop.dotdrop import cmd_compare
@@ -43,6 +44,12 @@ class TestCompare(unittest.TestCase):
                 continue
             diff = comp.compare(insttmp, dotfile.dst,
                                 ignore=['whatever', 'whatelse'])
+            # rendering in memory gives the same result
+            src = os.path.join(o.dotpath, dotfile.src)
+            render = functools.partial(inst.render, t)
+            memdiff = comp.compare_src(src, dotfile.dst, render=render,
+                                       ignore=['whatever', 'whatelse'])
+            self.assertEqual(diff == '', memdiff == '')
             results[path] = diff == ''
         return results
 
@@ -167,6 +174,10 @@ class TestCompare(unittest.TestCase):
 
         # test compare from dotdrop
         self.assertFalse(cmd_compare(o, tmp))
+        # test parallel compare
+        o.compare_parallel = 4
+        self.assertFalse(cmd_compare(o, tmp))
+        o.compare_parallel = 1
         # test focus
         o.compare_focus = [d4]
         self.assertFalse(cmd_compare(o, tmp))
@@ -0,0 +1,100 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the template dependency graph
+"""
+
+import os
+import unittest
+from types import SimpleNamespace
+
+from dotdrop.depgraph import DepGraph
+from dotdrop.dotdrop import _watch_affected
+from dotdrop.templategen import Templategen
+from tests.helpers import clean, get_tempdir, edit_content, create_dir
+
+
+class TestDepGraph(unittest.TestCase):
+
+    def test_record(self):
+        """Test the dependencies of a template"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        dotpath = create_dir(os.path.join(tmp, 'dotfiles'))
+        funcs = os.path.join(tmp, 'funcs.py')
+        edit_content(funcs, 'def myfunc():\n    return 1\n')
+        filters = os.path.join(tmp, 'filters.py')
+        edit_content(filters, 'def myfilter(x):\n    return x\n')
+
+        src = os.path.join(dotpath, 'src')
+        edit_content(src, '{%@@ include "inc" @@%}\n'
+                          '{{@@ var1 | myfilter @@}}\n'
+                          '{{@@ header() @@}}\n')
+        inc = os.path.join(dotpath, 'inc')
+        edit_content(inc, '{%@@ import "macros" as m @@%}\n'
+                          '{{@@ myfunc() @@}} {{@@ var2 @@}}\n'
+                          '{%@@ include "src" @@%}\n')
+        macros = os.path.join(dotpath, 'macros')
+        edit_content(macros, '{%@@ macro m() @@%}{{@@ var3 @@}}'
+                             '{%@@ endmacro @@%}\n')
+
+        t = Templategen(base=dotpath, func_file=[funcs],
+                        filter_file=[filters])
+        cachedir = os.path.join(tmp, 'cache')
+        graph = DepGraph(cachedir)
+        deps = graph.record('f_src', [src], t)
+        self.assertEqual(deps['templates'], sorted([inc, macros, src]))
+        self.assertEqual(deps['variables'], ['var1', 'var2', 'var3'])
+        self.assertEqual(deps['helpers'], [filters, funcs])
+        self.assertFalse(deps['dynamic'])
+        self.assertEqual(graph.dependents(path=macros), ['f_src'])
+        self.assertEqual(graph.dependents(variable='var2'), ['f_src'])
+        self.assertEqual(graph.dependents(variable='other'), [])
+
+        # persisted
+        graph.save()
+        graph = DepGraph(cachedir)
+        self.assertEqual(graph.get('f_src'), deps)
+
+        # dynamic include
+        edit_content(inc, '{%@@ include name @@%}\n')
+        deps = graph.record('f_src', [src], t)
+        self.assertEqual(deps['templates'], [inc])
+        self.assertEqual(deps['variables'], ['name', 'var1'])
+        self.assertTrue(deps['dynamic'])
+
+    def test_watch_affected(self):
+        """Test the dotfiles installed again by watch"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        dotpath = create_dir(os.path.join(tmp, 'dotfiles'))
+        src = os.path.join(dotpath, 'src')
+        edit_content(src, '{%@@ include "inc" @@%}\n')
+        inc = os.path.join(dotpath, 'inc')
+        edit_content(inc, 'included\n')
+        other = create_dir(os.path.join(dotpath, 'other'))
+
+        t = Templategen(base=dotpath)
+        graph = DepGraph()
+        graph.record('f_src', [src], t)
+        o = SimpleNamespace(dotpath=dotpath)
+        dotfiles = [SimpleNamespace(key='f_src', src='src'),
+                    SimpleNamespace(key='d_other', src='other')]
+
+        keys = [d.key for d in _watch_affected(o, dotfiles, {inc}, graph)]
+        self.assertEqual(keys, ['f_src'])
+        changed = {os.path.join(other, 'file')}
+        keys = [d.key for d in _watch_affected(o, dotfiles, changed, graph)]
+        self.assertEqual(keys, ['d_other'])
+        changed = {os.path.join(tmp, 'unrelated')}
+        self.assertEqual(_watch_affected(o, dotfiles, changed, graph), [])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the builtin diff
+"""
+
+import os
+import unittest
+
+from dotdrop.utils import diff, DIFF_CMD
+from dotdrop.differ import diff_content, BINARY, NONEWLINE
+from tests.helpers import clean, get_tempdir, edit_content
+
+
+class TestDiff(unittest.TestCase):
+
+    def test_builtin(self):
+        """Test the builtin diff"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        left = os.path.join(tmp, 'left')
+        right = os.path.join(tmp, 'right')
+
+        # same files
+        edit_content(left, 'a\nb\nc\n')
+        edit_content(right, 'a\nb\nc\n')
+        self.assertEqual(diff(left, right, raw=False), '')
+        self.assertEqual(diff(left, right, raw=False, diff_cmd=DIFF_CMD), '')
+
+        # different files
+        edit_content(right, 'a\nB\nc\n')
+        out = diff(left, right, raw=False)
+        self.assertTrue(out.startswith('--- {}'.format(left)))
+        self.assertIn('+++ {}'.format(right), out)
+        self.assertIn('@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n', out)
+        raw = diff(left, right, raw=True)
+        self.assertEqual(b''.join(raw).decode('utf-8'), out)
+
+        # same output as the external diff
+        external = diff(left, right, raw=False, diff_cmd='diff -u {0} {1}')
+        self.assertEqual(out.splitlines()[2:], external.splitlines()[2:])
+
+    def test_content(self):
+        """Test diffing bytes"""
+        self.assertEqual(diff_content(b'a\n', b'a\n', 'l', 'r'), '')
+        out = diff_content(b'a\n', b'a', 'l', 'r')
+        self.assertIn('-a\n+a\n{}'.format(NONEWLINE), out)
+        out = diff_content(b'a\0', b'b\0', 'l', 'r')
+        self.assertEqual(out, BINARY.format('l', 'r'))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the directories synchronization plan
+"""
+
+import os
+import json
+import time
+import unittest
+
+import dotdrop.dirsync as dirsync
+from tests.helpers import clean, get_tempdir, edit_content, create_dir
+
+
+class TestDirsync(unittest.TestCase):
+
+    def test_plan(self):
+        """Test the changes planned between two directories"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        left = create_dir(os.path.join(tmp, 'left'))
+        right = create_dir(os.path.join(tmp, 'right'))
+
+        # same content, different mtimes
+        edit_content(os.path.join(left, 'same'), 'same')
+        edit_content(os.path.join(right, 'same'), 'same')
+        os.utime(os.path.join(right, 'same'), (0, 0))
+        # same size, different content
+        edit_content(os.path.join(left, 'modified'), 'abc')
+        edit_content(os.path.join(right, 'modified'), 'abd')
+        # different rights
+        edit_content(os.path.join(left, 'mode'), 'mode')
+        edit_content(os.path.join(right, 'mode'), 'mode')
+        os.chmod(os.path.join(left, 'mode'), 0o700)
+        os.chmod(os.path.join(right, 'mode'), 0o600)
+        # added and removed
+        create_dir(os.path.join(left, 'newdir'))
+        edit_content(os.path.join(left, 'newdir', 'file'), 'new')
+        create_dir(os.path.join(left, 'sub'))
+        edit_content(os.path.join(left, 'sub', 'new'), 'new')
+        create_dir(os.path.join(right, 'sub'))
+        edit_content(os.path.join(right, 'sub', 'old'), 'old')
+        create_dir(os.path.join(right, 'olddir'))
+        # ignored
+        edit_content(os.path.join(left, 'ignored'), 'ignored')
+
+        hashes = dirsync.HashCache()
+        changes = dirsync.plan(left, right, hashes,
+                               ignore=lambda x: x[0].endswith('ignored'))
+        res = [(c.kind, os.path.relpath(c.dst, right), c.isdir)
+               for c in changes]
+        self.assertEqual(res, [
+            (dirsync.ADD, 'newdir', True),
+            (dirsync.REMOVE, 'olddir', True),
+            (dirsync.MODIFY, 'modified', False),
+            (dirsync.ADD, os.path.join('sub', 'new'), False),
+            (dirsync.REMOVE, os.path.join('sub', 'old'), False),
+            (dirsync.MODE, 'mode', False),
+        ])
+
+    def test_hashes(self):
+        """Test the hashes are cached and persisted"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        path = os.path.join(tmp, 'file')
+        edit_content(path, 'content')
+        old = time.time() - 3600
+        os.utime(path, (old, old))
+
+        hashes = dirsync.HashCache(os.path.join(tmp, 'cache'))
+        digest = hashes.digest(path)
+        hashes.save()
+        self.assertTrue(os.path.exists(hashes.path))
+
+        # the cached hash is used while the file is untouched
+        hashes = dirsync.HashCache(os.path.join(tmp, 'cache'))
+        # not hashed again
+        hashes._hash = None
+        self.assertEqual(hashes.digest(path), digest)
+
+        # and not anymore once modified
+        hashes = dirsync.HashCache(os.path.join(tmp, 'cache'))
+        edit_content(path, 'other')
+        self.assertNotEqual(hashes.digest(path), digest)
+
+        # removed paths are forgotten when saved
+        renamed = os.path.join(tmp, 'renamed')
+        os.rename(path, renamed)
+        hashes = dirsync.HashCache(os.path.join(tmp, 'cache'))
+        hashes.save()
+        with open(hashes.path, 'r') as f:
+            self.assertEqual(json.load(f), {})
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the copy of files
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+import dotdrop.filecopy as filecopy
+from tests.helpers import clean, get_tempdir, edit_content, create_dir
+
+
+class TestFilecopy(unittest.TestCase):
+
+    def test_copyfile(self):
+        """Test the copy of a file with every method"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        self.addCleanup(filecopy._FAILED.clear)
+        src = os.path.join(tmp, 'src')
+        content = os.urandom(1024 * 1024 * 3)
+        edit_content(src, content, binary=True)
+        os.chmod(src, 0o751)
+        os.utime(src, (1, 1))
+        st = os.stat(src)
+        dev = st.st_dev
+
+        methods = [filecopy.REFLINK, filecopy.COPY_RANGE,
+                   filecopy.SENDFILE]
+        for i in range(len(methods) + 1):
+            # disable the methods one after the other
+            filecopy._FAILED.clear()
+            for method in methods[:i]:
+                filecopy._FAILED.add((dev, dev, method))
+            dst = os.path.join(tmp, 'dst{}'.format(i))
+            filecopy.copyfile(src, dst, mode=True, times=True)
+            with open(dst, 'rb') as f:
+                self.assertEqual(f.read(), content)
+            dst_st = os.stat(dst)
+            self.assertEqual(dst_st.st_mode, st.st_mode)
+            self.assertEqual(dst_st.st_mtime_ns, st.st_mtime_ns)
+
+        # content only
+        dst = os.path.join(tmp, 'dst')
+        filecopy.copyfile(src, dst)
+        self.assertNotEqual(os.stat(dst).st_mtime_ns, st.st_mtime_ns)
+        with self.assertRaises(filecopy.shutil.SameFileError):
+            filecopy.copyfile(src, src)
+
+    def test_short_copy(self):
+        """Test the fallback when the kernel stops copying early"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        self.addCleanup(filecopy._FAILED.clear)
+        src = os.path.join(tmp, 'src')
+        content = os.urandom(1024 * 64)
+        edit_content(src, content, binary=True)
+        dev = os.stat(src).st_dev
+
+        def short(infd, outfd, count):
+            # copies a bit then reports the end of file
+            if os.lseek(infd, 0, os.SEEK_CUR) == 0:
+                os.write(outfd, os.read(infd, 1024))
+                return 1024
+            return 0
+
+        filecopy._FAILED.add((dev, dev, filecopy.REFLINK))
+        filecopy._FAILED.add((dev, dev, filecopy.SENDFILE))
+        dst = os.path.join(tmp, 'dst')
+        with patch('os.copy_file_range', short, create=True):
+            method = filecopy.copyfile(src, dst)
+        self.assertEqual(method, filecopy.USERSPACE)
+        with open(dst, 'rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertIn((dev, dev, filecopy.COPY_RANGE), filecopy._FAILED)
+
+    def test_copytree(self):
+        """Test the copy of a directory"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        src = create_dir(os.path.join(tmp, 'src'))
+        create_dir(os.path.join(src, 'sub'))
+        edit_content(os.path.join(src, 'sub', 'file'), 'file')
+        edit_content(os.path.join(src, 'ignored'), 'ignored')
+        os.symlink('sub/file', os.path.join(src, 'link'))
+        os.chmod(os.path.join(src, 'sub'), 0o700)
+
+        dst = os.path.join(tmp, 'dst')
+        filecopy.copytree(src, dst,
+                          ignore=lambda d, names: ['ignored'])
+        self.assertEqual(sorted(os.listdir(dst)), ['link', 'sub'])
+        self.assertFalse(os.path.islink(os.path.join(dst, 'link')))
+        with open(os.path.join(dst, 'link')) as f:
+            self.assertEqual(f.read(), 'file')
+        self.assertEqual(os.stat(os.path.join(dst, 'sub')).st_mode,
+                         os.stat(os.path.join(src, 'sub')).st_mode)
+
+        # with symlinks
+        dst = os.path.join(tmp, 'dst2')
+        filecopy.copytree(src, dst, symlinks=True)
+        self.assertEqual(os.readlink(os.path.join(dst, 'link')), 'sub/file')
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
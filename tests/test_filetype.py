@@ -0,0 +1,110 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the text/binary identification
+"""
+
+import os
+import unittest
+
+from unittest.mock import patch
+
+from dotdrop.utils import is_text_file, SNIFF_SIZE
+from dotdrop.dirsync import CHUNK
+from dotdrop.templategen import Templategen, ScanCache
+from tests.helpers import clean, get_tempdir, edit_content, create_dir
+
+
+class TestFiletype(unittest.TestCase):
+
+    def test_is_text(self):
+        """Test the identification of text files"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        path = os.path.join(tmp, 'file')
+
+        # empty and text files
+        edit_content(path, '')
+        self.assertTrue(is_text_file(path))
+        edit_content(path, 'some text\n{"json": true}\n')
+        self.assertTrue(is_text_file(path))
+
+        # utf-8 character cut by the end of the block
+        data = 'a' * (SNIFF_SIZE - 1) + 'é' * 10
+        edit_content(path, data.encode('utf-8'), binary=True)
+        self.assertTrue(is_text_file(path))
+
+        # latin-1 text
+        edit_content(path, 'café\n'.encode('latin-1'), binary=True)
+        self.assertTrue(is_text_file(path))
+
+        # binary files
+        edit_content(path, b'\x7fELF\x02\x01\x00\x00', binary=True)
+        self.assertFalse(is_text_file(path))
+        edit_content(path, b'\x89PNG\r\n\x1a\n\xff\x01', binary=True)
+        self.assertFalse(is_text_file(path))
+
+        # utf-8 with control characters, left to the mime type
+        edit_content(path, b'{"a": "\x01\x02"}\n', binary=True)
+        with patch('dotdrop.utils._magic_text', return_value=False) as magic:
+            self.assertFalse(is_text_file(path))
+        self.assertTrue(magic.called)
+
+        # result is cached until the file changes
+        with patch('builtins.open') as opn:
+            self.assertFalse(is_text_file(path))
+        self.assertFalse(opn.called)
+        edit_content(path, 'now some text')
+        self.assertTrue(is_text_file(path))
+
+    def test_is_template(self):
+        """Test the identification of templates"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        sub = create_dir(os.path.join(tmp, 'sub'))
+        path = os.path.join(sub, 'file')
+
+        edit_content(path, 'no template\n')
+        self.assertFalse(Templategen.is_template(path))
+        self.assertFalse(Templategen.is_template(tmp))
+
+        # marker cut by the end of a chunk
+        data = 'a' * (CHUNK - 2) + '{{@@ var @@}}'
+        edit_content(path, data)
+        self.assertTrue(Templategen.is_template(path))
+        self.assertTrue(Templategen.is_template(tmp))
+
+        # binary files are no template
+        edit_content(path, b'\x7fELF\x00{{@@ var @@}}', binary=True)
+        self.assertFalse(Templategen.is_template(path))
+
+        # results are cached once the file is old enough
+        edit_content(path, '{%@@ if true @@%}{%@@ endif @@%}')
+        os.utime(path, (1, 1))
+        cachedir = os.path.join(tmp, 'cache')
+        cache = ScanCache(cachedir)
+        self.assertTrue(Templategen.is_template(sub, cache=cache))
+        cache.save()
+        cache = ScanCache(cachedir)
+        with patch('dotdrop.templategen.Templategen._is_template') as check:
+            self.assertTrue(Templategen.is_template(sub, cache=cache))
+        self.assertFalse(check.called)
+
+        # removed files are forgotten
+        self.assertIn(path, cache.hashes)
+        os.remove(path)
+        cache.save()
+        cache = ScanCache(cachedir)
+        self.assertFalse(Templategen.is_template(sub, cache=cache))
+        cache.save()
+        self.assertNotIn(path, cache.hashes)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
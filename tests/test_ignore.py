@@ -0,0 +1,92 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the ignore patterns
+"""
+
+import unittest
+
+from dotdrop.ignore import Ignore
+from dotdrop.utils import must_ignore, must_prune, patch_ignores, \
+    get_ignore
+
+
+class TestIgnore(unittest.TestCase):
+
+    def test_match(self):
+        """Test matching paths"""
+        ign = Ignore(['*/README.md', '/home/user/.vim/plugged'])
+        ign = ign.within(['/home/user/.vim'])
+        self.assertTrue(ign.match('/home/user/.vim/README.md'))
+        self.assertTrue(ign.match('/home/user/.vim/plugged'))
+        # content of an ignored directory
+        self.assertTrue(ign.match('/home/user/.vim/plugged/plugin/a.vim'))
+        self.assertFalse(ign.match('/home/user/.vim/vimrc'))
+        self.assertFalse(ign.match('/home/user/.vim/plugged.vim'))
+        self.assertFalse(Ignore([]))
+        self.assertFalse(Ignore([]).match('/home/user'))
+
+    def test_roots(self):
+        """Test the content is ignored only under the roots"""
+        ign = Ignore(['*/config', '*/tmp'])
+        path = '/home/u/work/dotfiles/config/app/settings.json'
+        self.assertFalse(ign.match(path))
+        self.assertFalse(ign.match('/tmp/dotfiles/vimrc'))
+        ign = ign.within(['/home/u/work/dotfiles/config/app', '/tmp/dotfiles'])
+        self.assertFalse(ign.match(path))
+        self.assertFalse(ign.match('/tmp/dotfiles/vimrc'))
+        self.assertTrue(ign.within(['/home/u/work']).match(path))
+        self.assertFalse(must_ignore([path], ['*/config']))
+        self.assertFalse(must_ignore(['/tmp/dotfiles/vimrc'], ['*/tmp']))
+
+    def test_negate(self):
+        """Test negated patterns"""
+        ign = Ignore(['*/.config/app/*', '!*/.config/app/keep*'])
+        self.assertTrue(ign.match('/home/user/.config/app/cache'))
+        self.assertFalse(ign.match('/home/user/.config/app/keep.conf'))
+        self.assertFalse(ign.match('/home/user/.config/app/keep/sub'))
+        # last matching pattern wins
+        ign = Ignore(['!*/keep', '*'])
+        self.assertTrue(ign.match('/home/user/keep'))
+
+    def test_prune(self):
+        """Test pruning directories"""
+        ign = Ignore(['/home/user/.vim/plugged',
+                      '/home/user/.config/app',
+                      '!/home/user/.config/app/keep'])
+        ign = ign.within(['/home/user'])
+        self.assertTrue(ign.prune('/home/user/.vim/plugged'))
+        self.assertTrue(ign.prune('/home/user/.vim/plugged/sub'))
+        self.assertFalse(ign.prune('/home/user/.vim'))
+        # something underneath is not ignored
+        self.assertFalse(ign.prune('/home/user/.config/app'))
+        self.assertTrue(ign.match('/home/user/.config/app/other'))
+        self.assertFalse(ign.match('/home/user/.config/app/keep'))
+        self.assertTrue(ign.prune('/home/user/.config/app/other'))
+        ign = Ignore(['*/plugged', '!*.vim'])
+        self.assertFalse(ign.prune('/home/user/.vim/plugged'))
+
+    def test_helpers(self):
+        """Test the helpers"""
+        patterns = patch_ignores(['plugged', '!plugged/keep', '*/README.md',
+                                  '!/abs/path'], '/home/user/.vim')
+        self.assertEqual(patterns, ['/home/user/.vim/plugged',
+                                    '!/home/user/.vim/plugged/keep',
+                                    '*/README.md', '!/abs/path'])
+        self.assertFalse(must_ignore(['/home/user/.vim/plugged/x'],
+                                     patterns))
+        patterns = get_ignore(patterns, roots=['/home/user/.vim'])
+        self.assertTrue(must_ignore(['/a', '/home/user/.vim/plugged/x'],
+                                    patterns))
+        self.assertFalse(must_ignore(['/home/user/.vim/plugged/keep'],
+                                     patterns))
+        self.assertFalse(must_prune(['/home/user/.vim/plugged'], patterns))
+        self.assertFalse(must_ignore(['/a'], []))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
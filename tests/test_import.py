@@ -110,6 +110,16 @@ class TestImport(unittest.TestCase):
         cmd_importer(o)
         o.import_link = LinkTypes.NOLINK
 
+        # known without reloading the config
+        keys = [d.key for d in o.conf.get_dotfiles()]
+        self.assertEqual(len(keys), len(dfiles + sfiles))
+        self.assertEqual(len(set(keys)), len(keys))
+        self.assertTrue(o.conf.get_dotfile_by_dst(dotfile1))
+        # imported once
+        o.import_path = [dotfile1]
+        cmd_importer(o)
+        self.assertEqual(len(o.conf.get_dotfiles()), len(keys))
+
         # reload the config
         o = load_options(confpath, profile)
 
@@ -473,6 +473,8 @@ exec bspwm
         installer = Installer()
         templater = MagicMock()
         templater.generate.return_value = b'content'
+        # the variables of each file are added with an overlay
+        templater.overlay.return_value = templater
         # make templategen treat everything as a template
         mocked_templategen.is_template.return_value = True
 
@@ -122,6 +122,15 @@ class TestRemove(unittest.TestCase):
         self.assertTrue(y['profiles']['host1']['dotfiles'] == ['f_test2'])
         self.assertTrue(y['profiles']['host3']['dotfiles'] == ['f_test2'])
 
+        # ensure the lookups are consistent
+        self.assertIsNone(o.conf.get_dotfile('f_test3'))
+        self.assertEqual(o.conf.get_dotfile_by_dst('/tmp/some-fake-path'), [])
+        self.assertEqual(o.conf.get_profiles_by_dotfile_key('f_test3'), [])
+        dfs = o.conf.get_dotfile_by_dst('/dev/null')
+        self.assertEqual([d.key for d in dfs], ['f_test2'])
+        profiles = o.conf.get_profiles_by_dotfile_key('f_test2')
+        self.assertEqual([p.key for p in profiles], ['host1', 'host3'])
+
 
 def main():
     unittest.main()
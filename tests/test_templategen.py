@@ -0,0 +1,117 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the templater
+"""
+
+import os
+import unittest
+from concurrent import futures
+
+from dotdrop.templategen import Templategen
+from dotdrop.exceptions import UndefinedException
+from tests.helpers import clean, get_tempdir, edit_content
+
+
+class TestTemplategen(unittest.TestCase):
+
+    def test_overlay(self):
+        """Test sharing a templater with different variables"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        edit_content(os.path.join(tmp, 'inc'), '{{@@ var @@}}')
+        src = os.path.join(tmp, 'src')
+        edit_content(src, '{{@@ base @@}} {%@@ include "inc" @@%}')
+
+        t = Templategen(base=tmp, variables={'base': 'b', 'var': 'v'})
+        self.assertEqual(t.generate(src), b'b v')
+        one = t.overlay({'var': 'one'})
+        two = one.overlay({'var': 'two', 'base': 'x'})
+        self.assertEqual(one.generate(src), b'b one')
+        self.assertEqual(two.generate(src), b'x two')
+        self.assertEqual(t.generate(src), b'b v')
+        self.assertEqual(two.generate_string('{{@@ var @@}}'), 'two')
+        self.assertIs(two.env, t.env)
+
+        # layers are not copied
+        dotvars = {'var': 'dotfile'}
+        filevars = {'file': 'f'}
+        layered = t.overlay(dotvars).overlay(filevars)
+        self.assertEqual(len(layered.variables.maps), 3)
+        self.assertIs(layered.variables.maps[0], filevars)
+        self.assertIs(layered.variables.maps[1], dotvars)
+        self.assertIs(layered.variables.maps[2], t.variables)
+        with self.assertRaises(UndefinedException):
+            t.generate_string('{{@@ undefined @@}}')
+
+        # the loaded templates are tracked by thread
+        t.get_loaded_templates(clear=True)
+
+        def render(i):
+            overlay = t.overlay({'var': str(i)})
+            overlay.get_loaded_templates(clear=True)
+            content = overlay.generate(src)
+            return content, overlay.get_loaded_templates()
+
+        with futures.ThreadPoolExecutor(4) as ex:
+            results = list(ex.map(render, range(20)))
+        for i, (content, loaded) in enumerate(results):
+            self.assertEqual(content, 'b {}'.format(i).encode('utf-8'))
+            self.assertEqual(loaded, [os.path.join(tmp, 'inc'), src])
+        self.assertEqual(t.get_loaded_templates(), [])
+
+    def test_outside_base(self):
+        """Test rendering again a changed template outside base"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        base = os.path.join(tmp, 'base')
+        os.mkdir(base)
+        path = os.path.join(tmp, 'out', 'f')
+        os.mkdir(os.path.dirname(path))
+
+        t = Templategen(base=base, variables={'var': 1})
+        edit_content(path, 'a {{@@ var @@}}')
+        self.assertEqual(t.generate(path), b'a 1')
+        # same size and replaced in place
+        edit_content(path, 'b {{@@ var @@}}')
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(t.generate(path), b'b 1')
+        # replaced by another file
+        other = os.path.join(tmp, 'other')
+        edit_content(other, 'c {{@@ var @@}}')
+        os.replace(other, path)
+        self.assertEqual(t.generate(path), b'c 1')
+
+    def test_env_references(self):
+        """Test the environment variables a template reads"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        path = os.path.join(tmp, 'f')
+        t = Templategen(base=tmp)
+
+        edit_content(path, '{{@@ env.HOME @@}} {{@@ env["USER"] @@}}\n'
+                           '{{@@ env.get("SHELL", "sh") @@}} {{@@ var @@}}')
+        _, names, _, keys = t.get_references(path)
+        self.assertEqual(names, ['env', 'var'])
+        self.assertEqual(keys, ['HOME', 'SHELL', 'USER'])
+
+        edit_content(path, '{{@@ var @@}}')
+        self.assertEqual(t.get_references(path)[3], [])
+
+        # any key may be read
+        for content in ['{{@@ env[var] @@}}',
+                        '{%@@ for k in env @@%}{{@@ k @@}}{%@@ endfor @@%}',
+                        '{{@@ env.HOME @@}} {{@@ env | length @@}}']:
+            edit_content(path, content)
+            self.assertIsNone(t.get_references(path)[3])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the read transformations cache
+"""
+
+import os
+import unittest
+from concurrent import futures
+
+from dotdrop.action import Transform
+from dotdrop.transcache import TransCache
+from tests.helpers import clean, get_tempdir, edit_content
+
+
+class TestTransCache(unittest.TestCase):
+
+    def test_parallel(self):
+        """Test transforming the same file in parallel"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        src = os.path.join(tmp, 'src')
+        edit_content(src, 'content')
+        trans = Transform('trans', 'sleep 0.1 && cp {0} {1}')
+
+        for cache in [True, False]:
+            transcache = TransCache(os.path.join(tmp, 'workdir'),
+                                    cache=cache)
+            with futures.ThreadPoolExecutor(8) as ex:
+                names = ['f_{}'.format(i) for i in range(8)]
+                outs = list(ex.map(
+                    lambda name: transcache.apply(trans, src, name), names))
+            self.assertEqual(len(set(outs)), len(outs))
+            for out in outs:
+                with open(out, 'r') as f:
+                    self.assertEqual(f.read(), 'content')
+            transcache.close()
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2020, deadc0de6
+basic unittest for the watcher
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+from dotdrop.watcher import Watcher
+from tests.helpers import clean, get_tempdir, edit_content, create_dir
+
+
+class TestWatcher(unittest.TestCase):
+
+    def _watch(self, watcher):
+        """check the changes reported by watcher"""
+        tmp = get_tempdir()
+        self.assertTrue(os.path.exists(tmp))
+        self.addCleanup(clean, tmp)
+        self.addCleanup(watcher.close)
+        sub = create_dir(os.path.join(tmp, 'sub'))
+        path = os.path.join(sub, 'file')
+        edit_content(path, 'content')
+        other = get_tempdir()
+        self.addCleanup(clean, other)
+        single = os.path.join(other, 'single')
+        edit_content(single, 'content')
+        watcher.add(tmp)
+        watcher.add(single, recursive=False)
+
+        # nothing changed
+        self.assertEqual(watcher.wait(timeout=0.3), set())
+
+        # a file in a sub-directory
+        edit_content(path, 'changed')
+        self.assertIn(path, watcher.changes())
+
+        # a file in a new directory
+        new = create_dir(os.path.join(tmp, 'new'))
+        edit_content(os.path.join(new, 'file'), 'content')
+        changed = watcher.changes()
+        self.assertIn(new, changed)
+        edit_content(os.path.join(new, 'file'), 'changed')
+        self.assertIn(os.path.join(new, 'file'), watcher.changes())
+
+        # a file watched alone
+        edit_content(single, 'changed')
+        self.assertIn(single, watcher.changes())
+
+    def test_inotify(self):
+        """Test watching with inotify"""
+        watcher = Watcher()
+        if watcher.fd is None:
+            watcher.close()
+            self.skipTest('inotify not available')
+        self._watch(watcher)
+
+    def test_polling(self):
+        """Test watching by polling"""
+        with patch('dotdrop.watcher._inotify_init', return_value=None):
+            watcher = Watcher(interval=0.05)
+        self.assertIsNone(watcher.fd)
+        self._watch(watcher)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()